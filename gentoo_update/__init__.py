@@ -6,6 +6,7 @@ from .gentoo_update import (
     generate_report,
     get_available_log_files,
     get_last_log_filename,
+    is_log_file,
     main,
 )
 from .notifier import Notifier
@@ -0,0 +1,250 @@
+"""Package atom and version parsing following the Package Manager Specification.
+
+Versions are compared with the algorithm from PMS section 3.3. Parsing and
+comparison results are memoized, because the same versions repeat across
+update logs and history reports.
+"""
+
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Optional, Tuple
+
+VERSION_REGEX = (
+    r"(?P<numbers>\d+(?:\.\d+)*)"
+    r"(?P<letter>[a-z]?)"
+    r"(?P<suffixes>(?:_(?:alpha|beta|pre|rc|p)\d*)*)"
+    r"(?:-r(?P<revision>\d+))?"
+)
+VERSION_PATTERN = re.compile(f"^{VERSION_REGEX}$")
+ATOM_PATTERN = re.compile(
+    r"^(?P<category>[A-Za-z0-9_][A-Za-z0-9+_.-]*)/"
+    r"(?P<name>[A-Za-z0-9_][A-Za-z0-9+_-]*?)-"
+    f"(?P<version>{VERSION_REGEX})"
+    r"(?::(?P<slot>[A-Za-z0-9_][A-Za-z0-9+_.-]*)"
+    r"(?:/(?P<subslot>[A-Za-z0-9_][A-Za-z0-9+_.-]*))?)?"
+    r"(?:::(?P<repo>[A-Za-z0-9_][A-Za-z0-9_-]*))?$"
+)
+SUFFIX_PATTERN = re.compile(r"_(alpha|beta|pre|rc|p)(\d*)")
+SUFFIX_ORDER = {"alpha": 0, "beta": 1, "pre": 2, "rc": 3, "p": 4}
+
+
+@dataclass(frozen=True)
+class Version:
+    """Dataclass with components of a package version.
+
+    Example: 2.204.1_rc3-r1 has numbers ("2", "204", "1"), no letter,
+    suffixes (("rc", 3),) and revision 1.
+    """
+
+    numbers: Tuple[str, ...]
+    letter: str
+    suffixes: Tuple[Tuple[str, int], ...]
+    revision: int
+
+    def __str__(self) -> str:
+        """Format the version the way it is written in atoms."""
+        version = ".".join(self.numbers) + self.letter
+        for suffix, number in self.suffixes:
+            version += f"_{suffix}{number or ''}"
+        if self.revision:
+            version += f"-r{self.revision}"
+        return version
+
+
+@dataclass(frozen=True)
+class Atom:
+    """Dataclass with components of a package atom.
+
+    Example: dev-libs/openssl-3.0.11-r1:0/3::gentoo
+    """
+
+    category: str
+    name: str
+    version: Version
+    slot: Optional[str]
+    subslot: Optional[str]
+    repo: Optional[str]
+
+    @property
+    def package_name(self) -> str:
+        """Category and name of the package, dev-libs/openssl."""
+        return f"{self.category}/{self.name}"
+
+
+def _split_version(version_match: re.Match) -> Version:
+    """Create Version from a match of VERSION_REGEX."""
+    suffixes = tuple(
+        (suffix, int(number or 0))
+        for suffix, number in SUFFIX_PATTERN.findall(version_match.group("suffixes"))
+    )
+    return Version(
+        tuple(version_match.group("numbers").split(".")),
+        version_match.group("letter"),
+        suffixes,
+        int(version_match.group("revision") or 0),
+    )
+
+
+@lru_cache(maxsize=None)
+def parse_version(version: str) -> Version:
+    """Parse a version string.
+
+    Slot and repository parts, as in 3.0.10:0/3::gentoo, are ignored.
+
+    Args:
+    ----
+        version (str): Version string, example: 69.0.2_p1-r1.
+
+    Returns:
+    -------
+        Version: Parsed version.
+
+    Raises:
+    ------
+        ValueError: If the string is not a valid version.
+    """
+    version_match = VERSION_PATTERN.match(version.split(":", 1)[0])
+    if version_match is None:
+        raise ValueError(f"Invalid version: {version}")
+    return _split_version(version_match)
+
+
+@lru_cache(maxsize=None)
+def parse_atom(atom: str) -> Atom:
+    """Parse a versioned package atom.
+
+    Args:
+    ----
+        atom (str): Atom with optional slot and repository,
+            example: dev-libs/openssl-3.0.11:0/3::gentoo
+
+    Returns:
+    -------
+        Atom: Parsed atom.
+
+    Raises:
+    ------
+        ValueError: If the string is not a valid versioned atom.
+    """
+    atom_match = ATOM_PATTERN.match(atom)
+    if atom_match is None:
+        raise ValueError(f"Invalid atom: {atom}")
+    return Atom(
+        atom_match.group("category"),
+        atom_match.group("name"),
+        _split_version(atom_match),
+        atom_match.group("slot"),
+        atom_match.group("subslot"),
+        atom_match.group("repo"),
+    )
+
+
+def _compare(first, second) -> int:
+    """Return -1, 0 or 1 like the cmp() function."""
+    return (first > second) - (first < second)
+
+
+def _compare_numbers(first: Tuple[str, ...], second: Tuple[str, ...]) -> int:
+    """Compare numeric components of two versions, PMS algorithm 3.2."""
+    result = _compare(int(first[0]), int(second[0]))
+    if result:
+        return result
+
+    for first_part, second_part in zip(first[1:], second[1:]):
+        if first_part.startswith("0") or second_part.startswith("0"):
+            result = _compare(first_part.rstrip("0"), second_part.rstrip("0"))
+        else:
+            result = _compare(int(first_part), int(second_part))
+        if result:
+            return result
+    return _compare(len(first), len(second))
+
+
+def _compare_suffixes(
+    first: Tuple[Tuple[str, int], ...], second: Tuple[Tuple[str, int], ...]
+) -> int:
+    """Compare suffixes of two versions, PMS algorithms 3.4 and 3.5."""
+    for (first_suffix, first_number), (second_suffix, second_number) in zip(
+        first, second
+    ):
+        result = _compare(SUFFIX_ORDER[first_suffix], SUFFIX_ORDER[second_suffix])
+        if result:
+            return result
+        result = _compare(first_number, second_number)
+        if result:
+            return result
+
+    if len(first) > len(second):
+        return 1 if first[len(second)][0] == "p" else -1
+    if len(first) < len(second):
+        return -1 if second[len(first)][0] == "p" else 1
+    return 0
+
+
+@lru_cache(maxsize=65536)
+def vercmp(first: str, second: str) -> int:
+    """Compare two version strings.
+
+    Args:
+    ----
+        first (str): First version, example: 1.2.3_rc1
+        second (str): Second version, example: 1.2.3
+
+    Returns:
+    -------
+        int: -1 if first is older than second, 0 if they are equal,
+            1 if first is newer.
+
+    Raises:
+    ------
+        ValueError: If one of the strings is not a valid version.
+    """
+    first_version = parse_version(first)
+    second_version = parse_version(second)
+    result = _compare_numbers(first_version.numbers, second_version.numbers)
+    if result == 0:
+        result = _compare(first_version.letter, second_version.letter)
+    if result == 0:
+        result = _compare_suffixes(first_version.suffixes, second_version.suffixes)
+    if result == 0:
+        result = _compare(first_version.revision, second_version.revision)
+    return result
+
+
+def classify_version_change(old_version: str, new_version: str) -> str:
+    """Classify the change between two versions of a package.
+
+    Args:
+    ----
+        old_version (str): Installed version.
+        new_version (str): Version that replaces it.
+
+    Returns:
+    -------
+        str: "major" if the first version component changed, "minor" if
+            another part of the version changed, "revision" if only the
+            revision changed, "downgrade" if the new version is older,
+            "same" if versions are equal and "unknown" if a version
+            can not be parsed.
+    """
+    try:
+        result = vercmp(new_version, old_version)
+        old = parse_version(old_version)
+        new = parse_version(new_version)
+    except ValueError:
+        return "unknown"
+
+    if result < 0:
+        return "downgrade"
+    if result == 0:
+        return "same"
+    if int(old.numbers[0]) != int(new.numbers[0]):
+        return "major"
+    if (old.numbers, old.letter, old.suffixes) == (
+        new.numbers,
+        new.letter,
+        new.suffixes,
+    ):
+        return "revision"
+    return "minor"
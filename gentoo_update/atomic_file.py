@@ -0,0 +1,53 @@
+"""Atomic writes of the small files kept next to update logs.
+
+A file is written to a temporary file with a unique name in the same
+directory and moved over the target when it is complete, so readers see
+either the old or the new content. Unique names matter because a running
+update, `report` and `check` can write the same cache at the same time,
+and with one shared temporary path they truncate each other's files.
+"""
+
+import os
+import tempfile
+from contextlib import contextmanager
+from typing import IO, Iterator
+
+FILE_MODE = 0o644
+
+
+@contextmanager
+def atomic_write(file_path: str, binary: bool = False) -> Iterator[IO]:
+    """Open a temporary file that replaces `file_path` when it is closed.
+
+    The temporary file is removed if writing fails. The file gets mode
+    0644, like files created with open() and the default umask.
+
+    Args:
+    ----
+        file_path (str): Path to the file to write.
+        binary (bool): Open the file in binary mode instead of UTF-8 text.
+
+    Yields:
+    ------
+        IO: The temporary file.
+    """
+    temp_fd, temp_path = tempfile.mkstemp(
+        prefix=f"{os.path.basename(file_path)}.",
+        suffix=".tmp",
+        dir=os.path.dirname(file_path) or ".",
+    )
+    try:
+        os.fchmod(temp_fd, FILE_MODE)
+        if binary:
+            temp_file = os.fdopen(temp_fd, "wb")
+        else:
+            temp_file = os.fdopen(temp_fd, "w", encoding="utf-8")
+        with temp_file:
+            yield temp_file
+        os.replace(temp_path, file_path)
+    except BaseException:
+        try:
+            os.unlink(temp_path)
+        except FileNotFoundError:
+            pass
+        raise
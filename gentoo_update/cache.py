@@ -0,0 +1,228 @@
+"""On-disk cache of information parsed from update logs.
+
+Parsed LogInfo is stored as JSON next to the log file. A cache entry is
+used only if the size and mtime of the log did not change and it was written
+with the same cache schema and gentoo-update version.
+
+The plan of the last `gentoo-update check` run is stored in the log
+directory, so dashboards can read it without running emerge.
+"""
+
+import json
+import os
+import time
+from dataclasses import fields, is_dataclass
+from typing import Any, Dict, Optional
+
+from ._version import __version__
+from .atomic_file import atomic_write
+from .log_files import LOG_READ_ERRORS
+from .parser import Parser
+from .report_objects import (
+    DiskUsage,
+    DiskUsageStats,
+    ElogEntry,
+    FetchStats,
+    LogInfo,
+    MergeSettings,
+    PackageInfo,
+    PretendError,
+    PretendPlan,
+    PretendSection,
+    StageStats,
+    UpdateBatch,
+    UpdateEstimate,
+    UpdateSection,
+)
+
+CACHE_VERSION = 12
+CACHE_SUFFIX = ".cache.json"
+PLAN_FILENAME = "pretend_plan.json"
+CACHED_TYPES = {
+    cached_type.__name__: cached_type
+    for cached_type in (
+        DiskUsage,
+        DiskUsageStats,
+        ElogEntry,
+        FetchStats,
+        LogInfo,
+        MergeSettings,
+        PackageInfo,
+        PretendError,
+        PretendPlan,
+        PretendSection,
+        StageStats,
+        UpdateBatch,
+        UpdateEstimate,
+        UpdateSection,
+    )
+}
+
+
+def get_cache_path(log_file: str) -> str:
+    """Get path of the cache file that belongs to a log file."""
+    return f"{log_file}{CACHE_SUFFIX}"
+
+
+def _encode_report_object(report_object: Any) -> Dict:
+    """Convert report dataclasses, including extra attributes, to a dict."""
+    type_name = type(report_object).__name__
+    if is_dataclass(report_object) and type_name in CACHED_TYPES:
+        return {"__type__": type_name, **vars(report_object)}
+    raise TypeError(f"Object of type {type_name} can not be cached")
+
+
+def _decode_report_object(data: Dict) -> Any:
+    """Convert a dict created by _encode_report_object back to a dataclass."""
+    type_name = data.pop("__type__", None)
+    if type_name is None:
+        return data
+
+    report_type = CACHED_TYPES[type_name]
+    field_names = [field.name for field in fields(report_type)]
+    report_object = report_type(**{name: data.pop(name) for name in field_names})
+    for attr_name, attr_value in data.items():
+        setattr(report_object, attr_name, attr_value)
+    return report_object
+
+
+def _get_log_key(log_file: str) -> Dict:
+    """Get values that identify the current state of a log file."""
+    log_stat = os.stat(log_file)
+    return {
+        "version": CACHE_VERSION,
+        "gentoo_update_version": __version__,
+        "log_path": os.path.abspath(log_file),
+        "log_size": log_stat.st_size,
+        "log_mtime_ns": log_stat.st_mtime_ns,
+    }
+
+
+def load_cached_log_info(log_file: str) -> Optional[LogInfo]:
+    """Load LogInfo from cache if the cache matches the log file.
+
+    Args:
+    ----
+        log_file (str): Path to the log file.
+
+    Returns:
+    -------
+        Optional[LogInfo]: Cached information, None if the cache is missing,
+            outdated or was written by a different version.
+    """
+    try:
+        with open(get_cache_path(log_file), encoding="utf-8") as cache_file:
+            cache = json.load(cache_file, object_hook=_decode_report_object)
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+    if not isinstance(cache, dict) or cache.get("key") != _get_log_key(log_file):
+        return None
+
+    log_info = cache.get("log_info")
+    return log_info if isinstance(log_info, LogInfo) else None
+
+
+def save_log_info_cache(
+    log_file: str, log_info: LogInfo, log_key: Optional[Dict] = None
+) -> None:
+    """Atomically write LogInfo of a log file to cache.
+
+    Args:
+    ----
+        log_file (str): Path to the log file.
+        log_info (LogInfo): Information parsed from the log file.
+        log_key (Optional[Dict]): State of the log taken before it was
+            parsed, the current state if not given. A log that grows
+            while it is parsed must not be cached under its new size.
+    """
+    cache = {"key": log_key or _get_log_key(log_file), "log_info": log_info}
+    with atomic_write(get_cache_path(log_file)) as cache_file:
+        json.dump(cache, cache_file, default=_encode_report_object)
+
+
+def load_log_info(log_file: str) -> LogInfo:
+    """Get information about the update from cache or by parsing the log.
+
+    Args:
+    ----
+        log_file (str): Path to the log file.
+
+    Returns:
+    -------
+        LogInfo: Dataclass containing parsed data from all sections.
+
+    Raises:
+    ------
+        OSError: If the log can not be read, or a compressed log is
+            truncated or damaged.
+    """
+    log_info = load_cached_log_info(log_file)
+    if log_info is not None:
+        return log_info
+
+    log_key = _get_log_key(log_file)
+    try:
+        log_info = Parser(log_file, mode="index").extract_info_for_report()
+    except OSError:
+        raise
+    except LOG_READ_ERRORS as error:
+        raise OSError(
+            f"The log file {log_file} is truncated or damaged: {error}"
+        ) from error
+    try:
+        save_log_info_cache(log_file, log_info, log_key)
+    except OSError:
+        pass
+    return log_info
+
+
+def save_pretend_plan(log_dir: str, log_file: str, plan: PretendPlan) -> str:
+    """Atomically write the plan of a check run to the log directory.
+
+    Args:
+    ----
+        log_dir (str): Directory where gentoo_update stores logs.
+        log_file (str): Path to the log of the check run.
+        plan (PretendPlan): Plan parsed from the log.
+
+    Returns:
+    -------
+        str: Path to the plan file.
+    """
+    plan_path = os.path.join(log_dir, PLAN_FILENAME)
+    cache = {
+        "version": CACHE_VERSION,
+        "gentoo_update_version": __version__,
+        "created": time.time(),
+        "log_path": os.path.abspath(log_file),
+        "plan": plan,
+    }
+    with atomic_write(plan_path) as plan_file:
+        json.dump(cache, plan_file, default=_encode_report_object)
+    return plan_path
+
+
+def load_pretend_plan(log_dir: str) -> Optional[PretendPlan]:
+    """Load the plan of the last check run.
+
+    Args:
+    ----
+        log_dir (str): Directory where gentoo_update stores logs.
+
+    Returns:
+    -------
+        Optional[PretendPlan]: Cached plan, None if it is missing
+            or was written with a different cache schema.
+    """
+    try:
+        with open(os.path.join(log_dir, PLAN_FILENAME), encoding="utf-8") as plan_file:
+            cache = json.load(plan_file, object_hook=_decode_report_object)
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+    if not isinstance(cache, dict) or cache.get("version") != CACHE_VERSION:
+        return None
+
+    plan = cache.get("plan")
+    return plan if isinstance(plan, PretendPlan) else None
@@ -0,0 +1,178 @@
+"""Checkpoints of update runs, used by `gentoo-update update --resume`.
+
+The checkpoint is saved next to the update log when a stage starts and
+when it finishes, and is removed when the run succeeds. A run that was
+interrupted by an error, a reboot or a power loss leaves the checkpoint
+behind, so the next run can skip the stages that have completed and
+append to the same log.
+"""
+
+import json
+import os
+import threading
+from typing import Dict, List, Optional
+
+from .atomic_file import atomic_write
+from .log_files import is_log_file
+from .report_objects import StageStats
+
+CHECKPOINT_SUFFIX = ".checkpoint.json"
+CHECKPOINT_VERSION = 1
+
+
+def get_checkpoint_path(log_file: str) -> str:
+    """Get path of the checkpoint that belongs to a log file."""
+    return f"{log_file}{CHECKPOINT_SUFFIX}"
+
+
+class Checkpoint:
+    """Progress of an update run.
+
+    Attributes
+    ----------
+        log_file (str): Path to the update log.
+        args (List[str]): Arguments of updater.sh.
+        stages (List[str]): Stages selected for the run.
+        completed (List[StageStats]): Stages that have finished successfully.
+        running (List[str]): Stages that have started but not finished.
+        failed (List[str]): Stages that have finished with an error.
+        started_at (Dict[str, float]): Unix time when stages have started.
+        batches (List[List[str]]): Package atoms of every batch of a batched
+            update, empty if the update is merged at once.
+        completed_batches (int): Amount of batches that have been merged.
+    """
+
+    def __init__(self, log_file: str, args: List[str], stages: List[str]) -> None:
+        """Initialize Checkpoint class."""
+        self.log_file = log_file
+        self.args = list(args)
+        self.stages = list(stages)
+        self.completed: List[StageStats] = []
+        self.running: List[str] = []
+        self.failed: List[str] = []
+        self.started_at: Dict[str, float] = {}
+        self.batches: List[List[str]] = []
+        self.completed_batches = 0
+        self.lock = threading.Lock()
+
+    @classmethod
+    def load(cls, log_file: str) -> Optional["Checkpoint"]:
+        """Load the checkpoint of a log file.
+
+        Args:
+        ----
+            log_file (str): Path to the update log.
+
+        Returns:
+        -------
+            Optional[Checkpoint]: Saved progress, None if there is no valid
+                checkpoint.
+        """
+        try:
+            with open(get_checkpoint_path(log_file), encoding="utf-8") as saved_file:
+                saved = json.load(saved_file)
+            if saved.get("version") != CHECKPOINT_VERSION:
+                return None
+            checkpoint = cls(log_file, saved["args"], saved["stages"])
+            checkpoint.completed = [StageStats(**stats) for stats in saved["completed"]]
+            checkpoint.running = saved["running"]
+            checkpoint.failed = saved["failed"]
+            checkpoint.started_at = saved["started_at"]
+            checkpoint.batches = saved.get("batches", [])
+            checkpoint.completed_batches = saved.get("completed_batches", 0)
+        except (OSError, ValueError, KeyError, TypeError, AttributeError):
+            return None
+        return checkpoint
+
+    def save(self) -> None:
+        """Atomically write the checkpoint."""
+        checkpoint_path = get_checkpoint_path(self.log_file)
+        with self.lock:
+            saved = {
+                "version": CHECKPOINT_VERSION,
+                "args": self.args,
+                "stages": self.stages,
+                "completed": [vars(stats) for stats in self.completed],
+                "running": self.running,
+                "failed": self.failed,
+                "started_at": self.started_at,
+                "batches": self.batches,
+                "completed_batches": self.completed_batches,
+            }
+            with atomic_write(checkpoint_path) as saved_file:
+                json.dump(saved, saved_file)
+
+    def remove(self) -> None:
+        """Remove the checkpoint after the run has succeeded."""
+        try:
+            os.remove(get_checkpoint_path(self.log_file))
+        except FileNotFoundError:
+            pass
+
+    def start_stage(self, stage: str, started_at: float) -> None:
+        """Record that a stage has started at a Unix time."""
+        with self.lock:
+            self.running.append(stage)
+            self.started_at[stage] = started_at
+        self.save()
+
+    def finish_stage(self, stats: StageStats) -> None:
+        """Record that a stage has finished."""
+        with self.lock:
+            if stats.stage in self.running:
+                self.running.remove(stats.stage)
+            if stats.exit_code == 0:
+                self.completed.append(stats)
+            else:
+                self.failed.append(stats.stage)
+        self.save()
+
+    def start_batches(self, batches: List[List[str]]) -> None:
+        """Record the batches of a batched update before the first one is merged."""
+        with self.lock:
+            self.batches = batches
+            self.completed_batches = 0
+        self.save()
+
+    def finish_batch(self) -> None:
+        """Record that the next batch has been merged."""
+        with self.lock:
+            self.completed_batches += 1
+        self.save()
+
+    def get_completed_stages(self) -> List[str]:
+        """Get stages that do not need to run again."""
+        return [stats.stage for stats in self.completed]
+
+    def get_interrupted_stages(self) -> List[str]:
+        """Get stages that have failed or were running when the run stopped."""
+        return self.failed + self.running
+
+    def reset_interrupted_stages(self) -> None:
+        """Forget interrupted stages before they run again."""
+        with self.lock:
+            self.failed = []
+            self.running = []
+
+
+def find_resumable_log(log_dir: str) -> Optional[str]:
+    """Find the update log of an interrupted run.
+
+    Only the newest update log is checked, an older interrupted run
+    was followed by another update and is not resumed.
+
+    Args:
+    ----
+        log_dir (str): Directory where gentoo_update stores logs.
+
+    Returns:
+    -------
+        Optional[str]: Path to the log, None if the last run has completed.
+    """
+    logs = sorted(name for name in os.listdir(log_dir) if is_log_file(name))
+    if not logs:
+        return None
+    log_file = os.path.join(log_dir, logs[-1])
+    if not os.path.exists(get_checkpoint_path(log_file)):
+        return None
+    return log_file
@@ -0,0 +1,177 @@
+"""Collect disk usage of mounted filesystems without running df.
+
+Mount points are read from /proc/self/mountinfo and every one of them
+is measured with a single statvfs call, so disk usage is recorded in
+exact bytes and costs no subprocesses.
+
+mountinfo line that is used, see proc(5):
+    28 1 254:0 / / rw,relatime - ext4 /dev/vda rw,discard
+"""
+
+import os
+import re
+from typing import Callable, List, Set
+
+from .report_objects import DiskUsageStats
+from .sizes import format_size
+
+MOUNTINFO = "/proc/self/mountinfo"
+FILESYSTEMS = "/proc/filesystems"
+EXCLUDED_MOUNT_POINTS = ("/tmp", "/boot/efi")
+DEVICELESS_FILESYSTEMS = ("btrfs", "zfs", "nfs", "nfs4", "cifs")
+GIB = 1024 * 1024 * 1024
+MOUNT_ESCAPE_PATTERN = re.compile(r"\\([0-7]{3})")
+
+
+def _unescape_mount_field(field: str) -> str:
+    r"""Decode octal escapes of mountinfo fields, like \040 for a space."""
+    return MOUNT_ESCAPE_PATTERN.sub(
+        lambda match_escape: chr(int(match_escape.group(1), 8)), field
+    )
+
+
+def read_pseudo_filesystems(filesystems: str = FILESYSTEMS) -> Set[str]:
+    """Read types of filesystems that are not backed by a disk, like proc.
+
+    Args:
+    ----
+        filesystems (str): Path to /proc/filesystems.
+
+    Returns:
+    -------
+        Set[str]: Filesystem types marked with nodev, except network
+            and pool filesystems from DEVICELESS_FILESYSTEMS.
+    """
+    pseudo_filesystems = set()
+    try:
+        with open(filesystems, encoding="utf-8") as filesystems_file:
+            for line in filesystems_file:
+                flag, _, fs_type = line.rstrip("\n").partition("\t")
+                if flag == "nodev" and fs_type not in DEVICELESS_FILESYSTEMS:
+                    pseudo_filesystems.add(fs_type)
+    except OSError:
+        pass
+    return pseudo_filesystems
+
+
+def read_mount_points(
+    mountinfo: str = MOUNTINFO, filesystems: str = FILESYSTEMS
+) -> List[str]:
+    """Get writable mount points of disk backed filesystems.
+
+    Pseudo filesystems, read-only mounts, EXCLUDED_MOUNT_POINTS and
+    repeated mounts of the same device (bind mounts) are skipped.
+
+    Args:
+    ----
+        mountinfo (str): Path to /proc/self/mountinfo.
+        filesystems (str): Path to /proc/filesystems.
+
+    Returns:
+    -------
+        List[str]: Mount points in mount order, ["/"] if none were found.
+    """
+    pseudo_filesystems = read_pseudo_filesystems(filesystems)
+    mount_points = []
+    devices = set()
+    try:
+        with open(mountinfo, encoding="utf-8") as mountinfo_file:
+            for line in mountinfo_file:
+                mount_fields, _, fs_fields = line.partition(" - ")
+                mount_fields = mount_fields.split()
+                fs_fields = fs_fields.split()
+                if len(mount_fields) < 6 or not fs_fields:
+                    continue
+
+                device = mount_fields[2]
+                mount_point = _unescape_mount_field(mount_fields[4])
+                options = mount_fields[5].split(",")
+                if fs_fields[0] in pseudo_filesystems or "ro" in options:
+                    continue
+                if mount_point in EXCLUDED_MOUNT_POINTS or device in devices:
+                    continue
+                devices.add(device)
+                mount_points.append(mount_point)
+    except OSError:
+        pass
+    return mount_points or ["/"]
+
+
+def get_disk_usage(mount_point: str) -> DiskUsageStats:
+    """Measure disk usage of one mount point the way df does.
+
+    Args:
+    ----
+        mount_point (str): Mount point.
+
+    Returns:
+    -------
+        DiskUsageStats: Sizes in bytes and as human readable strings.
+
+    Raises:
+    ------
+        OSError: If statvfs fails.
+    """
+    fs_stats = os.statvfs(mount_point)
+    total_bytes = fs_stats.f_blocks * fs_stats.f_frsize
+    used_bytes = (fs_stats.f_blocks - fs_stats.f_bfree) * fs_stats.f_frsize
+    free_bytes = fs_stats.f_bavail * fs_stats.f_frsize
+
+    available = used_bytes + free_bytes
+    percent_used = -(-used_bytes * 100 // available) if available else 0
+    return DiskUsageStats(
+        mount_point,
+        format_size(total_bytes),
+        format_size(used_bytes),
+        format_size(free_bytes),
+        f"{percent_used}%",
+        total_bytes,
+        used_bytes,
+        free_bytes,
+    )
+
+
+def log_disk_usage(log: Callable[[str], None]) -> int:
+    """Log disk usage of every mount point, replaces check_disk_usage of updater.sh.
+
+    Args:
+    ----
+        log (Callable[[str], None]): Logs one line.
+
+    Returns:
+    -------
+        int: Exit code of the stage, always 0.
+    """
+    for mount_point in read_mount_points():
+        try:
+            log(get_disk_usage(mount_point).to_log_line())
+        except OSError as error:
+            log(f"Warning: disk usage of {mount_point} can not be read: {error}")
+    return 0
+
+
+def check_free_space(
+    limit_gib: float, log: Callable[[str], None], mount_point: str = "/"
+) -> int:
+    """Check that a mount point has more free space than the limit.
+
+    Replaces check_root_part_limit of updater.sh.
+
+    Args:
+    ----
+        limit_gib (float): Required free space in GiB.
+        log (Callable[[str], None]): Logs one line.
+        mount_point (str): Mount point to check.
+
+    Returns:
+    -------
+        int: Exit code of the stage, 1 if there is not enough free space.
+    """
+    free_gib = get_disk_usage(mount_point).free_bytes / GIB
+    if free_gib > limit_gib:
+        log("There is sufficient free space.")
+        log(f"Free space: {free_gib:.2f} GB")
+        return 0
+    log("There is no sufficient free space.")
+    log(f"Free space: {free_gib:.2f} GB")
+    return 1
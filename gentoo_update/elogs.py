@@ -0,0 +1,206 @@
+"""Read elog files of packages merged during an update.
+
+Portage saves elog messages of every merge in ELOG_DIR, either as
+category:package-version:date.log or, with FEATURES=split-elog, as
+category/package-version:date.log. The directory is scanned with
+os.scandir and only files modified after the update started are read,
+each one up to MAX_ELOG_BYTES, so hosts with years of elogs
+do not slow the stage down.
+
+Every elog is written to the log as:
+    >>> Log filename: /var/log/portage/elog/dev-libs:openssl-3.0.11:20231012-101010.log
+    >>> Log package: dev-libs/openssl
+    >>> Log start <<<
+    ...
+    >>> Log truncated, 1024 bytes not shown <<<
+    >>> Log end <<<
+"""
+
+import os
+from typing import Callable, Iterator, List, Optional
+
+from .atom import parse_atom
+from .report_objects import ElogEntry
+
+ELOG_DIR = "/var/log/portage/elog"
+ELOG_SUFFIX = ".log"
+MAX_ELOG_BYTES = 64 * 1024
+MAX_ELOGS_BYTES = 4 * 1024 * 1024
+FILENAME_PREFIX = ">>> Log filename: "
+PACKAGE_PREFIX = ">>> Log package: "
+TRUNCATED_PREFIX = ">>> Log truncated, "
+LOG_START = ">>> Log start <<<"
+LOG_END = ">>> Log end <<<"
+MTIME_SLACK = 1.0
+
+
+def get_elog_package(file_path: str) -> Optional[str]:
+    """Get the package name from the path of an elog file.
+
+    Args:
+    ----
+        file_path (str): Path to the elog file.
+
+    Returns:
+    -------
+        Optional[str]: Package name like dev-libs/openssl, None if
+            the file name does not contain a package atom, like summary.log.
+    """
+    file_name = os.path.basename(file_path)[: -len(ELOG_SUFFIX)]
+    atom = file_name.rpartition(":")[0]
+    if ":" in atom:
+        atom = atom.replace(":", "/", 1)
+    else:
+        category = os.path.basename(os.path.dirname(file_path))
+        atom = f"{category}/{atom}"
+    try:
+        return parse_atom(atom).package_name
+    except ValueError:
+        return None
+
+
+def scan_elogs(since: float, elog_dir: str = ELOG_DIR) -> List[os.DirEntry]:
+    """Find elog files modified after a point in time.
+
+    File times come from a coarser clock than time.time(), so files
+    modified up to MTIME_SLACK seconds before since are found too.
+
+    Args:
+    ----
+        since (float): Unix time, older files are skipped.
+        elog_dir (str): Directory with elog files.
+
+    Returns:
+    -------
+        List[os.DirEntry]: Elog files, oldest first.
+    """
+    elogs = []
+    directories = [elog_dir]
+    while directories:
+        try:
+            with os.scandir(directories.pop()) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        if os.path.dirname(entry.path) == elog_dir:
+                            directories.append(entry.path)
+                    elif entry.name.endswith(ELOG_SUFFIX) and entry.is_file():
+                        if entry.stat().st_mtime >= since - MTIME_SLACK:
+                            elogs.append(entry)
+        except OSError:
+            continue
+    return sorted(elogs, key=lambda entry: entry.stat().st_mtime)
+
+
+def iter_elog_lines(file_path: str, max_bytes: int) -> Iterator[str]:
+    """Read lines of an elog file up to a size limit.
+
+    Args:
+    ----
+        file_path (str): Path to the elog file.
+        max_bytes (int): Maximum amount of bytes to read.
+
+    Yields:
+    ------
+        str: Lines without the trailing newline.
+    """
+    with open(file_path, "rb") as elog_file:
+        for raw_line in elog_file:
+            max_bytes -= len(raw_line)
+            if max_bytes < 0:
+                return
+            yield raw_line.rstrip(b"\n").decode("utf-8", "replace")
+
+
+def log_elogs(
+    since: float, log: Callable[[str], None], elog_dir: str = ELOG_DIR
+) -> int:
+    """Log elog files modified after a point in time.
+
+    Replaces read_elogs of updater.sh, which ran stat and cat for every file.
+
+    Args:
+    ----
+        since (float): Unix time when the update started.
+        log (Callable[[str], None]): Logs one line.
+        elog_dir (str): Directory with elog files.
+
+    Returns:
+    -------
+        int: Exit code of the stage, always 0.
+    """
+    if not os.path.isdir(elog_dir):
+        log("Elog directory does not exist.")
+        return 0
+
+    budget = MAX_ELOGS_BYTES
+    for entry in scan_elogs(since, elog_dir):
+        max_bytes = min(MAX_ELOG_BYTES, budget)
+        logged_bytes = 0
+        log("")
+        log(f"{FILENAME_PREFIX}{entry.path}")
+        package_name = get_elog_package(entry.path)
+        if package_name:
+            log(f"{PACKAGE_PREFIX}{package_name}")
+        log(LOG_START)
+        try:
+            for line in iter_elog_lines(entry.path, max_bytes):
+                logged_bytes += len(line.encode("utf-8", "replace")) + 1
+                log(line)
+        except OSError as error:
+            log(f"Elog can not be read: {error}")
+        truncated_bytes = entry.stat().st_size - logged_bytes
+        if truncated_bytes > 0:
+            log(f"{TRUNCATED_PREFIX}{truncated_bytes} bytes not shown <<<")
+        log(LOG_END)
+        log("")
+        budget -= logged_bytes
+    return 0
+
+
+class ElogCollector:
+    """Collect ElogEntry objects from lines written by log_elogs.
+
+    Attributes
+    ----------
+        elogs (List[ElogEntry]): Elogs that have been read completely.
+        current (Optional[ElogEntry]): Elog whose lines are being read.
+        in_content (bool): True between the start and the end markers.
+    """
+
+    def __init__(self) -> None:
+        """Initialize ElogCollector class."""
+        self.elogs: List[ElogEntry] = []
+        self.current: Optional[ElogEntry] = None
+        self.in_content = False
+
+    def feed(self, line: str) -> Optional[ElogEntry]:
+        """Process one line of the read elogs section.
+
+        Args:
+        ----
+            line (str): Line of the section.
+
+        Returns:
+        -------
+            Optional[ElogEntry]: Elog that ends with this line.
+        """
+        if self.current is None:
+            if line.startswith(FILENAME_PREFIX):
+                file_name = line[len(FILENAME_PREFIX) :]
+                self.current = ElogEntry(file_name, None, [])
+            return None
+
+        if line == LOG_END:
+            elog, self.current = self.current, None
+            self.in_content = False
+            self.elogs.append(elog)
+            return elog
+        if line == LOG_START:
+            self.in_content = True
+        elif not self.in_content and line.startswith(PACKAGE_PREFIX):
+            self.current.package_name = line[len(PACKAGE_PREFIX) :]
+        elif line.startswith(TRUNCATED_PREFIX) and line.endswith(" not shown <<<"):
+            self.current.truncated_bytes = int(line[len(TRUNCATED_PREFIX) :].split()[0])
+        elif self.in_content:
+            self.current.messages.append(line)
+        return None
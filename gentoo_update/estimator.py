@@ -0,0 +1,241 @@
+"""Estimate update duration from the merge history in emerge.log.
+
+emerge.log can grow to hundreds of megabytes, so it is read backwards
+from the end with seek, and merge durations are kept in a small index in
+the gentoo-update log directory. Each refresh reads only the part of
+emerge.log written since the previous refresh. The index is rebuilt
+from the newest MAX_SCAN_BYTES if emerge.log was rotated or truncated.
+
+emerge.log lines that are used:
+    1697100000:  >>> emerge (1 of 4) dev-libs/openssl-3.0.11::gentoo to /
+    1697100300:  ::: completed emerge (1 of 4) dev-libs/openssl-3.0.11::gentoo to /
+"""
+
+import json
+import os
+import re
+import statistics
+from typing import Dict, Iterator, List, Optional
+
+from .atom import parse_atom
+from .atomic_file import atomic_write
+from .report_objects import PackageInfo, UpdateEstimate
+
+EMERGE_LOG = "/var/log/emerge.log"
+INDEX_FILENAME = "merge_durations.json"
+INDEX_VERSION = 1
+MAX_SCAN_BYTES = 64 * 1024 * 1024
+MAX_SAMPLES = 5
+READ_CHUNK_SIZE = 64 * 1024
+MERGE_START_PATTERN = re.compile(rb"^(\d+):\s+>>> emerge \(\d+ of \d+\) (\S+) to ")
+MERGE_END_PATTERN = re.compile(
+    rb"^(\d+):\s+::: completed emerge \(\d+ of \d+\) (\S+) to "
+)
+
+
+def iter_lines_backwards(
+    file_path: str, start: int, end: int, skip_first_line: bool = False
+) -> Iterator[bytes]:
+    """Read lines of a file region from the last one to the first one.
+
+    Only READ_CHUNK_SIZE bytes are kept in memory at a time.
+
+    Args:
+    ----
+        file_path (str): Path to the file.
+        start (int): Offset where the region starts.
+        end (int): Offset where the region ends.
+        skip_first_line (bool): Skip the first line of the region,
+            used when start is not at the beginning of a line.
+
+    Yields:
+    ------
+        bytes: Lines without the trailing newline, newest first.
+    """
+    with open(file_path, "rb") as read_file:
+        position = end
+        remainder = b""
+        while position > start:
+            read_size = min(READ_CHUNK_SIZE, position - start)
+            position -= read_size
+            read_file.seek(position)
+            lines = (read_file.read(read_size) + remainder).split(b"\n")
+            remainder = lines.pop(0)
+            for line in reversed(lines):
+                if line:
+                    yield line
+        if remainder and not skip_first_line:
+            yield remainder
+
+
+class MergeDurationIndex:
+    """Recent merge durations of packages, built from emerge.log.
+
+    Attributes
+    ----------
+        index_path (str): Path to the index file.
+        emerge_log (str): Path to emerge.log.
+        durations (Dict[str, List[int]]): Durations in seconds per package
+            name, newest first, at most MAX_SAMPLES per package.
+        log_id (List[int]): Device and inode of emerge.log that was indexed.
+        offset (int): Size of emerge.log that has been indexed.
+    """
+
+    def __init__(self, log_dir: str, emerge_log: str = EMERGE_LOG) -> None:
+        """Initialize MergeDurationIndex class and load the saved index."""
+        self.index_path = os.path.join(log_dir, INDEX_FILENAME)
+        self.emerge_log = emerge_log
+        self.durations: Dict[str, List[int]] = {}
+        self.log_id: List[int] = []
+        self.offset = 0
+        self._load()
+
+    def _load(self) -> None:
+        """Load the saved index if it was built from the same emerge.log."""
+        try:
+            with open(self.index_path, encoding="utf-8") as index_file:
+                index = json.load(index_file)
+        except (OSError, ValueError):
+            return
+
+        if not isinstance(index, dict) or index.get("version") != INDEX_VERSION:
+            return
+        if index.get("emerge_log") != os.path.abspath(self.emerge_log):
+            return
+        self.durations = index.get("durations", {})
+        self.log_id = index.get("log_id", [])
+        self.offset = index.get("offset", 0)
+
+    def save(self) -> None:
+        """Atomically write the index."""
+        index = {
+            "version": INDEX_VERSION,
+            "emerge_log": os.path.abspath(self.emerge_log),
+            "log_id": self.log_id,
+            "offset": self.offset,
+            "durations": self.durations,
+        }
+        with atomic_write(self.index_path) as index_file:
+            json.dump(index, index_file)
+
+    def _read_durations(
+        self, start: int, end: int, skip_first_line: bool
+    ) -> Dict[str, List[int]]:
+        """Find merge durations in a region of emerge.log, newest first."""
+        completed: Dict[bytes, int] = {}
+        durations: Dict[str, List[int]] = {}
+        for line in iter_lines_backwards(self.emerge_log, start, end, skip_first_line):
+            match_end = MERGE_END_PATTERN.match(line)
+            if match_end:
+                completed[match_end.group(2)] = int(match_end.group(1))
+                continue
+
+            match_start = MERGE_START_PATTERN.match(line)
+            if match_start is None:
+                continue
+            end_time = completed.pop(match_start.group(2), None)
+            if end_time is None:
+                continue
+            try:
+                package_name = parse_atom(
+                    match_start.group(2).decode("utf-8", "replace")
+                ).package_name
+            except ValueError:
+                continue
+            samples = durations.setdefault(package_name, [])
+            if len(samples) < MAX_SAMPLES:
+                samples.append(end_time - int(match_start.group(1)))
+        return durations
+
+    def refresh(self) -> bool:
+        """Add merges written to emerge.log since the last refresh.
+
+        Returns
+        -------
+            bool: True if the index has changed.
+
+        Raises
+        ------
+            OSError: If emerge.log can not be read.
+        """
+        log_stat = os.stat(self.emerge_log)
+        log_id = [log_stat.st_dev, log_stat.st_ino]
+        skip_first_line = False
+        if log_id != self.log_id or log_stat.st_size < self.offset:
+            self.durations = {}
+            self.log_id = log_id
+            self.offset = max(0, log_stat.st_size - MAX_SCAN_BYTES)
+            skip_first_line = self.offset > 0
+
+        if log_stat.st_size == self.offset:
+            return False
+
+        new_durations = self._read_durations(
+            self.offset, log_stat.st_size, skip_first_line
+        )
+        for package_name, samples in new_durations.items():
+            old_samples = self.durations.get(package_name, [])
+            self.durations[package_name] = (samples + old_samples)[:MAX_SAMPLES]
+        self.offset = log_stat.st_size
+        return True
+
+    def get_duration(self, package_name: str) -> Optional[int]:
+        """Get typical merge duration of a package, the median of recent merges."""
+        samples = self.durations.get(package_name)
+        if not samples:
+            return None
+        return int(statistics.median(samples))
+
+    def estimate(self, packages: List[PackageInfo]) -> UpdateEstimate:
+        """Estimate how long merging packages takes.
+
+        Args:
+        ----
+            packages (List[PackageInfo]): Packages from the pretend plan,
+                only ebuilds are merged.
+
+        Returns:
+        -------
+            UpdateEstimate: Sum of durations of packages with merge history.
+        """
+        seconds = 0
+        known_packages = 0
+        unknown_packages = 0
+        for package in packages:
+            if package.package_type != "ebuild":
+                continue
+            duration = self.get_duration(package.package_name)
+            if duration is None:
+                unknown_packages += 1
+            else:
+                seconds += duration
+                known_packages += 1
+        return UpdateEstimate(seconds, known_packages, unknown_packages)
+
+
+def estimate_update(
+    log_dir: str, packages: List[PackageInfo], emerge_log: str = EMERGE_LOG
+) -> UpdateEstimate:
+    """Refresh the merge duration index and estimate an update.
+
+    Args:
+    ----
+        log_dir (str): Directory where gentoo_update stores logs and the index.
+        packages (List[PackageInfo]): Packages from the pretend plan.
+        emerge_log (str): Path to emerge.log.
+
+    Returns:
+    -------
+        UpdateEstimate: Estimated duration of the update.
+
+    Raises:
+    ------
+        OSError: If emerge.log can not be read.
+    """
+    index = MergeDurationIndex(log_dir, emerge_log)
+    if index.refresh():
+        try:
+            index.save()
+        except OSError:
+            pass
+    return index.estimate(packages)
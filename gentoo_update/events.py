@@ -0,0 +1,201 @@
+"""Machine readable event stream that is written next to the update log.
+
+Every line of the stream is a JSON object with an "event" type:
+    run_start, run_end: beginning and end of a gentoo-update run
+    stage_start, stage_end: updater stage with its exit code
+    section: {{ SECTION }} marker
+    status: status message of the update, like "update was successful"
+    update_target: packages passed to emerge
+    package: package line from emerge output, parsed into PackageInfo fields
+    merge: ">>> Emerging" and ">>> Completed" lines of emerge
+    disk_usage: disk usage of one mount point
+    update_estimate: estimated duration of the update
+    update_batch: progress of one batch of a batched update
+    update_fetch: distfiles fetched in the background during the update
+    update_settings: --jobs, --load-average and MAKEOPTS picked for the merge
+    elog: elog file of a merged package, sent when the whole file was logged
+"""
+
+import json
+import logging
+import re
+import threading
+import time
+from typing import Dict, Iterator, List
+
+from .elogs import ElogCollector
+from .log_index import get_section_name
+from .parser_package import PackageParser
+from .report_objects import (
+    DiskUsageStats,
+    FetchStats,
+    MergeSettings,
+    UpdateBatch,
+    UpdateEstimate,
+)
+
+EVENTS_VERSION = 1
+EVENTS_SUFFIX = ".events.jsonl"
+STATUS_MESSAGES = (
+    "emerge pretend was successful, updating...",
+    "emerge pretend has failed, exiting",
+    "There are no packages to update, skipping...",
+    "update was successful",
+    "Nothing to merge; quitting",
+)
+PACKAGE_SECTIONS = ("update_system",)
+ELOG_SECTIONS = ("read_elogs",)
+MERGE_PATTERN = re.compile(r"^>>> (Emerging|Completed) \((\d+) of (\d+)\) (\S+)")
+
+
+def get_events_path(log_file: str) -> str:
+    """Get path of the event stream that belongs to a log file."""
+    return f"{log_file}{EVENTS_SUFFIX}"
+
+
+def read_events(log_file: str) -> Iterator[Dict]:
+    """Read the event stream of a log file.
+
+    Args:
+    ----
+        log_file (str): Path to the log file.
+
+    Yields:
+    ------
+        Dict: One event, lines that are not valid JSON are skipped.
+
+    Raises:
+    ------
+        OSError: If the event stream does not exist.
+    """
+    with open(get_events_path(log_file), encoding="utf-8") as events_file:
+        for line in events_file:
+            try:
+                event = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(event, dict):
+                yield event
+
+
+class EventWriter:
+    """Append events to the event stream of a log file.
+
+    Attributes
+    ----------
+        events_path (str): Path to the event stream.
+        events_file (TextIO): Opened event stream.
+    """
+
+    def __init__(self, log_file: str) -> None:
+        """Initialize EventWriter class."""
+        self.events_path = get_events_path(log_file)
+        self.events_file = open(self.events_path, "a", encoding="utf-8")
+        self.lock = threading.Lock()
+
+    def emit(self, event_type: str, **event_fields) -> None:
+        """Write one event.
+
+        Args:
+        ----
+            event_type (str): Type of the event.
+            **event_fields: Data of the event, must be JSON serializable.
+        """
+        event = {"event": event_type, "time": time.time(), **event_fields}
+        line = json.dumps(event, default=vars)
+        with self.lock:
+            if not self.events_file.closed:
+                self.events_file.write(f"{line}\n")
+                self.events_file.flush()
+
+    def close(self) -> None:
+        """Close the event stream."""
+        with self.lock:
+            self.events_file.close()
+
+
+class EventLogHandler(logging.Handler):
+    """Logging handler that turns log lines into typed events.
+
+    Attributes
+    ----------
+        writer (EventWriter): Writer of the event stream.
+        section_name (str): Name of the section that is being logged.
+    """
+
+    def __init__(self, writer: EventWriter) -> None:
+        """Initialize EventLogHandler class."""
+        super().__init__(logging.INFO)
+        self.writer = writer
+        self.section_name = "beginning"
+        self.package_parser = PackageParser()
+        self.elog_collector = ElogCollector()
+
+    def _get_events(self, line: str) -> List[Dict]:
+        """Get events for one line of the log."""
+        section_name = get_section_name(line)
+        if section_name:
+            self.section_name = section_name
+            return [{"event": "section", "name": section_name}]
+
+        section = self.section_name
+        if section in ELOG_SECTIONS:
+            elog = self.elog_collector.feed(line)
+            if elog:
+                return [{"event": "elog", "section": section, "elog": elog}]
+            return []
+        if line in STATUS_MESSAGES:
+            return [{"event": "status", "section": section, "message": line}]
+        if line.startswith("Updating: "):
+            targets = line[len("Updating: ") :].split()
+            return [{"event": "update_target", "section": section, "targets": targets}]
+        estimate = UpdateEstimate.from_log_line(line)
+        if estimate:
+            return [
+                {"event": "update_estimate", "section": section, "estimate": estimate}
+            ]
+        batch = UpdateBatch.from_log_line(line)
+        if batch:
+            return [{"event": "update_batch", "section": section, "batch": batch}]
+        fetch = FetchStats.from_log_line(line)
+        if fetch:
+            return [{"event": "update_fetch", "section": section, "fetch": fetch}]
+        settings = MergeSettings.from_log_line(line)
+        if settings:
+            return [
+                {"event": "update_settings", "section": section, "settings": settings}
+            ]
+        if line.startswith("Disk usage for") and " ===> " in line:
+            disk_usage = DiskUsageStats.from_log_line(line)
+            return [{"event": "disk_usage", "section": section, "stats": disk_usage}]
+
+        match_merge = MERGE_PATTERN.match(line)
+        if match_merge:
+            action, number, total, package = match_merge.groups()
+            return [
+                {
+                    "event": "merge",
+                    "section": section,
+                    "action": action.lower(),
+                    "number": int(number),
+                    "total": int(total),
+                    "package": package,
+                }
+            ]
+
+        if section in PACKAGE_SECTIONS and line.startswith("["):
+            return [
+                {"event": "package", "section": section, "package": package}
+                for package in self.package_parser.parse_update_details([line])
+            ]
+        return []
+
+    def emit(self, record: logging.LogRecord) -> None:
+        """Write events for a log record, the same line that Parser would see."""
+        try:
+            line = record.getMessage().split("\n", 1)[0].split(" ::: ")[0].strip()
+            for event in self._get_events(line):
+                event_type = event.pop("event")
+                self.writer.emit(event_type, **event)
+        except Exception:
+            self.handleError(record)
@@ -0,0 +1,186 @@
+"""Fetch distfiles in the background while the update is merged.
+
+emerge alternates between downloading and compiling, so without help
+every package of the update waits for its own download. With prefetch,
+the update stage starts emerge --fetchonly over the packages of the
+pretend plan next to the merge, and the merge mostly finds its distfiles
+already downloaded. If the merge fails, the fetch is killed, there is no
+point in downloading distfiles of a plan that will not be merged.
+
+The fetch command is pluggable: it gets the package atoms of the plan
+as arguments, so a script that copies files from a local mirror into
+DISTDIR can stand in for emerge in tests or on offline hosts.
+
+Fetched bytes are the size of distfiles in DISTDIR that were added or
+changed during the update. The time the merge waits on fetch is measured
+from its output: from a ">>> Downloading" line of Portage to the next
+status line, and for " * waiting for lock on" lines, printed when the
+background fetch holds the distfile, from the line before them.
+"""
+
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .report_objects import FetchStats
+
+DISTDIR = "/var/cache/distfiles"
+FETCH_COMMAND = ("emerge", "--fetchonly", "--nodeps")
+PARTIAL_SUFFIX = ".__download__"
+DOWNLOAD_PREFIX = ">>> Downloading "
+LOCK_WAIT_MESSAGE = "waiting for lock on "
+STATUS_PREFIXES = (">>> ", " * ")
+FETCH_LABEL = "fetch"
+STOP_INTERVAL = 0.1
+
+Distfiles = Dict[str, Tuple[int, int]]
+
+
+def read_distfiles(distdir: str = DISTDIR) -> Distfiles:
+    """Get size and mtime_ns of every distfile, empty if DISTDIR is missing."""
+    distfiles: Distfiles = {}
+    try:
+        with os.scandir(distdir) as entries:
+            for entry in entries:
+                if entry.name.endswith(PARTIAL_SUFFIX) or not entry.is_file():
+                    continue
+                stat = entry.stat()
+                distfiles[entry.name] = (stat.st_size, stat.st_mtime_ns)
+    except OSError:
+        pass
+    return distfiles
+
+
+def get_fetched_bytes(before: Distfiles, after: Distfiles) -> int:
+    """Get size of distfiles that were added or changed between two listings."""
+    return sum(
+        size
+        for name, (size, mtime_ns) in after.items()
+        if before.get(name) != (size, mtime_ns)
+    )
+
+
+class FetchWaitTimer:
+    """Time the merge spends on downloads, measured from its output lines.
+
+    Attributes
+    ----------
+        wait_seconds (float): Time of finished waits.
+    """
+
+    def __init__(self) -> None:
+        """Initialize FetchWaitTimer class."""
+        self.wait_seconds = 0.0
+        self._download_started: Optional[float] = None
+        self._last_line: Optional[float] = None
+        self.lock = threading.Lock()
+
+    def feed(self, line: str, now: Optional[float] = None) -> None:
+        """Process one output line of the merge.
+
+        Args:
+        ----
+            line (str): Output line of emerge.
+            now (Optional[float]): time.monotonic() when the line was
+                read, current time if not given.
+        """
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            if LOCK_WAIT_MESSAGE in line and self._last_line is not None:
+                self.wait_seconds += now - self._last_line
+            elif line.startswith(DOWNLOAD_PREFIX):
+                if self._download_started is None:
+                    self._download_started = now
+            elif line.startswith(STATUS_PREFIXES) and self._download_started:
+                self.wait_seconds += now - self._download_started
+                self._download_started = None
+            self._last_line = now
+
+    def finish(self, now: Optional[float] = None) -> float:
+        """Finish a download that is still running and get the total wait."""
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            if self._download_started is not None:
+                self.wait_seconds += now - self._download_started
+                self._download_started = None
+            return self.wait_seconds
+
+
+class Prefetch:
+    """emerge --fetchonly that runs in the background during the merge.
+
+    Attributes
+    ----------
+        command (List[str]): Fetch command with the package atoms.
+        distdir (str): Directory the distfiles are fetched to.
+        wait_timer (FetchWaitTimer): Gets output lines of the merge.
+        exit_code (Optional[int]): Exit code of the fetch command,
+            None while it runs.
+        fetch_seconds (float): Time the fetch command took.
+    """
+
+    def __init__(self, command: List[str], distdir: str = DISTDIR) -> None:
+        """Initialize Prefetch class."""
+        self.command = command
+        self.distdir = distdir
+        self.wait_timer = FetchWaitTimer()
+        self.exit_code: Optional[int] = None
+        self.fetch_seconds = 0.0
+        self._distfiles_before: Distfiles = {}
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self, run: Callable[..., int]) -> None:
+        """Start the fetch command in a thread.
+
+        Args:
+        ----
+            run (Callable[..., int]): StageIO.run of the update stage,
+                the output of the fetch is logged with a "fetch" label.
+        """
+        self._distfiles_before = read_distfiles(self.distdir)
+        started = time.monotonic()
+
+        def fetch() -> None:
+            try:
+                self.exit_code = run(self.command, FETCH_LABEL)
+            except Exception:  # the merge fetches what is missing
+                self.exit_code = 1
+            finally:
+                self.fetch_seconds = time.monotonic() - started
+
+        self._thread = threading.Thread(target=fetch, daemon=True)
+        self._thread.start()
+
+    def stop(self, stop: Callable[[str], None]) -> None:
+        """Kill the fetch command and wait for its thread.
+
+        The command is killed until the thread has finished, so a command
+        that is started right after the first kill is stopped too.
+
+        Args:
+        ----
+            stop (Callable[[str], None]): StageIO.stop of the update stage.
+        """
+        while self._thread and self._thread.is_alive():
+            stop(FETCH_LABEL)
+            self._thread.join(STOP_INTERVAL)
+
+    def finish(self) -> FetchStats:
+        """Wait for the fetch command and get what it has done.
+
+        Returns
+        -------
+            FetchStats: Fetched bytes, time of the fetch and time the
+                merge waited on downloads.
+        """
+        if self._thread:
+            self._thread.join()
+        fetched_bytes = get_fetched_bytes(
+            self._distfiles_before, read_distfiles(self.distdir)
+        )
+        return FetchStats(
+            fetched_bytes,
+            round(self.fetch_seconds, 1),
+            round(self.wait_timer.finish(), 1),
+        )
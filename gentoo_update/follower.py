@@ -0,0 +1,253 @@
+"""Follow an update log while the update is running.
+
+`LogFollower` reads only the bytes appended to the log since the last read
+and feeds them to `IncrementalParser`, so a refresh costs time proportional
+to the new output, not to the size of the log. Changes are detected with
+inotify, or by polling the file size when inotify is not available.
+"""
+
+import ctypes
+import ctypes.util
+import os
+import re
+import select
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from .parser import REPORT_SECTIONS, Parser, SectionSplitter
+from .report_objects import LogInfo
+from .reporter import Reporter
+from .shell_runner import FINAL_MESSAGE
+
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+ERROR_PATTERN = re.compile(
+    r" ::: (?:updater\.sh|stage engine) exited with error code -?\d+ in stage \w+$"
+)
+
+
+class PollingWatcher:
+    """Wait for changes of a file by checking its size and mtime."""
+
+    def __init__(self, log_file: str, poll_interval: float = 1.0) -> None:
+        """Initialize PollingWatcher class."""
+        self.log_file = log_file
+        self.poll_interval = poll_interval
+        self.last_state = self._get_state()
+
+    def _get_state(self) -> tuple:
+        """Get size and mtime of the file."""
+        log_stat = os.stat(self.log_file)
+        return (log_stat.st_size, log_stat.st_mtime_ns)
+
+    def wait(self, timeout: float) -> bool:
+        """Wait until the file changes or the timeout expires.
+
+        Returns
+        -------
+            bool: True if the file has changed.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            state = self._get_state()
+            if state != self.last_state:
+                self.last_state = state
+                return True
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            time.sleep(min(self.poll_interval, remaining))
+
+    def close(self) -> None:
+        """Release resources of the watcher."""
+
+
+class InotifyWatcher:
+    """Wait for changes of a file using Linux inotify."""
+
+    def __init__(self, log_file: str) -> None:
+        """Initialize InotifyWatcher class.
+
+        Raises
+        ------
+            OSError: If inotify is not available.
+        """
+        libc_name = ctypes.util.find_library("c") or "libc.so.6"
+        libc = ctypes.CDLL(libc_name, use_errno=True)
+        self.inotify_fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.inotify_fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+        watch = libc.inotify_add_watch(
+            self.inotify_fd, os.fsencode(log_file), IN_MODIFY | IN_CLOSE_WRITE
+        )
+        if watch < 0:
+            os.close(self.inotify_fd)
+            raise OSError(ctypes.get_errno(), "inotify_add_watch failed")
+
+    def wait(self, timeout: float) -> bool:
+        """Wait until the file changes or the timeout expires.
+
+        Returns
+        -------
+            bool: True if the file has changed.
+        """
+        ready, _, _ = select.select([self.inotify_fd], [], [], timeout)
+        if not ready:
+            return False
+        try:
+            while os.read(self.inotify_fd, 4096):
+                pass
+        except BlockingIOError:
+            pass
+        return True
+
+    def close(self) -> None:
+        """Release resources of the watcher."""
+        os.close(self.inotify_fd)
+
+
+def create_watcher(log_file: str):
+    """Create an inotify watcher, or a polling watcher if inotify fails."""
+    try:
+        return InotifyWatcher(log_file)
+    except (OSError, AttributeError):
+        return PollingWatcher(log_file)
+
+
+class IncrementalParser(Parser):
+    """Parser that is fed with chunks of a growing log file.
+
+    Attributes
+    ----------
+        splitter (SectionSplitter): Section state machine.
+        sections (Dict[str, List[str]]): Completed report sections.
+        partial_line (bytes): End of the last chunk without a newline.
+        finished (bool): True when the update has finished or failed.
+    """
+
+    def __init__(self, log_file: str) -> None:
+        """Initialize IncrementalParser class."""
+        super().__init__(log_file, mode="stream")
+        self.splitter = SectionSplitter(REPORT_SECTIONS)
+        self.sections: Dict[str, List[str]] = {}
+        self.partial_line = b""
+        self.finished = False
+
+    def feed(self, data: bytes) -> List[str]:
+        """Process bytes appended to the log.
+
+        Args:
+        ----
+            data (bytes): New bytes of the log file.
+
+        Returns:
+        -------
+            List[str]: Names of report sections completed by this chunk.
+        """
+        lines = (self.partial_line + data).split(b"\n")
+        self.partial_line = lines.pop()
+
+        completed = []
+        for raw_line in lines:
+            line = raw_line.decode("utf-8", "replace")
+            section = self.splitter.feed(line)
+            if FINAL_MESSAGE in line or ERROR_PATTERN.search(line):
+                self.finished = True
+                section = section or self.splitter.flush()
+            if section:
+                self.sections[section[0]] = section[1]
+                completed.append(section[0])
+        return completed
+
+    @property
+    def current_section(self) -> str:
+        """Name of the section that is being written."""
+        return self.splitter.section_name
+
+    def extract_info_for_report(self) -> LogInfo:
+        """Extract information from the sections completed so far."""
+        return self.build_log_info(self.sections.items())
+
+
+class LogFollower:
+    """Read new bytes of a log file and re-render the report.
+
+    Attributes
+    ----------
+        log_file (str): Path to the followed log.
+        short_report (bool): Short report format.
+        parser (IncrementalParser): Parser state.
+        position (int): Amount of bytes read so far.
+    """
+
+    def __init__(self, log_file: str, short_report: bool = False) -> None:
+        """Initialize LogFollower class."""
+        self.log_file = log_file
+        self.short_report = short_report
+        self.parser = IncrementalParser(log_file)
+        self.position = 0
+
+    def read_new_data(self) -> List[str]:
+        """Read bytes appended since the last call and parse them.
+
+        Returns
+        -------
+            List[str]: Names of report sections completed by the new data.
+        """
+        with open(self.log_file, "rb") as log_file:
+            log_file.seek(self.position)
+            data = log_file.read()
+        self.position += len(data)
+        return self.parser.feed(data)
+
+    def render(self) -> List[str]:
+        """Create the report from the sections completed so far.
+
+        Returns
+        -------
+            List[str]: Report lines.
+        """
+        timestamp = datetime.now().strftime("%H:%M:%S")
+        if self.parser.finished or "update_system" in self.parser.sections:
+            report = Reporter(
+                self.parser.extract_info_for_report(), self.short_report
+            ).create_report()
+        else:
+            pretend = self.parser.sections.get("pretend_emerge")
+            report = ["==========> Gentoo Update Report <=========="]
+            if pretend is not None:
+                pretend_status = self.parser.parse_emerge_pretend_section(pretend)
+                status = "SUCCESS" if pretend_status.pretend_status else "FAIL"
+                report.append(f"emerge pretend status: {status}")
+            report.append(f"update is in progress: {self.parser.current_section}")
+        return [f"----- {timestamp} -----"] + report
+
+    def follow(self, watcher=None, idle_timeout: Optional[float] = None) -> None:
+        """Print the report every time a report section is completed.
+
+        Args:
+        ----
+            watcher: Object with wait(timeout) and close() methods,
+                inotify or polling watcher is created by default.
+            idle_timeout (Optional[float]): Stop after this many seconds
+                without changes, None - wait until the update finishes.
+        """
+        watcher = watcher or create_watcher(self.log_file)
+        last_change = time.monotonic()
+        try:
+            self.read_new_data()
+            print("\n".join(self.render()))
+            while not self.parser.finished:
+                if watcher.wait(1.0):
+                    last_change = time.monotonic()
+                    if self.read_new_data() or self.parser.finished:
+                        print("\n".join(self.render()))
+                elif idle_timeout and time.monotonic() - last_change > idle_timeout:
+                    print(f"No changes in {self.log_file} for {idle_timeout}s")
+                    break
+        finally:
+            watcher.close()
@@ -12,10 +12,18 @@ import sys
 from typing import Dict, List, Tuple
 
 from ._version import __version__
+from .cache import load_log_info, load_pretend_plan, save_pretend_plan
+from .checkpoint import find_resumable_log
+from .fetch import DISTDIR
+from .follower import LogFollower
+from .history import HistoryReporter, iter_log_history
+from .log_files import CHECK_LOG_PREFIX, is_compressed_log, is_log_file, prune_logs
 from .notifier import Notifier
 from .parser import Parser
-from .reporter import Reporter
-from .shell_runner import ShellRunner
+from .report_objects import PretendPlan
+from .reporter import PlanReporter, Reporter
+from .shell_runner import PARALLEL_STAGES, SCRIPT_STAGES, ShellRunner
+from .stages import DEFAULT_BACKEND, STAGE_BACKENDS
 
 current_path = os.path.dirname(os.path.realpath(__file__))
 sys.tracebacklimit = -1
@@ -37,6 +45,9 @@ def create_cli() -> argparse.Namespace:
     subparsers = parser.add_subparsers(dest="command")
     update = subparsers.add_parser("update", help="Run security or full update.")
     report = subparsers.add_parser("report", help="Generate or send update reports.")
+    check = subparsers.add_parser(
+        "check", help="Show packages that an update would merge."
+    )
     version = subparsers.add_parser("version", help="Print gentoo-update version.")
 
     # define update subparser
@@ -109,6 +120,144 @@ Default: 0 - do not set a limit.
         action="store_true",
         help="Set whether to read news after an update.",
     )
+    update.add_argument(
+        "-z",
+        "--log-compression",
+        default="none",
+        choices=["none", "gzip", "zstd"],
+        help="""
+Compress the update log while it is written.
+zstd requires the zstandard library, gzip is used if it is missing.
+Default: none
+""",
+    )
+    update.add_argument(
+        "--keep-logs",
+        type=int,
+        default=0,
+        help="""
+Keep only the last n update logs, older logs are removed before the update.
+Default: 0 - keep all logs.
+""",
+    )
+    update.add_argument(
+        "--max-logs-size",
+        type=int,
+        default=0,
+        help="""
+Remove the oldest update logs until all logs take less than a limit (in MB).
+Default: 0 - do not set a limit.
+""",
+    )
+    update.add_argument(
+        "--parallel-stages",
+        type=int,
+        default=PARALLEL_STAGES,
+        help=f"""
+Maximum amount of update stages that run at the same time.
+Stages wait for the stages they depend on, 1 runs stages one by one.
+Default: {PARALLEL_STAGES}
+""",
+    )
+    update.add_argument(
+        "--stage-timeout",
+        action="append",
+        default=[],
+        metavar="STAGE=MINUTES",
+        help="""
+Kill a stage that runs longer than a time limit, can be repeated.
+STAGE is a stage name, like sync_tree or update, or "default" for all stages.
+Example: --stage-timeout sync_tree=30 --stage-timeout default=600
+Default: no limit.
+""",
+    )
+    update.add_argument(
+        "--stall-timeout",
+        type=float,
+        default=0,
+        metavar="MINUTES",
+        help="""
+Kill a stage that produces no output for a time limit (in minutes).
+Default: 0 - do not set a limit.
+""",
+    )
+    update.add_argument(
+        "--resume",
+        action="store_true",
+        help="""
+Resume the last update if it was interrupted.
+Completed stages are skipped and the same log file is used,
+an interrupted merge is continued with emerge --resume.
+Other update options are taken from the interrupted run.
+""",
+    )
+    update.add_argument(
+        "--batch-size",
+        type=int,
+        default=0,
+        metavar="PACKAGES",
+        help="""
+Merge the update in batches of this many packages, in the order emerge
+has planned. Merged batches are saved, so a failed or interrupted update
+(see --resume) merges again only the batch that has failed.
+Used only with -m full, and requires the python stage backend.
+Default: 0 - merge all packages at once.
+""",
+    )
+    update.add_argument(
+        "--sync-max-age",
+        type=float,
+        default=0,
+        metavar="HOURS",
+        help="""
+Do not sync repositories that were synced less than this many hours ago.
+Requires the python stage backend.
+Default: 0 - sync all repositories.
+""",
+    )
+    update.add_argument(
+        "--sync-jobs",
+        type=int,
+        default=1,
+        metavar="JOBS",
+        help="""
+Maximum amount of repositories that are synced at the same time.
+Requires the python stage backend.
+Default: 1 - sync repositories one by one.
+""",
+    )
+    update.add_argument(
+        "--prefetch",
+        action="store_true",
+        help="""
+Fetch distfiles of the planned packages in the background with
+emerge --fetchonly while the update is merged, so the merge rarely
+waits for downloads. Requires the python stage backend.
+""",
+    )
+    update.add_argument(
+        "--auto-jobs",
+        action="store_true",
+        help="""
+Pick emerge --jobs, --load-average and a MAKEOPTS override for the update
+from the amount of CPUs, available memory, MAKEOPTS of make.conf and memory
+that the planned packages used in previous updates, so large builds are
+not killed for lack of memory. Flags in --args take precedence.
+Requires the python stage backend.
+""",
+    )
+    update.add_argument(
+        "--stage-backend",
+        default=DEFAULT_BACKEND,
+        choices=STAGE_BACKENDS,
+        help=f"""
+How update stages are run.
+Options:
+* python: run stages in gentoo-update, start only emerge and other Portage tools
+* shell: run every stage with updater.sh
+Default: {DEFAULT_BACKEND}
+""",
+    )
     update.add_argument(
         "-q",
         "--quiet",
@@ -128,7 +277,10 @@ Default: 0 - do not set a limit.
         "-o",
         "--last-n-logs",
         type=int,
-        help="Show last n log filenames.",
+        help="""
+Show history report for the last n logs.
+Logs are parsed in parallel using all CPUs.
+""",
     )
     report.add_argument(
         "-s",
@@ -138,6 +290,15 @@ Default: 0 - do not set a limit.
         help="""
 Send update report via IRC bot, email (SendGrid) or mobile app.
 Default: none
+""",
+    )
+    report.add_argument(
+        "-f",
+        "--follow",
+        action="store_true",
+        help="""
+Follow the log of a running update and show the report as sections complete.
+Works only with uncompressed logs.
 """,
     )
     report.add_argument(
@@ -147,6 +308,51 @@ Default: none
         help="Show or send only update status without package info.",
     )
 
+    # define check subparser
+    check.add_argument(
+        "-m",
+        "--update-mode",
+        default="security",
+        choices=["security", "full"],
+        help="""
+Set the update mode to check.
+Options:
+* security: check only security patches (GLSA)
+* full: check a full @world update
+Default: security
+""",
+    )
+    check.add_argument(
+        "-a",
+        "--args",
+        default="",
+        help="Additional arguments to be passed when in 'full' update mode.",
+    )
+    check.add_argument(
+        "-c",
+        "--cached",
+        action="store_true",
+        help="Show the plan saved by the last check instead of running emerge.",
+    )
+    check.add_argument(
+        "-t",
+        "--short-report",
+        action="store_true",
+        help="Show only the amount of packages.",
+    )
+    check.add_argument(
+        "--stage-backend",
+        default=DEFAULT_BACKEND,
+        choices=STAGE_BACKENDS,
+        help=f"How the emerge pretend stage is run. Default: {DEFAULT_BACKEND}",
+    )
+    check.add_argument(
+        "-q",
+        "--quiet",
+        action="store_true",
+        help="Do not show logs on the terminal screen.",
+    )
+
     # define version subparser
     version.add_argument("-v", "--verbose", action="store_true")
 
@@ -183,6 +389,21 @@ def make_conf_reader() -> Dict:
     return make_conf
 
 
+def apply_make_conf(runner: ShellRunner, make_conf: Dict) -> None:
+    """Pass make.conf settings that update stages use to the runner.
+
+    Args:
+    ----
+        runner (ShellRunner): Runner of the update.
+        make_conf (Dict): Parameters of make.conf from make_conf_reader.
+    """
+    runner.distdir = make_conf.get("DISTDIR", DISTDIR).replace('"', "")
+    runner.makeopts = make_conf.get("MAKEOPTS", "").replace('"', "")
+    portage_tmpdir = make_conf.get("PORTAGE_TMPDIR", "").replace('"', "")
+    if portage_tmpdir:
+        runner.build_dir = os.path.join(portage_tmpdir, "portage")
+
+
 def initiate_log_directory(make_conf) -> Tuple[str, List[str]]:
     """Create log directory if it does not exist.
 
@@ -222,7 +443,7 @@ def get_available_log_files(log_dir: str, last_n_logs: int) -> List:
         log_dir (str): Directory where gentoo_update stores logs.
         last_n_logs (int): Last n amount of reports in the directory.
     """
-    log_filesnames = os.listdir(log_dir)
+    log_filesnames = [name for name in os.listdir(log_dir) if is_log_file(name)]
     log_filesnames.sort()
     if len(log_filesnames) < last_n_logs:
         raise ValueError(f"There are less than {last_n_logs} in {log_dir}")
@@ -246,7 +467,7 @@ def get_last_log_filename(log_dir: str) -> str:
     """
     files = os.listdir(log_dir)
     paths = [
-        os.path.join(log_dir, basename) for basename in files if basename[0:4] == "log_"
+        os.path.join(log_dir, basename) for basename in files if is_log_file(basename)
     ]
     if not paths:
         raise ValueError(f"No log files found in the directory {log_dir}")
@@ -258,6 +479,8 @@ def generate_report(
 ) -> Reporter:
     """Show report for the <log_filename> located in $PORTAGE_LOGDIR.
 
+    Parsed log information is cached next to the log file.
+
     Args
     ----
         log_dir (str): Directory where gentoo_update stores logs.
@@ -279,10 +502,87 @@ def generate_report(
             f"The log file {log_filename} does not exist in {log_dir}"
         )
 
-    update_info = Parser(full_log_path).extract_info_for_report()
+    update_info = load_log_info(full_log_path)
     return Reporter(update_info, short_report)
 
 
+def parse_stage_timeouts(stage_timeouts: List[str]) -> Dict[str, float]:
+    """Convert --stage-timeout values to time limits in seconds.
+
+    Args:
+    ----
+        stage_timeouts (List[str]): Values like sync_tree=30, in minutes.
+
+    Returns:
+    -------
+        Dict[str, float]: Time limits in seconds by stage name.
+    """
+    timeouts = {}
+    for stage_timeout in stage_timeouts:
+        stage, _, minutes = stage_timeout.partition("=")
+        if stage not in SCRIPT_STAGES and stage != "default":
+            print(f"[Error] Unknown stage in --stage-timeout: {stage}")
+            print(f"Stages: {', '.join(SCRIPT_STAGES)}, default")
+            sys.exit(1)
+        try:
+            timeouts[stage] = float(minutes) * 60
+        except ValueError:
+            print(f"[Error] Invalid time limit in --stage-timeout: {stage_timeout}")
+            sys.exit(1)
+    return timeouts
+
+
+def run_pretend_check(
+    log_dir: str, log_dir_messages: List[str], args: argparse.Namespace
+) -> PretendPlan:
+    """Run only the emerge pretend stage and save the plan.
+
+    The check log is written with the "check" prefix, so it is not listed
+    as an update log, and only the latest check log is kept.
+
+    Args
+    ----
+        log_dir (str): Directory where gentoo_update stores logs.
+        log_dir_messages (List[str]): List of messages to log.
+        args (argparse.Namespace): Arguments of the check command.
+
+    Returns
+    -------
+        PretendPlan: Packages that the update would merge.
+    """
+    runner = ShellRunner(
+        "y" if args.quiet else "n",
+        log_dir,
+        log_dir_messages,
+        log_prefix=CHECK_LOG_PREFIX,
+        backend=args.stage_backend,
+    )
+    prune_logs(
+        log_dir,
+        max_logs=1,
+        keep=[os.path.basename(runner.log_filename)],
+        prefix=CHECK_LOG_PREFIX,
+    )
+    runner.run_shell_script(
+        args.update_mode,
+        args.args if args.args else "NOARGS",
+        "0",
+        "ignore",
+        "n",
+        "n",
+        "n",
+        "n",
+        stages=["emerge_pretend"],
+    )
+
+    plan = Parser(runner.log_filename, mode="stream").extract_pretend_plan()
+    if plan is None:
+        print(f"[Error] emerge pretend section not found in {runner.log_filename}")
+        sys.exit(1)
+    save_pretend_plan(log_dir, runner.log_filename, plan)
+    return plan
+
+
 def main() -> None:
     """Execute it all."""
     args = create_cli()
@@ -295,8 +595,55 @@ def main() -> None:
             print(f"gento-update version: {__version__}")
         else:
             print(__version__)
+    elif args.command == "update" and args.resume:
+        log_file = find_resumable_log(log_dir)
+        if log_file is None:
+            print(f"No interrupted update found in {log_dir}")
+            sys.exit(1)
+        runner = ShellRunner(
+            "y" if args.quiet else "n",
+            log_dir,
+            log_dir_messages,
+            parallel_stages=args.parallel_stages,
+            log_filename=log_file,
+            stage_timeouts=parse_stage_timeouts(args.stage_timeout),
+            stall_timeout=args.stall_timeout * 60,
+            backend=args.stage_backend,
+        )
+        apply_make_conf(runner, make_conf)
+        runner.resume_shell_script()
     elif args.command == "update":
-        runner = ShellRunner("y" if args.quiet else "n", log_dir, log_dir_messages)
+        if args.stage_backend == "shell":
+            for option, value, default in (
+                ("--batch-size", args.batch_size, 0),
+                ("--sync-max-age", args.sync_max_age, 0),
+                ("--sync-jobs", args.sync_jobs, 1),
+                ("--prefetch", args.prefetch, False),
+                ("--auto-jobs", args.auto_jobs, False),
+            ):
+                if value != default:
+                    print(f"[Error] {option} is not supported by the shell backend")
+                    sys.exit(1)
+        if args.sync_jobs < 1:
+            print("[Error] --sync-jobs must be at least 1")
+            sys.exit(1)
+        runner = ShellRunner(
+            "y" if args.quiet else "n",
+            log_dir,
+            log_dir_messages,
+            args.log_compression,
+            parallel_stages=args.parallel_stages,
+            stage_timeouts=parse_stage_timeouts(args.stage_timeout),
+            stall_timeout=args.stall_timeout * 60,
+            backend=args.stage_backend,
+        )
+        apply_make_conf(runner, make_conf)
+        prune_logs(
+            log_dir,
+            args.keep_logs,
+            args.max_logs_size * 1024 * 1024,
+            keep=[os.path.basename(runner.log_filename)],
+        )
         runner.run_shell_script(
             args.update_mode,
             args.args if args.args else "NOARGS",
@@ -306,13 +653,39 @@ def main() -> None:
             "y" if args.clean else "n",
             "y" if args.read_logs else "n",
             "y" if args.read_news else "n",
+            str(args.batch_size),
+            str(args.sync_max_age),
+            str(args.sync_jobs),
+            "y" if args.prefetch else "n",
+            "y" if args.auto_jobs else "n",
         )
+    elif args.command == "check":
+        if args.cached:
+            plan = load_pretend_plan(log_dir)
+            if plan is None:
+                print(f"No saved plan in {log_dir}, run gentoo-update check first")
+                sys.exit(1)
+        else:
+            plan = run_pretend_check(log_dir, log_dir_messages, args)
+        PlanReporter(plan, args.short_report).print_report()
     elif args.command == "report":
         if args.last_n_logs:
             logs = get_available_log_files(log_dir, args.last_n_logs)
-            print(f"The last {args.last_n_logs} log file filenames")
-            for log in logs:
-                print(log)
+            history = HistoryReporter()
+            print("==========> Gentoo Update History <==========")
+            for log, log_info in iter_log_history(log_dir, logs):
+                print(history.add_run(log, log_info))
+            for line in history.create_summary():
+                print(line)
+        elif args.follow:
+            log_filename = (
+                get_last_log_filename(log_dir) if args.report == "LAST" else args.report
+            )
+            log_path = os.path.join(log_dir, log_filename)
+            if is_compressed_log(log_path):
+                print("Follow mode supports only uncompressed logs")
+                sys.exit(1)
+            LogFollower(log_path, args.short_report).follow()
         elif args.send_report in ["irc", "email", "mobile"]:
             log_filename = (
                 get_last_log_filename(log_dir) if args.report == "LAST" else args.report
@@ -0,0 +1,408 @@
+"""Find packages affected by GLSAs without running glsa-check.
+
+GLSA XML files are read from metadata/glsa of the Gentoo repository and
+matched against an index of installed packages built from /var/db/pkg.
+The result is cached in the gentoo-update log directory, keyed on
+metadata/timestamp.chk of the repository, the mtime of /var/db/pkg and
+the list of applied GLSAs, so it is computed at most once per sync
+unless packages are merged in between.
+
+GLSA package entry that is used:
+    <package name="dev-libs/openssl" auto="yes" arch="*">
+      <unaffected range="ge">3.0.11</unaffected>
+      <vulnerable range="lt">3.0.11</vulnerable>
+    </package>
+"""
+
+import json
+import os
+import platform
+import xml.etree.ElementTree as ElementTree
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from .atom import parse_atom, parse_version, vercmp
+from .atomic_file import atomic_write
+from .vdb import VDB_DIR
+
+REPO_DIRS = ("/var/db/repos/gentoo", "/usr/portage")
+GLSA_SUBDIR = os.path.join("metadata", "glsa")
+TIMESTAMP_FILE = os.path.join("metadata", "timestamp.chk")
+GLSA_INJECTED = "/var/lib/portage/glsa_injected"
+CACHE_FILENAME = "glsa_affected.json"
+CACHE_VERSION = 1
+MACHINE_ARCHES = {
+    "x86_64": "amd64",
+    "aarch64": "arm64",
+    "i386": "x86",
+    "i486": "x86",
+    "i586": "x86",
+    "i686": "x86",
+    "ppc64": "ppc64",
+    "ppc64le": "ppc64",
+    "riscv64": "riscv",
+}
+RANGE_RESULTS = {
+    "lt": (-1,),
+    "le": (-1, 0),
+    "eq": (0,),
+    "ge": (0, 1),
+    "gt": (1,),
+}
+
+
+@dataclass
+class GlsaRange:
+    """Dataclass with one vulnerable or unaffected version range of a GLSA.
+
+    operator is lt, le, eq, ge or gt, prefixed with r for ranges that
+    only cover revisions of the same version, like rge 1.2.3-r2.
+    slot is None if the range applies to every slot.
+    """
+
+    operator: str
+    version: str
+    slot: Optional[str] = None
+
+
+@dataclass
+class GlsaPackage:
+    """Dataclass with one package of a GLSA."""
+
+    package_name: str
+    arches: List[str]
+    vulnerable: List[GlsaRange]
+    unaffected: List[GlsaRange]
+
+
+@dataclass
+class Glsa:
+    """Dataclass with one Gentoo Linux Security Advisory."""
+
+    glsa_id: str
+    title: str
+    packages: List[GlsaPackage]
+
+
+def find_repo_dir(repo_dirs: Tuple[str, ...] = REPO_DIRS) -> Optional[str]:
+    """Find the Gentoo repository that has GLSA files, None if there is none."""
+    for repo_dir in repo_dirs:
+        if os.path.isdir(os.path.join(repo_dir, GLSA_SUBDIR)):
+            return repo_dir
+    return None
+
+
+def get_system_arch() -> Optional[str]:
+    """Get the Gentoo keyword of the machine, like amd64, None if it is unknown."""
+    return MACHINE_ARCHES.get(platform.machine())
+
+
+def parse_glsa(glsa_path: str) -> Glsa:
+    """Read one GLSA XML file.
+
+    Args:
+    ----
+        glsa_path (str): Path to a glsa-*.xml file.
+
+    Returns:
+    -------
+        Glsa: Advisory with its affected packages.
+
+    Raises:
+    ------
+        OSError: If the file can not be read.
+        ElementTree.ParseError: If the file is not valid XML.
+    """
+    root = ElementTree.parse(glsa_path).getroot()
+    packages = []
+    for package in root.iterfind("affected/package"):
+        ranges: Dict[str, List[GlsaRange]] = {"vulnerable": [], "unaffected": []}
+        for range_type, range_list in ranges.items():
+            for version_range in package.iterfind(range_type):
+                range_list.append(
+                    GlsaRange(
+                        version_range.get("range", ""),
+                        (version_range.text or "").strip(),
+                        version_range.get("slot"),
+                    )
+                )
+        packages.append(
+            GlsaPackage(
+                package.get("name", ""),
+                package.get("arch", "*").split(),
+                ranges["vulnerable"],
+                ranges["unaffected"],
+            )
+        )
+    return Glsa(root.get("id", ""), root.findtext("title", "").strip(), packages)
+
+
+def read_installed_packages(vdb_dir: str = VDB_DIR) -> Dict[str, List[Tuple[str, str]]]:
+    """Index installed packages of the vdb by package name.
+
+    Args:
+    ----
+        vdb_dir (str): Path to /var/db/pkg.
+
+    Returns:
+    -------
+        Dict[str, List[Tuple[str, str]]]: Installed versions with the path
+            to their vdb entry, by package name like dev-libs/openssl.
+    """
+    installed: Dict[str, List[Tuple[str, str]]] = {}
+    try:
+        categories = list(os.scandir(vdb_dir))
+    except OSError:
+        return installed
+    for category in categories:
+        if not category.is_dir() or category.name.startswith("."):
+            continue
+        try:
+            entries = list(os.scandir(category.path))
+        except OSError:
+            continue
+        for entry in entries:
+            if entry.name.startswith("-MERGING-") or not entry.is_dir():
+                continue
+            try:
+                atom = parse_atom(f"{category.name}/{entry.name}")
+            except ValueError:
+                continue
+            installed.setdefault(atom.package_name, []).append(
+                (str(atom.version), entry.path)
+            )
+    return installed
+
+
+def read_installed_slot(vdb_entry: str) -> str:
+    """Read the slot of an installed package, without the subslot."""
+    try:
+        with open(os.path.join(vdb_entry, "SLOT"), encoding="utf-8") as slot_file:
+            return slot_file.read().strip().split("/")[0]
+    except OSError:
+        return "0"
+
+
+def matches_range(version: str, vdb_entry: str, version_range: GlsaRange) -> bool:
+    """Check if an installed version is in a GLSA version range.
+
+    Args:
+    ----
+        version (str): Installed version.
+        vdb_entry (str): Path to the vdb entry, used to read the slot.
+        version_range (GlsaRange): Version range from a GLSA.
+
+    Returns:
+    -------
+        bool: True if the version is in the range, False also for
+            ranges that can not be parsed.
+    """
+    if version_range.slot not in (None, "*"):
+        if read_installed_slot(vdb_entry) != version_range.slot:
+            return False
+
+    operator = version_range.operator
+    range_version = version_range.version
+    if operator == "eq" and range_version.endswith("*"):
+        return version.startswith(range_version[:-1])
+    try:
+        if operator.startswith("r"):
+            installed = parse_version(version)
+            ranged = parse_version(range_version)
+            if (installed.numbers, installed.letter, installed.suffixes) != (
+                ranged.numbers,
+                ranged.letter,
+                ranged.suffixes,
+            ):
+                return False
+            operator = operator[1:]
+        return vercmp(version, range_version) in RANGE_RESULTS.get(operator, ())
+    except ValueError:
+        return False
+
+
+def is_package_affected(
+    glsa_package: GlsaPackage,
+    installed: List[Tuple[str, str]],
+    arch: Optional[str] = None,
+) -> bool:
+    """Check if an installed version is vulnerable and not unaffected.
+
+    Args:
+    ----
+        glsa_package (GlsaPackage): Package of a GLSA.
+        installed (List[Tuple[str, str]]): Installed versions of the package
+            with the paths to their vdb entries.
+        arch (Optional[str]): Keyword of the machine, GLSAs for other
+            arches are skipped. None checks every GLSA.
+
+    Returns:
+    -------
+        bool: True if the GLSA affects the system.
+    """
+    if arch and "*" not in glsa_package.arches and arch not in glsa_package.arches:
+        return False
+    for version, vdb_entry in installed:
+        vulnerable = any(
+            matches_range(version, vdb_entry, version_range)
+            for version_range in glsa_package.vulnerable
+        )
+        if vulnerable and not any(
+            matches_range(version, vdb_entry, version_range)
+            for version_range in glsa_package.unaffected
+        ):
+            return True
+    return False
+
+
+def read_injected_glsas(injected_file: str = GLSA_INJECTED) -> List[str]:
+    """Read ids of GLSAs that were marked as applied with glsa-check --inject."""
+    try:
+        with open(injected_file, encoding="utf-8") as injected:
+            return [line.strip() for line in injected if line.strip()]
+    except OSError:
+        return []
+
+
+def scan_affected_packages(
+    repo_dir: str,
+    vdb_dir: str = VDB_DIR,
+    injected_file: str = GLSA_INJECTED,
+    arch: Optional[str] = None,
+) -> List[str]:
+    """Find installed packages affected by GLSAs, like glsa-check affected.
+
+    Only GLSAs about installed packages are parsed.
+
+    Args:
+    ----
+        repo_dir (str): Path to the Gentoo repository.
+        vdb_dir (str): Path to /var/db/pkg.
+        injected_file (str): File with ids of applied GLSAs.
+        arch (Optional[str]): Keyword of the machine.
+
+    Returns:
+    -------
+        List[str]: Package names in the order of GLSA ids, without duplicates.
+
+    Raises:
+    ------
+        OSError: If the GLSA directory can not be read.
+    """
+    installed = read_installed_packages(vdb_dir)
+    injected = set(read_injected_glsas(injected_file))
+    glsa_dir = os.path.join(repo_dir, GLSA_SUBDIR)
+    affected: Dict[str, None] = {}
+    for file_name in sorted(os.listdir(glsa_dir)):
+        if not (file_name.startswith("glsa-") and file_name.endswith(".xml")):
+            continue
+        if file_name[len("glsa-") : -len(".xml")] in injected:
+            continue
+        glsa_path = os.path.join(glsa_dir, file_name)
+        if not _mentions_installed_package(glsa_path, installed):
+            continue
+        try:
+            glsa = parse_glsa(glsa_path)
+        except (OSError, ElementTree.ParseError):
+            continue
+        for glsa_package in glsa.packages:
+            package_installed = installed.get(glsa_package.package_name)
+            if package_installed and is_package_affected(
+                glsa_package, package_installed, arch
+            ):
+                affected[glsa_package.package_name] = None
+    return list(affected)
+
+
+def _mentions_installed_package(
+    glsa_path: str, installed: Dict[str, List[Tuple[str, str]]]
+) -> bool:
+    """Check cheaply, without parsing XML, if a GLSA names an installed package."""
+    try:
+        with open(glsa_path, encoding="utf-8", errors="replace") as glsa_file:
+            content = glsa_file.read()
+    except OSError:
+        return False
+    start = 0
+    while True:
+        start = content.find('<package name="', start)
+        if start < 0:
+            return False
+        start += len('<package name="')
+        end = content.find('"', start)
+        if content[start:end] in installed:
+            return True
+
+
+def get_cache_key(repo_dir: str, vdb_dir: str, injected_file: str) -> List:
+    """Get the state the affected packages depend on.
+
+    Returns
+    -------
+        List: Content of metadata/timestamp.chk, mtime of the vdb and of the
+            applied GLSA list, in nanoseconds, None for missing files.
+    """
+    try:
+        with open(
+            os.path.join(repo_dir, TIMESTAMP_FILE), encoding="utf-8"
+        ) as timestamp_file:
+            timestamp = timestamp_file.read().strip()
+    except OSError:
+        timestamp = None
+    key: List = [os.path.abspath(repo_dir), timestamp]
+    for state_path in (vdb_dir, injected_file):
+        try:
+            key.append(os.stat(state_path).st_mtime_ns)
+        except OSError:
+            key.append(None)
+    return key
+
+
+def get_affected_packages(
+    cache_dir: Optional[str],
+    repo_dir: str,
+    vdb_dir: str = VDB_DIR,
+    injected_file: str = GLSA_INJECTED,
+) -> List[str]:
+    """Get packages affected by GLSAs, from the cache if the tree is unchanged.
+
+    Args:
+    ----
+        cache_dir (Optional[str]): Directory of the cache file, None does
+            not use a cache.
+        repo_dir (str): Path to the Gentoo repository.
+        vdb_dir (str): Path to /var/db/pkg.
+        injected_file (str): File with ids of applied GLSAs.
+
+    Returns:
+    -------
+        List[str]: Affected package names.
+
+    Raises:
+    ------
+        OSError: If the GLSA directory can not be read.
+    """
+    key = get_cache_key(repo_dir, vdb_dir, injected_file)
+    cache_path = os.path.join(cache_dir, CACHE_FILENAME) if cache_dir else None
+    if cache_path:
+        try:
+            with open(cache_path, encoding="utf-8") as cache_file:
+                cached = json.load(cache_file)
+            if cached.get("version") == CACHE_VERSION and cached.get("key") == key:
+                return cached["affected"]
+        except (OSError, ValueError, KeyError, AttributeError):
+            pass
+
+    affected = scan_affected_packages(
+        repo_dir, vdb_dir, injected_file, get_system_arch()
+    )
+    if cache_path and key[1] is not None:
+        try:
+            with atomic_write(cache_path) as cache_file:
+                json.dump(
+                    {"version": CACHE_VERSION, "key": key, "affected": affected},
+                    cache_file,
+                )
+        except OSError:
+            pass
+    return affected
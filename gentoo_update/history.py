@@ -0,0 +1,222 @@
+"""Aggregated history report over several update logs.
+
+Logs are parsed in a process pool, results are returned in the order of
+the logs as soon as they are ready and added to `HistoryReporter`.
+"""
+
+import os
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from .atom import classify_version_change
+from .cache import load_log_info
+from .log_files import LOG_READ_ERRORS
+from .report_objects import DiskUsage, LogInfo
+from .sizes import format_size_delta, parse_human_size
+
+MOST_CHANGED_PACKAGES = 10
+
+
+def _load_log_info_for_history(log_file: str) -> Optional[LogInfo]:
+    """Parse one log in a worker process, None if the log can not be parsed."""
+    try:
+        return load_log_info(log_file)
+    except (*LOG_READ_ERRORS, ValueError, IndexError, KeyError, AttributeError):
+        return None
+
+
+def iter_log_history(
+    log_dir: str, log_filenames: List[str], max_workers: Optional[int] = None
+) -> Iterator[Tuple[str, Optional[LogInfo]]]:
+    """Parse logs in parallel and yield them in the given order.
+
+    Args:
+    ----
+        log_dir (str): Directory where gentoo_update stores logs.
+        log_filenames (List[str]): Log file names, oldest first.
+        max_workers (Optional[int]): Number of worker processes,
+            defaults to the number of CPUs.
+
+    Yields:
+    ------
+        Tuple[str, Optional[LogInfo]]: Log file name and parsed information.
+    """
+    if not log_filenames:
+        return
+
+    workers = min(max_workers or os.cpu_count() or 1, len(log_filenames))
+    chunksize = max(1, len(log_filenames) // (workers * 4))
+    log_files = [os.path.join(log_dir, filename) for filename in log_filenames]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = executor.map(
+            _load_log_info_for_history, log_files, chunksize=chunksize
+        )
+        yield from zip(log_filenames, results)
+
+
+class HistoryReporter:
+    """Collect information about several update runs into one report.
+
+    Attributes
+    ----------
+        runs (List[str]): One report line per update run.
+        statuses (Counter): Amount of runs per status.
+        categories (Counter): Amount of packages per category.
+        disk_usage_deltas (Dict[str, int]): Change of used space per mount point.
+        changed_packages (Counter): Amount of runs in which a package changed.
+        version_changes (Counter): Amount of updates per kind of version change.
+    """
+
+    def __init__(self) -> None:
+        """Initialize HistoryReporter class."""
+        self.runs: List[str] = []
+        self.statuses: Counter = Counter()
+        self.categories: Counter = Counter()
+        self.disk_usage_deltas: Dict[str, int] = {}
+        self.changed_packages: Counter = Counter()
+        self.version_changes: Counter = Counter()
+
+    def _get_run_status(self, log_info: Optional[LogInfo]) -> str:
+        """Get status of one update run."""
+        if log_info is None or log_info.pretend_emerge is None:
+            return "INCOMPLETE"
+        if log_info.update_system and log_info.update_system.update_status:
+            return "SUCCESS"
+        return "FAIL"
+
+    def _count_packages(self, log_info: LogInfo) -> Counter:
+        """Count packages of one run in the same categories as Reporter."""
+        categories: Counter = Counter()
+        if not log_info.update_system:
+            return categories
+
+        for package in log_info.update_system.update_details["updated_packages"]:
+            if package.package_type != "ebuild":
+                categories["other types"] += 1
+                continue
+            if package.update_status == "Update":
+                categories["updated"] += 1
+                if package.old_version and package.new_version:
+                    self.version_changes[
+                        classify_version_change(
+                            package.old_version, package.new_version
+                        )
+                    ] += 1
+            elif package.update_status == "NewPackage":
+                categories["new"] += 1
+            elif package.update_status == "ReEmerge":
+                categories["re-emerged"] += 1
+            else:
+                categories["other"] += 1
+            self.changed_packages[package.package_name] += 1
+        return categories
+
+    def _get_disk_usage_deltas(self, disk_usage: DiskUsage) -> Dict[str, int]:
+        """Get change of used space per mount point during one run."""
+        deltas: Dict[str, int] = {}
+        if not disk_usage.before_update or not disk_usage.after_update:
+            return deltas
+
+        for before, after in zip(disk_usage.before_update, disk_usage.after_update):
+            if before.used_bytes is not None and after.used_bytes is not None:
+                deltas[before.mount_point] = after.used_bytes - before.used_bytes
+                continue
+            used_before = parse_human_size(before.used)
+            used_after = parse_human_size(after.used)
+            if used_before is not None and used_after is not None:
+                deltas[before.mount_point] = used_after - used_before
+        return deltas
+
+    def add_run(self, log_filename: str, log_info: Optional[LogInfo]) -> str:
+        """Add one update run to the history.
+
+        Args:
+        ----
+            log_filename (str): File name of the update log.
+            log_info (Optional[LogInfo]): Parsed log, None if it was unreadable.
+
+        Returns:
+        -------
+            str: Report line for this run.
+        """
+        status = self._get_run_status(log_info)
+        self.statuses[status] += 1
+        run_line = f"{log_filename}: {status}"
+        if log_info is None:
+            self.runs.append(run_line)
+            return run_line
+
+        categories = self._count_packages(log_info)
+        self.categories.update(categories)
+        package_count = sum(categories.values())
+        run_line += f", {package_count} packages"
+        if categories:
+            counts = ", ".join(
+                f"{count} {category}" for category, count in categories.items()
+            )
+            run_line += f" ({counts})"
+
+        for mount_point, delta in self._get_disk_usage_deltas(
+            log_info.disk_usage
+        ).items():
+            self.disk_usage_deltas[mount_point] = (
+                self.disk_usage_deltas.get(mount_point, 0) + delta
+            )
+            run_line += f", {mount_point} {format_size_delta(delta)}"
+
+        self.runs.append(run_line)
+        return run_line
+
+    def create_summary(self) -> List[str]:
+        """Create the aggregated part of the history report.
+
+        Returns
+        -------
+            List[str]: Lines of the summary.
+        """
+        run_count = sum(self.statuses.values())
+        summary = [
+            "",
+            f"Runs: {run_count} ({self.statuses['SUCCESS']} successful, "
+            f"{self.statuses['FAIL']} failed, "
+            f"{self.statuses['INCOMPLETE']} incomplete)",
+        ]
+
+        if self.categories:
+            summary.append("")
+            summary.append("Packages by category:")
+            for category, count in self.categories.most_common():
+                summary.append(f"--- {category}: {count}")
+
+        if self.version_changes:
+            summary.append("")
+            summary.append("Updates by version change:")
+            for version_change, count in self.version_changes.most_common():
+                summary.append(f"--- {version_change}: {count}")
+
+        if self.disk_usage_deltas:
+            summary.append("")
+            summary.append("Used disk space change:")
+            for mount_point, delta in self.disk_usage_deltas.items():
+                summary.append(f"--- {mount_point} {format_size_delta(delta)}")
+
+        if self.changed_packages:
+            summary.append("")
+            summary.append("Most frequently changed packages:")
+            for package_name, count in self.changed_packages.most_common(
+                MOST_CHANGED_PACKAGES
+            ):
+                summary.append(f"--- {package_name} {count}")
+
+        return summary
+
+    def create_report(self) -> List[str]:
+        """Create the history report.
+
+        Returns
+        -------
+            List[str]: A list of strings that comprise the history report.
+        """
+        report = ["==========> Gentoo Update History <=========="]
+        return report + self.runs + self.create_summary()
@@ -0,0 +1,171 @@
+"""Helpers for update log files: naming, compression and retention.
+
+Logs can be written as plain text, gzip or zstd streams. Compression is
+detected by the file name suffix, so all readers can open any log with
+`open_log`. zstd support needs the optional zstandard library.
+
+A compressed log cut short by an interrupted run raises EOFError, or
+zstandard.ZstdError, when its end is read, readers catch LOG_READ_ERRORS.
+"""
+
+import gzip
+import io
+import os
+import re
+from typing import IO, Dict, List, Optional, Tuple, Type
+
+LOG_READ_ERRORS: Tuple[Type[Exception], ...] = (OSError, EOFError)
+USE_ZSTD = True
+try:
+    import zstandard  # noqa: I005
+
+    LOG_READ_ERRORS += (zstandard.ZstdError,)
+except ImportError:
+    USE_ZSTD = False
+
+LOG_COMPRESSION_SUFFIXES = {"none": "", "gzip": ".gz", "zstd": ".zst"}
+LOG_FILENAME_PATTERN = re.compile(r"^log_\d{4}(-\d{2}){4}(\.gz|\.zst)?$")
+CHECK_LOG_PREFIX = "check"
+
+
+def is_log_file(filename: str, prefix: str = "log") -> bool:
+    """Check if a file in the log directory is an update log.
+
+    Sidecar files, like section indexes, are not update logs.
+
+    Args:
+    ----
+        filename (str): Base name of the file.
+        prefix (str): Log file name prefix, "log" for update logs
+            and "check" for logs of `gentoo-update check`.
+    """
+    if not filename.startswith(f"{prefix}_"):
+        return False
+    filename = f"log_{filename[len(prefix) + 1 :]}"
+    return LOG_FILENAME_PATTERN.match(filename) is not None
+
+
+def is_compressed_log(log_file: str) -> bool:
+    """Check if a log file is compressed."""
+    return log_file.endswith((".gz", ".zst"))
+
+
+def get_log_suffix(compression: str) -> str:
+    """Get log file name suffix for a compression method.
+
+    Falls back to gzip if zstd was requested but zstandard is not installed.
+
+    Args:
+    ----
+        compression (str): One of "none", "gzip" or "zstd".
+    """
+    if compression == "zstd" and not USE_ZSTD:
+        print("zstandard library is not installed, using gzip compression")
+        print("it can be installed with:")
+        print("  emerge --ask dev-python/zstandard")
+        compression = "gzip"
+    return LOG_COMPRESSION_SUFFIXES[compression]
+
+
+def open_log(log_file: str, mode: str = "r") -> IO[str]:
+    """Open a plain or compressed log file as a text stream.
+
+    Compressed streams are read and written incrementally,
+    appending to a compressed log adds a new gzip member or zstd frame.
+
+    Args:
+    ----
+        log_file (str): Path to the log file.
+        mode (str): "r" to read, "w" or "a" to write.
+
+    Returns:
+    -------
+        IO[str]: Text stream.
+    """
+    if log_file.endswith(".gz"):
+        return gzip.open(log_file, f"{mode}t", encoding="utf-8")
+
+    if log_file.endswith(".zst"):
+        if not USE_ZSTD:
+            raise OSError(f"zstandard library is required to open {log_file}")
+        raw_file = open(log_file, f"{mode}b")
+        if mode == "r":
+            binary_stream = zstandard.ZstdDecompressor().stream_reader(
+                raw_file, read_across_frames=True
+            )
+        else:
+            binary_stream = zstandard.ZstdCompressor().stream_writer(raw_file)
+        return io.TextIOWrapper(binary_stream, encoding="utf-8")
+
+    return open(log_file, mode, encoding="utf-8")
+
+
+def _get_sidecar_owner(name: str, logs: Dict[str, List[str]]) -> Optional[str]:
+    """Get the log a sidecar file belongs to, the longest log name it extends.
+
+    Example: log_2023-10-12-10-58.gz.idx => log_2023-10-12-10-58.gz
+    """
+    position = name.rfind(".")
+    while position > 0:
+        if name[:position] in logs:
+            return name[:position]
+        position = name.rfind(".", 0, position)
+    return None
+
+
+def prune_logs(
+    log_dir: str,
+    max_logs: int = 0,
+    max_total_size: int = 0,
+    keep: Optional[List[str]] = None,
+    prefix: str = "log",
+) -> List[str]:
+    """Remove the oldest logs and their sidecar files over the limits.
+
+    The size of a log includes its sidecar files: section index, cache,
+    event stream, checkpoint and vdb snapshots.
+
+    Args:
+    ----
+        log_dir (str): Directory where gentoo_update stores logs.
+        max_logs (int): Maximum amount of logs, 0 - no limit.
+        max_total_size (int): Maximum total size of logs in bytes, 0 - no limit.
+        keep (Optional[List[str]]): Log file names that are never removed.
+        prefix (str): Prune update logs ("log") or check logs ("check").
+
+    Returns:
+    -------
+        List[str]: File names of removed logs.
+    """
+    keep = keep or []
+    with os.scandir(log_dir) as entries:
+        files = {entry.name: entry.stat().st_size for entry in entries}
+    logs = sorted(name for name in files if is_log_file(name, prefix))
+    log_files: Dict[str, List[str]] = {log: [log] for log in logs}
+    for name in files:
+        owner = _get_sidecar_owner(name, log_files)
+        if owner:
+            log_files[owner].append(name)
+    log_sizes = {
+        log: sum(files[name] for name in names) for log, names in log_files.items()
+    }
+    total_size = sum(log_sizes.values())
+
+    removed = []
+    for log in logs:
+        over_count = max_logs and len(logs) - len(removed) > max_logs
+        over_size = max_total_size and total_size > max_total_size
+        if not (over_count or over_size):
+            break
+        if log in keep:
+            continue
+
+        for name in log_files[log]:
+            try:
+                os.remove(os.path.join(log_dir, name))
+            except FileNotFoundError:  # replaced by a concurrent report
+                pass
+        total_size -= log_sizes[log]
+        removed.append(log)
+
+    return removed
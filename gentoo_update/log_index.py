@@ -0,0 +1,163 @@
+"""Sidecar index with byte offsets of {{ SECTION }} markers in update logs.
+
+The index is written next to the log file by `SectionIndexHandler` while
+the update is running, so that `Parser` can seek directly to the sections
+needed for a report instead of reading the whole log.
+"""
+
+import json
+import logging
+import os
+import re
+from typing import IO, List, Optional, Tuple
+
+from .atomic_file import atomic_write
+from .log_files import is_compressed_log, open_log
+
+SECTION_PATTERN = re.compile(r"\{\{(.+?)\}\}")
+INDEX_VERSION = 1
+INDEX_SUFFIX = ".idx"
+
+
+def get_section_name(line: str) -> Optional[str]:
+    """Get section name from a log message.
+
+    Args:
+    ----
+        line (str): Log message without timestamp, example: {{ UPDATE SYSTEM }}
+
+    Returns:
+    -------
+        Optional[str]: Section name (update_system) or None if the line is not
+            a section marker.
+    """
+    if SECTION_PATTERN.search(line):
+        return "_".join(line.split()[1:-1]).lower()
+    return None
+
+
+def get_index_path(log_file: str) -> str:
+    """Get path of the index file that belongs to a log file."""
+    return f"{log_file}{INDEX_SUFFIX}"
+
+
+def load_section_index(log_file: str) -> Optional[List[Tuple[str, int]]]:
+    """Load section index of a log file.
+
+    Args:
+    ----
+        log_file (str): Path to the log file.
+
+    Returns:
+    -------
+        Optional[List[Tuple[str, int]]]: Section names with byte offsets of
+            their markers, or None if there is no valid index.
+    """
+    try:
+        with open(get_index_path(log_file), encoding="utf-8") as index_file:
+            index = json.load(index_file)
+    except (OSError, ValueError):
+        return None
+
+    if not isinstance(index, dict) or index.get("version") != INDEX_VERSION:
+        return None
+
+    try:
+        sections = [(str(name), int(offset)) for name, offset in index["sections"]]
+    except (KeyError, TypeError, ValueError):
+        return None
+
+    try:
+        log_size = os.path.getsize(log_file)
+    except OSError:
+        return None
+    if any(offset >= log_size for _, offset in sections):
+        return None
+
+    return sections
+
+
+def save_section_index(log_file: str, sections: List[Tuple[str, int]]) -> None:
+    """Atomically write section index of a log file.
+
+    Args:
+    ----
+        log_file (str): Path to the log file.
+        sections (List[Tuple[str, int]]): Section names with marker offsets.
+    """
+    with atomic_write(get_index_path(log_file)) as index_file:
+        json.dump({"version": INDEX_VERSION, "sections": sections}, index_file)
+
+
+def build_section_index(log_file: str, start: int = 0) -> List[Tuple[str, int]]:
+    """Scan a log file once and find offsets of all section markers.
+
+    Args:
+    ----
+        log_file (str): Path to the log file.
+        start (int): Offset of the line to start the scan from.
+
+    Returns:
+    -------
+        List[Tuple[str, int]]: Section names with byte offsets of their markers.
+    """
+    sections = []
+    offset = start
+    with open(log_file, "rb") as log:
+        log.seek(start)
+        for raw_line in log:
+            if b" ::: " in raw_line and b"{{" in raw_line:
+                line = raw_line.decode("utf-8", "replace").split(" ::: ")[1].strip()
+                section_name = get_section_name(line)
+                if section_name:
+                    sections.append((section_name, offset))
+            offset += len(raw_line)
+    return sections
+
+
+class SectionIndexHandler(logging.FileHandler):
+    """File handler that records offsets of section markers it writes.
+
+    Compressed logs are written through open_log and are not indexed,
+    because seeking in a compressed stream means reading it from the start.
+
+    Attributes
+    ----------
+        index_sections (bool): Whether the section index is kept.
+        sections (List[Tuple[str, int]]): Section names with marker offsets.
+    """
+
+    def __init__(self, filename: str) -> None:
+        """Initialize SectionIndexHandler class."""
+        super().__init__(filename, encoding="utf-8")
+        self.index_sections = not is_compressed_log(filename)
+        self.sections: List[Tuple[str, int]] = []
+        if self.index_sections and os.path.getsize(filename) > 0:
+            self.sections = load_section_index(filename) or build_section_index(
+                filename
+            )
+
+    def _open(self) -> IO[str]:
+        """Open the log file, compressed if the file name asks for it."""
+        return open_log(self.baseFilename, self.mode)
+
+    def emit(self, record: logging.LogRecord) -> None:
+        """Write the record and update the index if it is a section marker."""
+        section_name = None
+        if self.index_sections:
+            section_name = get_section_name(record.getMessage().strip())
+        if section_name is None:
+            super().emit(record)
+            return
+
+        if self.stream is None:
+            self.stream = self._open()
+        self.flush()
+        offset = self.stream.tell()
+        super().emit(record)
+
+        self.sections.append((section_name, offset))
+        try:
+            save_section_index(self.baseFilename, self.sections)
+        except OSError:
+            self.handleError(record)
@@ -4,37 +4,139 @@ Specifically logfiles generated by Gentoo Linux's emerge package manager.
 """
 
 import re
-from typing import Dict, List, Tuple
-
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .elogs import ElogCollector
+from .events import EVENTS_VERSION, read_events
+from .log_files import is_compressed_log, open_log
+from .log_index import (
+    SECTION_PATTERN,
+    build_section_index,
+    get_section_name,
+    load_section_index,
+    save_section_index,
+)
 from .parser_package import PackageParser
 from .report_objects import (
     DiskUsage,
     DiskUsageStats,
+    ElogEntry,
+    FetchStats,
     LogInfo,
+    MergeSettings,
+    PackageInfo,
     PretendError,
+    PretendPlan,
     PretendSection,
+    StageStats,
+    UpdateBatch,
+    UpdateEstimate,
     UpdateSection,
 )
+from .vdb import load_vdb_changes
+
+REPORT_SECTIONS = (
+    "pretend_emerge",
+    "update_system",
+    "calculate_disk_usage_1",
+    "calculate_disk_usage_2",
+    "stage_summary",
+    "read_elogs",
+)
+PARSER_MODES = ("full", "stream", "index")
+DOWNLOAD_SIZE_PATTERN = re.compile(r"^Total: .*Size of downloads: ([\d,]+) KiB")
+
+
+class SectionSplitter:
+    """Split log lines into sections one line at a time.
+
+    Lines of sections that are not listed in `wanted` are dropped
+    as soon as they are read, so only the wanted sections are kept in memory.
+
+    Attributes
+    ----------
+    wanted (Optional[set]): Section names to keep, None keeps every section.
+    section_name (str): Name of the section that is being read.
+    section_content (List[str]): Lines of the section that is being read.
+    """
+
+    def __init__(self, wanted: Optional[Iterable[str]] = None) -> None:
+        """Initialize SectionSplitter class."""
+        self.wanted = set(wanted) if wanted is not None else None
+        self.section_name = "beginning"
+        self.section_content: List[str] = []
+
+    def _is_wanted(self) -> bool:
+        """Check if the current section needs to be kept."""
+        return self.wanted is None or self.section_name in self.wanted
+
+    def feed(self, log_line: str) -> Optional[Tuple[str, List[str]]]:
+        """Process one line of the log file.
+
+        Args:
+        ----
+            log_line (str): Raw line from the log file.
+
+        Returns:
+        -------
+            Optional[Tuple[str, List[str]]]: Section name and content
+                if the line starts a new section and the previous one was wanted.
+        """
+        if " ::: " not in log_line:
+            return None
+
+        line = log_line.split(" ::: ")[1].strip()
+        section_name = get_section_name(line)
+        if section_name:
+            completed_section = self.flush()
+            self.section_name = section_name
+            self.section_content = []
+            return completed_section
+
+        if self._is_wanted():
+            self.section_content.append(line)
+        return None
+
+    def flush(self) -> Optional[Tuple[str, List[str]]]:
+        """Return the section that is being read if it is wanted."""
+        if self._is_wanted():
+            return (self.section_name, self.section_content)
+        return None
 
 
 class Parser:
     """A class that provides methods to parse log files.
 
+    Compressed logs are decompressed while they are read.
+
     Attributes
     ----------
     log_file (str): The name of the log file.
-    log_data (List[str]): The content of the log file as a list of strings.
+    mode (str): "full" reads the whole log file into memory,
+        "stream" reads it line by line and keeps only report sections,
+        "index" uses the section index to read only report sections.
+    log_data (Dict): Log content split by sections, empty in "stream" mode.
+    use_events (bool): Use the event stream of the log as a fast path.
     """
 
-    def __init__(self, log_file: str) -> None:
+    def __init__(
+        self, log_file: str, mode: str = "full", use_events: bool = True
+    ) -> None:
         """Initialize the Parser with a log file.
 
         Args:
         ----
             log_file: The name of the log file.
+            mode: Parsing mode, one of PARSER_MODES.
+            use_events: Build the report from the event stream if it exists.
         """
+        if mode not in PARSER_MODES:
+            raise ValueError(f"Unsupported parser mode: {mode}")
+
         self.log_file = log_file
-        self.log_data = self.read_log()
+        self.mode = mode
+        self.use_events = use_events
+        self.log_data = self.read_log() if mode == "full" else {}
 
     def read_log(self) -> Dict:
         """Read the log file and returns its content.
@@ -44,7 +146,7 @@ class Parser:
             Dict: A dictionary with section names as keys
                 and content as values.
         """
-        with open(self.log_file, encoding="utf-8") as log_file:
+        with open_log(self.log_file) as log_file:
             log_data = log_file.readlines()
         return self.split_log_to_sections(log_data)
 
@@ -60,14 +162,13 @@ class Parser:
             Dict: A dictionary with section names as keys
                 and content as values.
         """
-        section_pattern = r"\{\{(.+?)\}\}"
         section_name = "beginning"
         log_by_sections: Dict[str, List[str]] = {section_name: []}
 
         for log_line in log_data:
             if " ::: " in log_line:
                 line = log_line.split(" ::: ")[1].strip()
-                match_section_pattern = re.search(section_pattern, line)
+                match_section_pattern = SECTION_PATTERN.search(line)
                 if match_section_pattern:
                     section_name = "_".join(line.split()[1:-1]).lower()
                     log_by_sections[section_name] = []
@@ -81,6 +182,126 @@ class Parser:
 
         return log_by_sections
 
+    def iter_log_sections(
+        self, wanted: Iterable[str] = REPORT_SECTIONS
+    ) -> Iterator[Tuple[str, List[str]]]:
+        """Read the log file line by line and yield wanted sections.
+
+        Args:
+        ----
+            wanted (Iterable[str]): Names of the sections to yield.
+
+        Yields:
+        ------
+            Tuple[str, List[str]]: Section name and its content.
+        """
+        splitter = SectionSplitter(wanted)
+        with open_log(self.log_file) as log_file:
+            for log_line in log_file:
+                section = splitter.feed(log_line)
+                if section:
+                    yield section
+
+        section = splitter.flush()
+        if section:
+            yield section
+
+    def _get_indexed_end(self, sections: List[Tuple[str, int]]) -> Optional[int]:
+        """Check that every offset in the index points to its section marker.
+
+        Returns
+        -------
+            Optional[int]: Offset after the last indexed marker line,
+                0 if the index is empty, None if the index is outdated.
+        """
+        indexed_end = 0
+        with open(self.log_file, "rb") as log_file:
+            for section_name, offset in sections:
+                log_file.seek(offset)
+                raw_line = log_file.readline()
+                line = raw_line.decode("utf-8", "replace")
+                if " ::: " not in line:
+                    return None
+                if get_section_name(line.split(" ::: ")[1].strip()) != section_name:
+                    return None
+                indexed_end = max(indexed_end, offset + len(raw_line))
+        return indexed_end
+
+    def get_section_index(self) -> List[Tuple[str, int]]:
+        """Load section index of the log file, build it if it is missing or outdated.
+
+        An index that stopped early, because it could not be saved, is
+        completed with markers found after its last section.
+
+        Returns
+        -------
+            List[Tuple[str, int]]: Section names with byte offsets of markers.
+        """
+        sections = load_section_index(self.log_file)
+        indexed_end = None if sections is None else self._get_indexed_end(sections)
+        if sections is None or indexed_end is None:
+            sections = build_section_index(self.log_file)
+        else:
+            unindexed = build_section_index(self.log_file, indexed_end)
+            if not unindexed:
+                return sections
+            sections += unindexed
+        try:
+            save_section_index(self.log_file, sections)
+        except OSError:
+            pass
+        return sections
+
+    def iter_indexed_sections(
+        self, wanted: Iterable[str] = REPORT_SECTIONS
+    ) -> Iterator[Tuple[str, List[str]]]:
+        """Seek to wanted sections using the section index and yield them.
+
+        If a section repeats, only the last one is read,
+        same as in split_log_to_sections.
+        Compressed logs have no index and are read as a stream instead.
+
+        Args:
+        ----
+            wanted (Iterable[str]): Names of the sections to yield.
+
+        Yields:
+        ------
+            Tuple[str, List[str]]: Section name and its content.
+        """
+        if is_compressed_log(self.log_file):
+            yield from self.iter_log_sections(wanted)
+            return
+
+        sections = self.get_section_index()
+        spans = {}
+        for position, (section_name, offset) in enumerate(sections):
+            end = sections[position + 1][1] if position + 1 < len(sections) else None
+            spans[section_name] = (offset, end)
+
+        wanted_spans = sorted(
+            (span, section_name)
+            for section_name, span in spans.items()
+            if section_name in wanted
+        )
+        with open(self.log_file, "rb") as log_file:
+            for (start, end), section_name in wanted_spans:
+                log_file.seek(start)
+                splitter = SectionSplitter([section_name])
+                section = None
+                position = start
+                while section is None and (end is None or position < end):
+                    raw_line = log_file.readline()
+                    if not raw_line:
+                        break
+                    position += len(raw_line)
+                    # a marker missing from the index ends the section too
+                    section = splitter.feed(raw_line.decode("utf-8", "replace"))
+
+                section = section or splitter.flush()
+                if section:
+                    yield section
+
     def parse_emerge_pretend_section(
         self, section_content: List[str]
     ) -> PretendSection:
@@ -104,7 +325,78 @@ class Parser:
         else:
             pretend_status = False
             pretend_details = self.parse_pretend_details(section_content)
-        return PretendSection(pretend_status, pretend_details)
+        return PretendSection(
+            pretend_status,
+            pretend_details,
+            self._find_update_estimate(section_content),
+        )
+
+    def _find_update_estimate(
+        self, section_content: List[str]
+    ) -> Optional[UpdateEstimate]:
+        """Find the estimated update duration in the emerge pretend section."""
+        for line in reversed(section_content):
+            if line.startswith("Estimated update time:"):
+                return UpdateEstimate.from_log_line(line)
+        return None
+
+    def parse_pretend_plan(self, section_content: List[str]) -> PretendPlan:
+        """Parse packages that would be merged from the "emerge pretend" section.
+
+        Args:
+        ----
+            section_content (List[str]): A list of strings that contains
+                        the content of the "emerge pretend" section.
+
+        Returns:
+        -------
+            PretendPlan: Packages, amount of packages per status
+                and total download size.
+        """
+        packages = PackageParser().parse_update_details(section_content)
+        ebuild_statuses = [
+            package.update_status
+            for package in packages
+            if package.package_type == "ebuild"
+        ]
+
+        download_size_kib = None
+        for line in section_content:
+            match_download_size = DOWNLOAD_SIZE_PATTERN.match(line)
+            if match_download_size:
+                download_size_kib = int(match_download_size.group(1).replace(",", ""))
+        if download_size_kib is None:
+            sizes = [getattr(package, "size_kib", None) for package in packages]
+            if any(size is not None for size in sizes):
+                download_size_kib = sum(size for size in sizes if size is not None)
+
+        return PretendPlan(
+            packages,
+            ebuild_statuses.count("Update"),
+            ebuild_statuses.count("NewPackage"),
+            ebuild_statuses.count("ReEmerge"),
+            download_size_kib,
+            self._find_update_estimate(section_content),
+        )
+
+    def extract_pretend_plan(self) -> Optional[PretendPlan]:
+        """Extract the pretend plan from the log file.
+
+        Returns
+        -------
+            Optional[PretendPlan]: Packages that would be merged,
+                None if the log has no "emerge pretend" section.
+        """
+        if self.mode == "full":
+            sections = iter(self.log_data.items())
+        else:
+            sections = self.iter_log_sections(["pretend_emerge"])
+
+        plan = None
+        for section, section_content in sections:
+            if section == "pretend_emerge":
+                plan = self.parse_pretend_plan(section_content)
+        return plan
 
     def _parse_pretend_get_blocked_details(self, error_content: List[str]) -> List[str]:
         """Parse details of blocked package error.
@@ -207,7 +499,48 @@ class Parser:
         else:
             update_status = False
             update_details = {"updated_packages": [], "errors": []}
-        return UpdateSection(update_type, update_status, update_details)
+        return UpdateSection(
+            update_type,
+            update_status,
+            update_details,
+            self._find_update_batches(section_content),
+            self._find_fetch_stats(section_content),
+            self._find_merge_settings(section_content),
+        )
+
+    def _find_update_batches(
+        self, section_content: List[str]
+    ) -> Optional[List[UpdateBatch]]:
+        """Find the last status of every batch in the update system section."""
+        batches: Dict[int, UpdateBatch] = {}
+        for line in section_content:
+            if line.startswith("Update batch "):
+                batch = UpdateBatch.from_log_line(line)
+                if batch:
+                    batches[batch.number] = batch
+        if not batches:
+            return None
+        return [batches[number] for number in sorted(batches)]
+
+    def _find_fetch_stats(self, section_content: List[str]) -> Optional[FetchStats]:
+        """Find distfiles prefetched during the update, None if there were none."""
+        for line in section_content:
+            if line.startswith("Prefetch: "):
+                fetch = FetchStats.from_log_line(line)
+                if fetch:
+                    return fetch
+        return None
+
+    def _find_merge_settings(
+        self, section_content: List[str]
+    ) -> Optional[MergeSettings]:
+        """Find merge settings picked by gentoo-update, None if there are none."""
+        for line in section_content:
+            if line.startswith("Merge settings: "):
+                settings = MergeSettings.from_log_line(line)
+                if settings:
+                    return settings
+        return None
 
     def parse_disk_usage_info(self, section_content: List[str]) -> List[DiskUsageStats]:
         """Get disk usage information.
@@ -228,21 +561,44 @@ class Parser:
         mount_points = []
 
         for line in mount_point_lines:
-            split_content = line.split(" ===> ")
-            stats = split_content[1].split(", ")
+            mount_points.append(DiskUsageStats.from_log_line(line))
 
-            mount_point = split_content[0].replace("Disk usage for ", "")
-            total = stats[0].split("=")[1]
-            used = stats[1].split("=")[1]
-            free = stats[2].split("=")[1]
-            percent_used = stats[3].split("=")[1]
+        return mount_points
 
-            disk_usage_stats = DiskUsageStats(
-                mount_point, total, used, free, percent_used
-            )
-            mount_points.append(disk_usage_stats)
+    def parse_stage_summary(self, section_content: List[str]) -> List[StageStats]:
+        """Get time and resources used by updater stages.
 
-        return mount_points
+        Args:
+        ----
+            section_content (List[str]): A list where each item is
+                one line of logs from a section.
+
+        Returns:
+        -------
+            List[StageStats]: Stats of every stage that has run.
+        """
+        return [
+            StageStats.from_log_line(line)
+            for line in section_content
+            if line.startswith("Stage ")
+        ]
+
+    def parse_elogs(self, section_content: List[str]) -> List[ElogEntry]:
+        """Get elogs of packages merged during the update.
+
+        Args:
+        ----
+            section_content (List[str]): A list where each item is
+                one line of logs from a section.
+
+        Returns:
+        -------
+            List[ElogEntry]: Elogs in the order they were written.
+        """
+        collector = ElogCollector()
+        for line in section_content:
+            collector.feed(line)
+        return collector.elogs
 
     def extract_info_for_report(self) -> LogInfo:
         """Extract information about the update from the log file.
@@ -251,12 +607,162 @@ class Parser:
         -------
             LogInfo: Dataclass containing parsed data from all sections.
         """
+        log_info = self.read_log_info_from_events() if self.use_events else None
+        if log_info is None:
+            if self.mode == "stream":
+                sections = self.iter_log_sections()
+            elif self.mode == "index":
+                sections = self.iter_indexed_sections()
+            else:
+                sections = iter(self.log_data.items())
+            log_info = self.build_log_info(sections)
+
+        log_info.vdb_changes = load_vdb_changes(self.log_file)
+        return log_info
+
+    def read_log_info_from_events(self) -> Optional[LogInfo]:
+        """Build LogInfo from the event stream of the log file.
+
+        Only streams of completed runs without failed stages are used,
+        everything else is parsed from the log text.
+
+        Returns
+        -------
+            Optional[LogInfo]: Information about the update, or None
+                if the event stream can not be used.
+        """
+        try:
+            events = list(read_events(self.log_file))
+        except OSError:
+            return None
+
+        if not events or events[-1].get("event") != "run_end":
+            return None
+        if events[0].get("event") != "run_start":
+            return None
+        if events[0].get("version") != EVENTS_VERSION:
+            return None
+
+        sections: Dict[str, Dict] = {}
+        stages = []
+        elogs = None
+        for event in events:
+            event_type = event.get("event")
+            if event_type == "stage_end":
+                if event.get("exit_code") != 0:
+                    return None
+                stats = {
+                    name: value
+                    for name, value in event.items()
+                    if name not in ("event", "time")
+                }
+                stages.append(StageStats(**stats))
+            if event_type == "section":
+                if event["name"] == "read_elogs":
+                    elogs = []
+                sections[event["name"]] = {
+                    "statuses": [],
+                    "targets": None,
+                    "packages": [],
+                    "disk_usage": [],
+                    "update_estimate": None,
+                    "batches": {},
+                    "fetch": None,
+                    "settings": None,
+                }
+                continue
+
+            section = sections.get(event.get("section", ""))
+            if section is None:
+                continue
+            if event_type == "status":
+                section["statuses"].append(event["message"])
+            elif event_type == "update_target":
+                section["targets"] = event["targets"]
+            elif event_type == "package":
+                section["packages"].append(PackageInfo.from_dict(event["package"]))
+            elif event_type == "disk_usage":
+                section["disk_usage"].append(DiskUsageStats(**event["stats"]))
+            elif event_type == "update_estimate":
+                section["update_estimate"] = UpdateEstimate(**event["estimate"])
+            elif event_type == "update_batch":
+                batch = UpdateBatch(**event["batch"])
+                section["batches"][batch.number] = batch
+            elif event_type == "update_fetch":
+                section["fetch"] = FetchStats(**event["fetch"])
+            elif event_type == "update_settings":
+                section["settings"] = MergeSettings(**event["settings"])
+            elif event_type == "elog" and elogs is not None:
+                elogs.append(ElogEntry(**event["elog"]))
+
+        pretend_emerge = None
+        if "pretend_emerge" in sections:
+            pretend_emerge = PretendSection(
+                True, None, sections["pretend_emerge"]["update_estimate"]
+            )
+
+        update_system = None
+        if "update_system" in sections:
+            update_section = sections["update_system"]
+            statuses = update_section["statuses"]
+            targets = update_section["targets"]
+            update_type = "Undefined"
+            if targets is not None:
+                update_type = "@world" if targets == ["@world"] else "security"
+
+            update_details = {"updated_packages": [], "errors": []}
+            if "update was successful" in statuses:
+                update_status = True
+                if "Nothing to merge; quitting" not in statuses:
+                    update_details = {"updated_packages": update_section["packages"]}
+            elif "There are no packages to update, skipping..." in statuses:
+                update_status = True
+                update_type = "security"
+            else:
+                update_status = False
+            batches = update_section["batches"]
+            update_system = UpdateSection(
+                update_type,
+                update_status,
+                update_details,
+                [batches[number] for number in sorted(batches)] or None,
+                update_section["fetch"],
+                update_section["settings"],
+            )
+
+        disk_usage = DiskUsage(
+            sections.get("calculate_disk_usage_1", {}).get("disk_usage"),
+            sections.get("calculate_disk_usage_2", {}).get("disk_usage"),
+        )
+        if "stage_summary" in sections:
+            stage_order = {
+                stage: position
+                for position, stage in enumerate(events[0].get("stages") or [])
+            }
+            stages.sort(key=lambda stats: stage_order.get(stats.stage, 0))
+        else:
+            stages = None
+        return LogInfo(pretend_emerge, update_system, disk_usage, stages, elogs)
+
+    def build_log_info(self, sections: Iterable[Tuple[str, List[str]]]) -> LogInfo:
+        """Parse report sections into LogInfo.
+
+        Args:
+        ----
+            sections (Iterable[Tuple[str, List[str]]]): Section names and content.
+
+        Returns:
+        -------
+            LogInfo: Dataclass containing parsed data from all sections.
+        """
         pretend_emerge = None
         update_system = None
         before_update = None
         after_update = None
+        stages = None
+        elogs = None
 
-        for section, section_content in self.log_data.items():
+        for section, section_content in sections:
             if section == "pretend_emerge":
                 pretend_emerge = self.parse_emerge_pretend_section(section_content)
             elif section == "update_system":
@@ -265,7 +771,15 @@ class Parser:
                 before_update = self.parse_disk_usage_info(section_content)
             elif section == "calculate_disk_usage_2":
                 after_update = self.parse_disk_usage_info(section_content)
+            elif section == "stage_summary":
+                stages = self.parse_stage_summary(section_content)
+            elif section == "read_elogs":
+                elogs = self.parse_elogs(section_content)
 
         return LogInfo(
-            pretend_emerge, update_system, DiskUsage(before_update, after_update)
+            pretend_emerge,
+            update_system,
+            DiskUsage(before_update, after_update),
+            stages,
+            elogs,
         )
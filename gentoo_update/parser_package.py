@@ -4,51 +4,77 @@ Specifically logfiles generated by Gentoo Linux's emerge package manager.
 """
 
 import re
-from typing import List
+from dataclasses import dataclass
+from typing import Dict, List, Optional
 
+from .atom import parse_atom
 from .report_objects import PackageInfo
 
+PACKAGE_LINE_PATTERN = re.compile(r"\[(ebuild|blocks|uninstall)\b[^\]]*\]")
+TOKEN_PATTERN = re.compile(
+    r'(?P<attr>[A-Za-z0-9_]+)="(?P<value>[^"]*)"'
+    r'|(?:[^\s"\[]+|"[^"]*"|\[[^\]]*\]|["\[])+'
+)
 
-class PackageParser:
-    """A class that provides methods to parse package specific information."""
 
-    def __init__(self) -> None:
-        """Initialize PackageParser class."""
-        pass
+@dataclass
+class PackageTokens:
+    """Dataclass with tokens of one package line from emerge output.
 
-    def _parse_package_string(self, package_string: str) -> List[str]:
-        """Parse package string into multiple parts.
+    Example line:
+        [ebuild     U  ] sys-devel/gnuconfig-20230731::gentoo [20230121::gentoo]
+        USE="-test" 72 KiB
+    """
 
-        Args:
-        ----
-            package_string (str): String containing package information.
+    package_type: str
+    tokens: List[str]
+    attributes: Dict[str, List[str]]
+    size_kib: Optional[int]
 
-        Returns:
-        -------
-            List: List containing package information parts.
-        """
-        split_package_string = []
-        temp = ""
-        quotes_count = 0
-        brackets_count = 0
 
-        for char in package_string:
-            temp += char
-            if char == '"':
-                quotes_count += 1
-            elif char == "[":
-                brackets_count += 1
-            elif char == "]":
-                brackets_count -= 1
+def tokenize_package_line(line: str) -> Optional[PackageTokens]:
+    """Split a package line into tokens in a single pass.
+
+    Spaces inside quotes and brackets do not split tokens.
+    Attributes like USE="..." or PYTHON_TARGETS="..." and the download size
+    are collected while tokenizing.
+
+    Args:
+    ----
+        line (str): One line of emerge output.
+
+    Returns:
+    -------
+        Optional[PackageTokens]: Tokens of the line, or None if the line
+            does not describe an ebuild, a block or an uninstall.
+    """
+    line_type = PACKAGE_LINE_PATTERN.match(line)
+    if line_type is None:
+        return None
 
-            if char == " " and quotes_count % 2 == 0 and brackets_count == 0:
-                split_package_string.append(temp.strip())
-                temp = ""
+    tokens = [line_type.group()]
+    attributes = {}
+    for token in TOKEN_PATTERN.finditer(line, line_type.end()):
+        attribute = token.group("attr")
+        if attribute is not None:
+            attributes[attribute] = token.group("value").split(" ")
+        tokens.append(token.group())
 
-        if temp:
-            split_package_string.append(temp.strip())
+    size_kib = None
+    if len(tokens) > 2 and tokens[-1] == "KiB":
+        size = tokens[-2].replace(",", "")
+        if size.isdigit():
+            size_kib = int(size)
 
-        return split_package_string
+    return PackageTokens(line_type.group(1), tokens, attributes, size_kib)
+
+
+class PackageParser:
+    """A class that provides methods to parse package specific information."""
+
+    def __init__(self) -> None:
+        """Initialize PackageParser class."""
+        pass
 
     def _determine_update_status(self, update_status: str) -> str:
         """Determine what happens to the package during update.
@@ -74,12 +100,12 @@ class PackageParser:
 
         return status
 
-    def _parse_package_ebuild(self, split_package_string: List) -> PackageInfo:
+    def _parse_package_ebuild(self, package_tokens: PackageTokens) -> PackageInfo:
         """Parse ebuild information.
 
         Args:
         ----
-            split_package_string (List[str]): A list with ebuild info, example:
+            package_tokens (PackageTokens): Tokens with ebuild info, example:
                 ['[ebuild     U  ]', 'sys-devel/gnuconfig-20230731::gentoo',
                  '[20230121::gentoo]', '72', 'KiB']
 
@@ -87,26 +113,21 @@ class PackageParser:
         -------
             PackageInfo: PackageInfo object with processed information
         """
+        split_package_string = package_tokens.tokens
         package_type = "ebuild"
         update_status = self._determine_update_status(split_package_string[0])
         package_base_info = split_package_string[1]
-        repo = package_base_info.split("::")[1]
-        name_newversion = package_base_info.split("::")[0]
-
-        package_name = ""
-        for part in name_newversion.split("-"):
-            if part.isnumeric() is True:
-                pass
-            elif "." in part or ":" in part:
-                pass
-            elif len(part) == 2 and part[0] == "r" and part[1].isnumeric():
-                pass
-            else:
-                package_name += f"{part}-"
-
-        new_version = name_newversion.replace(package_name, "")
-        old_version = split_package_string[2].split("::")[0][1:]
-        package_name = package_name[:-1]
+        name_newversion, _, repo = package_base_info.partition("::")
+
+        try:
+            package_name = parse_atom(package_base_info).package_name
+            new_version = name_newversion[len(package_name) + 1 :]
+        except ValueError:
+            package_name, _, new_version = name_newversion.rpartition("-")
+
+        old_version = None
+        if len(split_package_string) > 2 and split_package_string[2].startswith("["):
+            old_version = split_package_string[2][1:-1].split("::")[0]
 
         ebuild_info = PackageInfo(
             package_type,
@@ -117,19 +138,16 @@ class PackageParser:
             repo,
         )
 
-        for var in split_package_string:
-            if '="' in var:
-                splitvar = var.split("=")
-                ebuild_info.add_attributes({splitvar[0]: splitvar[1][1:-1].split(" ")})
-
+        ebuild_info.add_attributes(package_tokens.attributes)
+        ebuild_info.add_attributes({"size_kib": package_tokens.size_kib})
         return ebuild_info
 
-    def _parse_package_blocks(self, split_package_string: List[str]) -> PackageInfo:
+    def _parse_package_blocks(self, package_tokens: PackageTokens) -> PackageInfo:
         """Parse blocks information.
 
         Args:
         ----
-            split_package_string (List[str]): A list with blocks info, example:
+            package_tokens (PackageTokens): Tokens with blocks info, example:
                 ['[blocks b      ]', '<perl-core/Compress-Raw-Zlib-2.204.1_rc',
                  '("<perl-core/Compress-Raw-Zlib-2.204.1_rc"', 'is', 'soft',
                  'blocking', 'virtual/perl-Compress-Raw-Zlib-2.204.1_rc)']
@@ -138,6 +156,7 @@ class PackageParser:
         -------
             PackageInfo: PackageInfo object with processed information
         """
+        split_package_string = package_tokens.tokens
         package_type = "blocks"
         package_name = split_package_string[1][1:]
         new_version = None
@@ -157,12 +176,12 @@ class PackageParser:
         blocks_info.add_attributes({"blocked_package": split_package_string[-1][:-1]})
         return blocks_info
 
-    def _parse_package_uninstall(self, split_package_string: List[str]) -> PackageInfo:
+    def _parse_package_uninstall(self, package_tokens: PackageTokens) -> PackageInfo:
         """Parse uninstall information.
 
         Args:
         ----
-            split_package_string (List[str]): A list with uninstall info
+            package_tokens (PackageTokens): Tokens with uninstall info
 
         Example:
         -------
@@ -172,6 +191,7 @@ class PackageParser:
         -------
             PackageInfo: PackageInfo object with processed information
         """
+        split_package_string = package_tokens.tokens
         package_type = "uninstall"
         split_package_info = split_package_string[1].split("::")
         package_name = split_package_info[0]
@@ -205,24 +225,19 @@ class PackageParser:
             List[PackageInfo]: List of PackageInfo objects where each object
                 contains useful information for the report.
         """
-        ebuild_info_pattern = r"\[(.+?)\]"
-        package_strings = [
-            line
-            for line in section_content
-            if re.search(ebuild_info_pattern, line) and line != "[ ok ]"
-        ]
         packages = []
-        for package_string in package_strings:
-            split_package_string = self._parse_package_string(package_string)
-            update_status = split_package_string[0]
+        for line in section_content:
+            package_tokens = tokenize_package_line(line)
+            if package_tokens is None:
+                continue
 
             package = None
-            if "ebuild" in update_status:
-                package = self._parse_package_ebuild(split_package_string)
-            elif "blocks" in update_status:
-                package = self._parse_package_blocks(split_package_string)
-            elif "uninstall" in update_status:
-                package = self._parse_package_uninstall(split_package_string)
+            if package_tokens.package_type == "ebuild":
+                package = self._parse_package_ebuild(package_tokens)
+            elif package_tokens.package_type == "blocks":
+                package = self._parse_package_blocks(package_tokens)
+            elif package_tokens.package_type == "uninstall":
+                package = self._parse_package_uninstall(package_tokens)
 
             if package:
                 packages.append(package)
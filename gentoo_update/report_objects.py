@@ -1,7 +1,23 @@
 """Dataclasses that are used to construct update reports."""
 
-from dataclasses import dataclass
-from typing import Dict, List, Optional
+import re
+from dataclasses import dataclass, fields
+from typing import Dict, List, Optional, get_args, get_type_hints
+
+ESTIMATE_PATTERN = re.compile(
+    r"^Estimated update time: (\d+) seconds for (\d+) packages, "
+    r"(\d+) packages without merge history$"
+)
+BATCH_PATTERN = re.compile(
+    r"^Update batch (\d+) of (\d+): (\d+) packages, (started|done|failed)$"
+)
+FETCH_PATTERN = re.compile(
+    r"^Prefetch: (\d+) bytes fetched in ([\d.]+) seconds, "
+    r"merge waited ([\d.]+) seconds on fetch$"
+)
+SETTINGS_PATTERN = re.compile(
+    r"^Merge settings: --jobs (\d+) --load-average ([\d.]+), MAKEOPTS=(.+)$"
+)
 
 
 @dataclass
@@ -20,14 +36,156 @@ class PackageInfo:
         for attr_name, attr_value in attrs.items():
             setattr(self, attr_name, attr_value)
 
+    @classmethod
+    def from_dict(cls, package_dict: Dict) -> "PackageInfo":
+        """Create PackageInfo from a dict made with vars(), extra attributes too."""
+        field_names = [field.name for field in fields(cls)]
+        package = cls(*[package_dict.get(name) for name in field_names])
+        package.add_attributes(
+            {
+                attr_name: attr_value
+                for attr_name, attr_value in package_dict.items()
+                if attr_name not in field_names
+            }
+        )
+        return package
+
+
+@dataclass
+class UpdateBatch:
+    """Dataclass with progress of one batch of a batched update.
+
+    status is "started" while the batch is merged, "done" or "failed"
+    when it has finished.
+    """
+
+    number: int
+    total: int
+    packages: int
+    status: str
+
+    def to_log_line(self) -> str:
+        """Format the batch as a line of the update system section."""
+        return (
+            f"Update batch {self.number} of {self.total}: "
+            f"{self.packages} packages, {self.status}"
+        )
+
+    @classmethod
+    def from_log_line(cls, line: str) -> Optional["UpdateBatch"]:
+        """Create UpdateBatch from a line written by to_log_line.
+
+        Args:
+        ----
+            line (str): Example:
+                Update batch 2 of 5: 50 packages, done
+
+        Returns:
+        -------
+            Optional[UpdateBatch]: The batch, None if the line
+                is not a batch line.
+        """
+        match_batch = BATCH_PATTERN.match(line)
+        if match_batch is None:
+            return None
+        number, total, packages, status = match_batch.groups()
+        return cls(int(number), int(total), int(packages), status)
+
+
+@dataclass
+class FetchStats:
+    """Dataclass with distfiles fetched in the background during the update.
+
+    fetched_bytes is the size of distfiles that were added or changed
+    while the update was merged. wait_seconds is the time the merge
+    spent on downloads of its own and on waiting for the background fetch.
+    """
+
+    fetched_bytes: int
+    fetch_seconds: float
+    wait_seconds: float
+
+    def to_log_line(self) -> str:
+        """Format the stats as a line of the update system section."""
+        return (
+            f"Prefetch: {self.fetched_bytes} bytes fetched in "
+            f"{self.fetch_seconds:.1f} seconds, "
+            f"merge waited {self.wait_seconds:.1f} seconds on fetch"
+        )
+
+    @classmethod
+    def from_log_line(cls, line: str) -> Optional["FetchStats"]:
+        """Create FetchStats from a line written by to_log_line.
+
+        Args:
+        ----
+            line (str): Example:
+                Prefetch: 15486976 bytes fetched in 12.3 seconds,
+                merge waited 1.2 seconds on fetch
+
+        Returns:
+        -------
+            Optional[FetchStats]: The stats, None if the line
+                is not a prefetch line.
+        """
+        match_fetch = FETCH_PATTERN.match(line)
+        if match_fetch is None:
+            return None
+        fetched_bytes, fetch_seconds, wait_seconds = match_fetch.groups()
+        return cls(int(fetched_bytes), float(fetch_seconds), float(wait_seconds))
+
+
+@dataclass
+class MergeSettings:
+    """Dataclass with parallelism of the merge picked from host resources."""
+
+    jobs: int
+    load_average: float
+    makeopts: str
+
+    def to_log_line(self) -> str:
+        """Format the settings as a line of the update system section."""
+        return (
+            f"Merge settings: --jobs {self.jobs} "
+            f"--load-average {self.load_average:.1f}, MAKEOPTS={self.makeopts}"
+        )
+
+    @classmethod
+    def from_log_line(cls, line: str) -> Optional["MergeSettings"]:
+        """Create MergeSettings from a line written by to_log_line.
+
+        Args:
+        ----
+            line (str): Example:
+                Merge settings: --jobs 4 --load-average 16.0, MAKEOPTS=-j4 -l16
+
+        Returns:
+        -------
+            Optional[MergeSettings]: The settings, None if the line
+                is not a settings line.
+        """
+        match_settings = SETTINGS_PATTERN.match(line)
+        if match_settings is None:
+            return None
+        jobs, load_average, makeopts = match_settings.groups()
+        return cls(int(jobs), float(load_average), makeopts)
+
 
 @dataclass
 class UpdateSection:
-    """Dataclass update section."""
+    """Dataclass update section.
+
+    batches is the progress of a batched update, None if the update
+    was merged at once. fetch is None if distfiles were not prefetched,
+    merge_settings is None if they were not picked by gentoo-update.
+    """
 
     update_type: str
     update_status: bool
     update_details: Dict
+    batches: Optional[List[UpdateBatch]] = None
+    fetch: Optional[FetchStats] = None
+    merge_settings: Optional[MergeSettings] = None
 
 
 @dataclass
@@ -38,23 +196,115 @@ class PretendError:
     error_details: List[str]
 
 
+@dataclass
+class UpdateEstimate:
+    """Dataclass with estimated duration of an update.
+
+    The estimate is a sum of typical merge durations of packages
+    that have merge history in emerge.log, packages without history
+    are only counted.
+    """
+
+    seconds: int
+    known_packages: int
+    unknown_packages: int
+
+    def to_log_line(self) -> str:
+        """Format the estimate as a line of the emerge pretend section."""
+        return (
+            f"Estimated update time: {self.seconds} seconds "
+            f"for {self.known_packages} packages, "
+            f"{self.unknown_packages} packages without merge history"
+        )
+
+    @classmethod
+    def from_log_line(cls, line: str) -> Optional["UpdateEstimate"]:
+        """Create UpdateEstimate from a line written by to_log_line.
+
+        Args:
+        ----
+            line (str): Example:
+                Estimated update time: 3723 seconds for 120 packages,
+                4 packages without merge history
+
+        Returns:
+        -------
+            Optional[UpdateEstimate]: The estimate, None if the line
+                is not an estimate.
+        """
+        match_estimate = ESTIMATE_PATTERN.match(line)
+        if match_estimate is None:
+            return None
+        return cls(*[int(number) for number in match_estimate.groups()])
+
+
 @dataclass
 class PretendSection:
     """Dataclass pretend section."""
 
     pretend_status: bool
     pretend_details: Optional[PretendError]
+    update_estimate: Optional[UpdateEstimate] = None
 
 
 @dataclass
 class DiskUsageStats:
-    """Dataclass disk usage stats."""
+    """Dataclass disk usage stats.
+
+    Sizes are human readable strings like 253G, byte counts are None
+    in logs written before disk usage was collected with statvfs.
+    """
 
     mount_point: str
     total: str
     used: str
     free: str
     percent_used: str
+    total_bytes: Optional[int] = None
+    used_bytes: Optional[int] = None
+    free_bytes: Optional[int] = None
+
+    def to_log_line(self) -> str:
+        """Format disk usage as a line of the calculate disk usage section."""
+        line = (
+            f"Disk usage for {self.mount_point} ===> Total={self.total}, "
+            f"Used={self.used}, Free={self.free}, Percent used={self.percent_used}"
+        )
+        if self.total_bytes is not None:
+            line += (
+                f", Total bytes={self.total_bytes}, Used bytes={self.used_bytes}, "
+                f"Free bytes={self.free_bytes}"
+            )
+        return line
+
+    @classmethod
+    def from_log_line(cls, line: str) -> "DiskUsageStats":
+        """Create DiskUsageStats from a line written by check_disk_usage.
+
+        Args:
+        ----
+            line (str): Example:
+                Disk usage for / ===> Total=453G, Used=177G, Free=253G, Percent used=42%
+                Lines written by log_disk_usage end with byte counts:
+                ..., Total bytes=486...., Used bytes=190..., Free bytes=271...
+        """
+        split_content = line.split(" ===> ")
+        stats = dict(stat.partition("=")[::2] for stat in split_content[1].split(", "))
+
+        mount_point = split_content[0].replace("Disk usage for ", "")
+        byte_counts = [
+            int(stats[name]) if stats.get(name, "").isdigit() else None
+            for name in ("Total bytes", "Used bytes", "Free bytes")
+        ]
+
+        return cls(
+            mount_point,
+            stats["Total"],
+            stats["Used"],
+            stats["Free"],
+            stats["Percent used"],
+            *byte_counts,
+        )
 
 
 @dataclass
@@ -65,6 +315,105 @@ class DiskUsage:
     after_update: Optional[List[DiskUsageStats]]
 
 
+@dataclass
+class PretendPlan:
+    """Dataclass with packages that emerge pretend would merge.
+
+    Counts are taken from package statuses, download size from the
+    "Total: ..., Size of downloads: ... KiB" line of emerge,
+    or from the sum of package sizes if that line is missing.
+    """
+
+    packages: List[PackageInfo]
+    updated: int
+    new: int
+    reemerged: int
+    download_size_kib: Optional[int]
+    update_estimate: Optional[UpdateEstimate] = None
+
+
+@dataclass
+class StageStats:
+    """Dataclass with time and resources used by one updater stage.
+
+    CPU times, peak RSS and disk I/O include all processes
+    started by the stage, like emerge and the compilers it runs.
+    timeout_reason is "timeout" if the stage ran longer than its time
+    limit and "stall" if it stopped producing output, None otherwise.
+    """
+
+    stage: str
+    exit_code: int
+    wall_time: float
+    user_time: Optional[float] = None
+    system_time: Optional[float] = None
+    max_rss_kib: Optional[int] = None
+    read_bytes: Optional[int] = None
+    write_bytes: Optional[int] = None
+    timeout_reason: Optional[str] = None
+
+    def get_timeout_message(self) -> Optional[str]:
+        """Describe why the stage was killed, None if it finished by itself."""
+        if self.timeout_reason == "timeout":
+            return f"stage {self.stage} timed out after {self.wall_time:.0f} seconds"
+        if self.timeout_reason == "stall":
+            return (
+                f"stage {self.stage} stalled without output, "
+                f"killed after {self.wall_time:.0f} seconds"
+            )
+        return None
+
+    def to_log_line(self) -> str:
+        """Format stats as one line of the stage summary section.
+
+        Example:
+            Stage update: exit_code=0, wall_time=3602.5, user_time=9100.25, ...
+        """
+        values = ", ".join(
+            f"{field.name}={getattr(self, field.name)}" for field in fields(self)[1:]
+        )
+        return f"Stage {self.stage}: {values}"
+
+    @classmethod
+    def from_log_line(cls, line: str) -> "StageStats":
+        """Create StageStats from a line written by to_log_line.
+
+        Args:
+        ----
+            line (str): Example:
+                Stage sync_tree: exit_code=0, wall_time=7.5, user_time=None, ...
+        """
+        stage, _, values = line[len("Stage ") :].partition(": ")
+        field_types = get_type_hints(cls)
+        stats = {}
+        for value in values.split(", "):
+            name, _, raw_value = value.partition("=")
+            if name not in field_types or raw_value == "None":
+                continue
+            # Optional[float] => float
+            field_type = field_types[name]
+            converter = next(
+                (arg for arg in get_args(field_type) if arg is not type(None)),
+                field_type,
+            )
+            stats[name] = converter(raw_value)
+        return cls(stage, **stats)
+
+
+@dataclass
+class ElogEntry:
+    """Dataclass with one elog file of a merged package.
+
+    package_name is None if the file name does not contain a package atom.
+    truncated_bytes is the size of the file that was not logged.
+    """
+
+    file_name: str
+    package_name: Optional[str]
+    messages: List[str]
+    truncated_bytes: int = 0
+
+
 @dataclass
 class LogInfo:
     """Dataclass log info."""
@@ -72,3 +421,6 @@ class LogInfo:
     pretend_emerge: Optional[PretendSection]
     update_system: Optional[UpdateSection]
     disk_usage: DiskUsage
+    stages: Optional[List[StageStats]] = None
+    elogs: Optional[List[ElogEntry]] = None
+    vdb_changes: Optional[List[PackageInfo]] = None
@@ -12,6 +12,37 @@ import sys
 from typing import Dict, List, Optional
 
 from .parser import DiskUsage, LogInfo, PretendError, PretendSection, UpdateSection
+from .report_objects import ElogEntry, PretendPlan, StageStats, UpdateEstimate
+from .sizes import format_size
+
+ELOG_REPORT_LINES = 5
+ELOG_HEADER_FIELDS = (
+    "Package:",
+    "Repository:",
+    "Maintainer:",
+    "Upstream:",
+    "USE:",
+    "FEATURES:",
+)
+
+
+def format_duration(seconds: float) -> str:
+    """Format a duration like 1h 02m 03s, short durations like 4.2s."""
+    if seconds < 60:
+        return f"{seconds:.1f}s"
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    if hours:
+        return f"{hours}h {minutes:02d}m {seconds:02d}s"
+    return f"{minutes}m {seconds:02d}s"
+
+
+def format_estimate(estimate: UpdateEstimate) -> str:
+    """Format estimated update time, example: ~1m 05s."""
+    estimate_line = f"~{format_duration(estimate.seconds)}"
+    if estimate.unknown_packages:
+        estimate_line += f" ({estimate.unknown_packages} packages without history)"
+    return estimate_line
 
 
 class Reporter:
@@ -21,6 +52,10 @@ class Reporter:
         """Initialize Reporter class."""
         self.info: LogInfo = update_info
         self.short_report = short_report
+        self.elogs: Dict[str, List[ElogEntry]] = {}
+        for elog in update_info.elogs or []:
+            if elog.package_name:
+                self.elogs.setdefault(elog.package_name, []).append(elog)
 
     def _create_failed_pretend_report(self, pretend_info: PretendSection) -> List[str]:
         """Create a report when emerge pretend fails.
@@ -83,7 +118,78 @@ class Reporter:
             List: A list of strings that comprise the failed update report.
         """
         # do failed report processing
-        return ["Your update is a failure"]
+        report = ["Your update is a failure"]
+        report += self._report_batches(update_info)
+        report += self._report_fetch(update_info)
+        report += self._report_merge_settings(update_info)
+        return report
+
+    def _report_batches(self, update_info: Optional[UpdateSection]) -> List[str]:
+        """Report progress of every batch of a batched update.
+
+        Args:
+        ----
+            update_info (LogInfo.UpdateSection): Update information.
+
+        Returns:
+        -------
+            List[str]: Batch section of the report, empty if the update
+                was not batched.
+        """
+        if not update_info or not update_info.batches:
+            return []
+        batches = update_info.batches
+        done = sum(1 for batch in batches if batch.status == "done")
+        batch_report = ["", f"update batches: {done} of {batches[0].total} done"]
+        for batch in batches:
+            batch_report.append(
+                f"--- batch {batch.number}: {batch.packages} packages, {batch.status}"
+            )
+        return batch_report
+
+    def _report_fetch(self, update_info: Optional[UpdateSection]) -> List[str]:
+        """Report distfiles fetched in the background during the update.
+
+        Args:
+        ----
+            update_info (LogInfo.UpdateSection): Update information.
+
+        Returns:
+        -------
+            List[str]: Prefetch section of the report, empty if distfiles
+                were not prefetched.
+        """
+        if not update_info or not update_info.fetch:
+            return []
+        fetch = update_info.fetch
+        return [
+            "",
+            f"distfiles fetched: {format_size(fetch.fetched_bytes)} "
+            f"in {format_duration(fetch.fetch_seconds)}",
+            f"merge waited on fetch: {format_duration(fetch.wait_seconds)}",
+        ]
+
+    def _report_merge_settings(self, update_info: Optional[UpdateSection]) -> List[str]:
+        """Report --jobs, --load-average and MAKEOPTS picked for the merge.
+
+        Args:
+        ----
+            update_info (LogInfo.UpdateSection): Update information.
+
+        Returns:
+        -------
+            List[str]: Merge settings section of the report, empty if
+                the settings were not picked by gentoo-update.
+        """
+        if not update_info or not update_info.merge_settings:
+            return []
+        settings = update_info.merge_settings
+        return [
+            "",
+            f"merge settings: --jobs {settings.jobs} "
+            f"--load-average {settings.load_average:.1f}",
+            f"MAKEOPTS: {settings.makeopts}",
+        ]
 
     def _sort_packages_into_categories(self, packages: List) -> Dict:
         """Sort packages into 4 categories.
@@ -150,9 +256,34 @@ class Reporter:
                 report.append(f"--- {package_name} {old_version}->{new_version}")
             else:
                 report.append(f"--- {package_name} {new_version}")
+            report += self._report_package_elogs(package_name)
 
         return report
 
+    def _report_package_elogs(self, package_name: str) -> List[str]:
+        """Report the first elog messages of a package under its report line.
+
+        Args:
+        ----
+            package_name (str): Package name, like dev-libs/openssl.
+
+        Returns:
+        -------
+            List[str]: Elog lines, empty if the package has no elogs.
+        """
+        elog_report = []
+        for elog in self.elogs.get(package_name, []):
+            messages = [
+                message
+                for message in elog.messages
+                if message and not message.startswith(ELOG_HEADER_FIELDS)
+            ]
+            for message in messages[:ELOG_REPORT_LINES]:
+                elog_report.append(f"    elog: {message}")
+            if len(messages) > ELOG_REPORT_LINES or elog.truncated_bytes:
+                elog_report.append(f"    elog: ... see {elog.file_name}")
+        return elog_report
+
     def _create_successful_report(
         self, update_info: Optional[UpdateSection], disk_usage_info: DiskUsage
     ) -> List[str]:
@@ -171,8 +302,13 @@ class Reporter:
             "==========> Gentoo Update Report <==========",
             "update status: SUCCESS",
         ]
+        report += self._report_batches(update_info)
+        report += self._report_fetch(update_info)
+        report += self._report_merge_settings(update_info)
         packages = []
-        if update_info:
+        if self.info.vdb_changes is not None:
+            packages = self.info.vdb_changes
+        elif update_info:
             packages = update_info.update_details["updated_packages"]
 
         if packages:
@@ -211,16 +347,86 @@ class Reporter:
                 for before, after in zip(
                     disk_usage_info.before_update, disk_usage_info.after_update
                 ):
+                    free_space = f"Free Space {before.free} => {after.free}"
+                    used_space = f"Used Space {before.used} => {after.used}"
+                    if before.used_bytes is not None and after.used_bytes is not None:
+                        free_space += f" ({after.free_bytes - before.free_bytes:+} B)"
+                        used_space += f" ({after.used_bytes - before.used_bytes:+} B)"
                     disk_usage_stats = [
                         f"Mount Point {before.mount_point}",
-                        f"Free Space {before.free} => {after.free}",
-                        f"Used Space {before.used} => {after.used}",
+                        free_space,
+                        used_space,
                         f"Used (%) {before.percent_used} => {after.percent_used}",
                     ]
                     report += disk_usage_stats
 
         return report
 
+    def _create_timeout_report(self, stages: List[StageStats]) -> List[str]:
+        """Create a report when a stage was killed because of a time limit.
+
+        Args:
+        ----
+            stages (List[StageStats]): Stats of the stages that have run.
+
+        Returns:
+        -------
+            List[str]: Timeout report, empty if no stage timed out.
+        """
+        timeout_messages = [
+            stats.get_timeout_message() for stats in stages if stats.timeout_reason
+        ]
+        if not timeout_messages:
+            return []
+        if self.short_report:
+            return [f"update status: FAIL, {timeout_messages[0]}"]
+
+        report = [
+            "==========> Gentoo Update Report <==========",
+            "update status: FAIL",
+        ]
+        report += timeout_messages
+        return report + self._report_timing(stages)
+
+    def _report_timing(
+        self, stages: List[StageStats], estimate: Optional[UpdateEstimate] = None
+    ) -> List[str]:
+        """Report time and resources used by every updater stage.
+
+        Args:
+        ----
+            stages (List[StageStats]): Stats of the stages that have run.
+            estimate (Optional[UpdateEstimate]): Estimated update time.
+
+        Returns:
+        -------
+            List[str]: Timing section of the report.
+        """
+        timing_report = ["", "Timing:"]
+        if estimate:
+            timing_report.append(f"estimated update time: {format_estimate(estimate)}")
+        for stats in stages:
+            stage_line = f"--- {stats.stage} {format_duration(stats.wall_time)}"
+            if stats.user_time is not None and stats.system_time is not None:
+                stage_line += (
+                    f", CPU user {format_duration(stats.user_time)}"
+                    f" sys {format_duration(stats.system_time)}"
+                )
+            if stats.max_rss_kib is not None:
+                stage_line += f", max RSS {format_size(stats.max_rss_kib * 1024)}"
+            if stats.read_bytes is not None and stats.write_bytes is not None:
+                stage_line += (
+                    f", read {format_size(stats.read_bytes)}"
+                    f", written {format_size(stats.write_bytes)}"
+                )
+            if stats.timeout_reason:
+                stage_line += f", killed: {stats.timeout_reason}"
+            elif stats.exit_code != 0:
+                stage_line += f", exit code {stats.exit_code}"
+            timing_report.append(stage_line)
+
+        return timing_report
+
     def create_report(self) -> List[str]:
         """Create a report.
 
@@ -229,6 +435,9 @@ class Reporter:
             List: A list of strings that comprise the update report.
         """
         info = self.info
+        timeout_report = self._create_timeout_report(info.stages or [])
+        if timeout_report:
+            return timeout_report
         try:
             disk_usage_info: DiskUsage = info.disk_usage
             pretend_info: PretendSection | None = info.pretend_emerge
@@ -253,6 +462,11 @@ class Reporter:
                     report = self._create_failed_report(update_info, disk_usage_info)
                 else:
                     report = self._create_failed_pretend_report(pretend_info)
+
+                if info.stages:
+                    report = report + self._report_timing(
+                        info.stages, pretend_info.update_estimate
+                    )
                 return report
             else:
                 report = ["emerge --pretend section was empty"]
@@ -266,3 +480,56 @@ class Reporter:
         report = self.create_report()
         for line in report:
             print(line)
+
+
+class PlanReporter:
+    """PlanReporter class for showing packages before an update."""
+
+    def __init__(self, plan: PretendPlan, short_report: bool) -> None:
+        """Initialize PlanReporter class."""
+        self.plan = plan
+        self.short_report = short_report
+
+    def create_report(self) -> List[str]:
+        """Create a report about packages that would be merged.
+
+        Returns
+        -------
+            List: A list of strings that comprise the plan report.
+        """
+        plan = self.plan
+        package_count = plan.updated + plan.new + plan.reemerged
+        summary = (
+            f"packages to merge: {package_count} ({plan.updated} updated, "
+            f"{plan.new} new, {plan.reemerged} re-emerged)"
+        )
+        if self.short_report:
+            return [summary]
+
+        report = ["==========> Gentoo Update Plan <==========", summary]
+        if plan.download_size_kib is not None:
+            report.append(f"download size: {plan.download_size_kib} KiB")
+        if plan.update_estimate:
+            report.append(
+                f"estimated update time: {format_estimate(plan.update_estimate)}"
+            )
+
+        if plan.packages:
+            report.append("")
+        for package in plan.packages:
+            if package.package_type != "ebuild":
+                report.append(f"--- {package.package_name} {package.package_type}")
+            elif package.old_version:
+                report.append(
+                    f"--- {package.package_name} "
+                    f"{package.old_version}->{package.new_version}"
+                )
+            else:
+                report.append(f"--- {package.package_name} {package.new_version}")
+
+        return report
+
+    def print_report(self) -> None:
+        """Print the report line by line to console."""
+        for line in self.create_report():
+            print(line)
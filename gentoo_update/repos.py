@@ -0,0 +1,124 @@
+"""Find repositories that need to be synced.
+
+Repositories are read from repos.conf like Portage reads them: the
+defaults of Portage first, then /etc/portage/repos.conf, which is a file
+or a directory of files read in sorted order. Only repositories that
+emerge --sync would sync are used: they have a sync-type and auto-sync
+is not disabled.
+
+The age of a repository is the time since its last sync: the mtime of
+.git/FETCH_HEAD for git repositories, and the date in
+metadata/timestamp.chk, written when the tree was generated, for rsync
+and webrsync repositories. A repository without either file is stale.
+
+repos.conf entry that is used:
+    [guru]
+    location = /var/db/repos/guru
+    sync-type = git
+    sync-uri = https://github.com/gentoo-mirror/guru.git
+    auto-sync = yes
+"""
+
+import configparser
+import os
+import time
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from typing import List, Optional, Tuple
+
+from .glsa import TIMESTAMP_FILE
+
+REPOS_CONF_PATHS = (
+    "/usr/share/portage/config/repos.conf",
+    "/etc/portage/repos.conf",
+)
+FETCH_HEAD_FILE = os.path.join(".git", "FETCH_HEAD")
+DISABLED_VALUES = ("no", "false")
+
+
+@dataclass
+class RepoConfig:
+    """Dataclass with one repository that is synced by emerge --sync."""
+
+    name: str
+    location: str
+    sync_type: str
+
+
+def get_repos_conf_files(repos_conf_paths: Tuple[str, ...]) -> List[str]:
+    """Get repos.conf files in the order Portage reads them."""
+    conf_files = []
+    for conf_path in repos_conf_paths:
+        if os.path.isdir(conf_path):
+            conf_files += [
+                os.path.join(conf_path, file_name)
+                for file_name in sorted(os.listdir(conf_path))
+                if not file_name.startswith(".") and not file_name.endswith("~")
+            ]
+        elif os.path.isfile(conf_path):
+            conf_files.append(conf_path)
+    return conf_files
+
+
+def read_repos_conf(
+    repos_conf_paths: Tuple[str, ...] = REPOS_CONF_PATHS,
+) -> List[RepoConfig]:
+    """Read repositories that are synced by emerge --sync.
+
+    Args:
+    ----
+        repos_conf_paths (Tuple[str, ...]): repos.conf files or directories,
+            later ones override earlier ones.
+
+    Returns:
+    -------
+        List[RepoConfig]: Repositories in the order they are configured.
+
+    Raises:
+    ------
+        OSError: If a repos.conf file can not be read.
+        configparser.Error: If a repos.conf file is malformed.
+    """
+    repos_conf = configparser.ConfigParser(interpolation=None, strict=False)
+    for conf_file in get_repos_conf_files(repos_conf_paths):
+        with open(conf_file, encoding="utf-8") as conf:
+            repos_conf.read_file(conf, conf_file)
+
+    repos = []
+    for name in repos_conf.sections():
+        repo = repos_conf[name]
+        location = repo.get("location", "").strip()
+        sync_type = repo.get("sync-type", "").strip()
+        auto_sync = repo.get("auto-sync", "yes").strip().lower()
+        if location and sync_type and auto_sync not in DISABLED_VALUES:
+            repos.append(RepoConfig(name, location, sync_type))
+    return repos
+
+
+def get_repo_age(location: str, now: Optional[float] = None) -> Optional[float]:
+    """Get seconds since a repository was synced, None if it is unknown.
+
+    Args:
+    ----
+        location (str): Path to the repository.
+        now (Optional[float]): Unix time to count from, current time if not given.
+
+    Returns:
+    -------
+        Optional[float]: Age of the repository in seconds.
+    """
+    synced_at = []
+    try:
+        synced_at.append(os.stat(os.path.join(location, FETCH_HEAD_FILE)).st_mtime)
+    except OSError:
+        pass
+    try:
+        timestamp_path = os.path.join(location, TIMESTAMP_FILE)
+        with open(timestamp_path, encoding="utf-8") as timestamp:
+            generated_at = parsedate_to_datetime(timestamp.read().strip())
+        synced_at.append(generated_at.timestamp())
+    except (OSError, TypeError, ValueError):
+        pass
+    if not synced_at:
+        return None
+    return (time.time() if now is None else now) - max(synced_at)
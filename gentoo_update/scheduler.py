@@ -0,0 +1,177 @@
+"""Run updater stages as a dependency graph.
+
+Stages whose dependencies have finished run at the same time in a thread
+pool. `StageOutputGrouper` keeps the log readable: the output of one stage
+at a time goes to the log as it is produced, the output of other running
+stages is held back and written as a block when it is their turn.
+Log records are created when a line is read, so buffered lines keep
+the time they were produced.
+"""
+
+import logging
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+
+class StageOutputGrouper:
+    """Write log records of concurrent stages grouped by stage.
+
+    Stages own the log in the order they were started. Records of the
+    owner are handled immediately, records of other stages are buffered
+    until the stages before them have finished.
+
+    Attributes
+    ----------
+        logger (logging.Logger): Logger that handles the records.
+        order (List[str]): Stages in the order they were started.
+        owner (Optional[str]): Stage that currently writes to the log.
+        buffers (Dict[str, List[logging.LogRecord]]): Held back records.
+        finished (Set[str]): Stages that have finished.
+    """
+
+    def __init__(self, logger: logging.Logger) -> None:
+        """Initialize StageOutputGrouper class."""
+        self.logger = logger
+        self.order: List[str] = []
+        self.owner: Optional[str] = None
+        self.buffers: Dict[str, List[logging.LogRecord]] = {}
+        self.finished: Set[str] = set()
+        self.lock = threading.Lock()
+
+    def start(self, stage: str) -> None:
+        """Register a stage that is about to run."""
+        with self.lock:
+            self.order.append(stage)
+            self.buffers[stage] = []
+            if self.owner is None:
+                self._switch_owner()
+
+    def handle(self, stage: str, record: logging.LogRecord) -> None:
+        """Write a record of a stage, or buffer it if the stage waits."""
+        with self.lock:
+            if stage == self.owner:
+                self.logger.handle(record)
+            else:
+                self.buffers[stage].append(record)
+
+    def finish(self, stage: str) -> None:
+        """Mark a stage as finished and pass the log to the next stage."""
+        with self.lock:
+            self.finished.add(stage)
+            if stage == self.owner:
+                self._switch_owner()
+
+    def _switch_owner(self) -> None:
+        """Flush buffers of finished stages and pick the next owner."""
+        self.owner = None
+        while self.order:
+            stage = self.order[0]
+            for record in self.buffers.pop(stage):
+                self.logger.handle(record)
+            if stage not in self.finished:
+                self.owner = stage
+                self.buffers[stage] = []
+                return
+            self.order.pop(0)
+
+
+class StageScheduler:
+    """Run stages concurrently in the order allowed by their dependencies.
+
+    Attributes
+    ----------
+        dependencies (Dict[str, List[str]]): Stages that must finish
+            before a stage can start. Dependencies on stages that are not
+            selected for the run are ignored.
+        max_workers (int): Maximum amount of stages running at once.
+    """
+
+    def __init__(self, dependencies: Dict[str, List[str]], max_workers: int) -> None:
+        """Initialize StageScheduler class."""
+        self.dependencies = dependencies
+        self.max_workers = max(1, max_workers)
+
+    def _get_ready_stages(
+        self, selected: Set[str], pending: List[str], done: Set[str]
+    ) -> List[str]:
+        """Get pending stages whose selected dependencies have finished."""
+        return [
+            stage
+            for stage in pending
+            if all(
+                dependency in done
+                for dependency in self.dependencies.get(stage, [])
+                if dependency in selected
+            )
+        ]
+
+    def run(
+        self,
+        stages: Iterable[str],
+        run_stage: Callable[[str], int],
+        on_start: Optional[Callable[[str], None]] = None,
+        on_interrupt: Optional[Callable[[], None]] = None,
+    ) -> Tuple[Optional[str], int]:
+        """Run stages and wait until they finish.
+
+        After a stage fails no new stages are started, stages that
+        are already running are allowed to finish.
+
+        Args:
+        ----
+            stages (Iterable[str]): Stages to run, ties are started in this order.
+            run_stage (Callable[[str], int]): Runs one stage, returns exit code.
+            on_start (Optional[Callable[[str], None]]): Called in the scheduling
+                thread right before a stage is submitted.
+            on_interrupt (Optional[Callable[[], None]]): Called if waiting is
+                interrupted, for example by Ctrl+C, it has to stop running
+                stages, because the thread pool waits for them before exiting.
+
+        Returns:
+        -------
+            Tuple[Optional[str], int]: First failed stage and its exit code,
+                (None, 0) if all stages succeeded.
+
+        Raises:
+        ------
+            ValueError: If dependencies of the stages contain a cycle.
+        """
+        pending = list(stages)
+        selected = set(pending)
+        done: Set[str] = set()
+        running: Dict[Future, str] = {}
+        failed: Tuple[Optional[str], int] = (None, 0)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while pending or running:
+                if failed[0] is None:
+                    ready = self._get_ready_stages(selected, pending, done)
+                    for stage in ready[: self.max_workers - len(running)]:
+                        pending.remove(stage)
+                        if on_start:
+                            on_start(stage)
+                        running[executor.submit(run_stage, stage)] = stage
+
+                if not running:
+                    if failed[0] is None:
+                        raise ValueError(
+                            f"Stage dependencies contain a cycle: {pending}"
+                        )
+                    break
+
+                try:
+                    finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                except BaseException:
+                    if on_interrupt:
+                        on_interrupt()
+                    raise
+                for future in finished:
+                    stage = running.pop(future)
+                    returncode = future.result()
+                    if returncode == 0:
+                        done.add(stage)
+                    elif failed[0] is None:
+                        failed = (stage, returncode)
+
+        return failed
@@ -15,6 +15,9 @@ DAEMON_RESTART="${6}"
 CLEAN="${7}"
 READ_ELOGS="${8}"
 READ_NEWS="${9}"
+# ${10} is the batch size of the python stage backend, ${11} and ${12} are
+# its maximum repository age and sync jobs, ${13} and ${14} enable its
+# distfile prefetch and picking of merge jobs, they are not used here
 
 # ------------------- CHECK_DISK_USAGE ------------------- #
 function check_root_part_limit() {
@@ -135,6 +138,16 @@ function update() {
     if [ -n "${affected_packages}" ]; then
         echo "emerging..."
         echo "Updating: ${affected_packages}"
+        if [[ "${RESUME_MERGE:-n}" == "y" ]]; then
+            # continue the merge list of an interrupted update
+            echo "Update command:"
+            echo "emerge --verbose --quiet-build --resume"
+            if emerge --verbose --quiet-build --resume; then
+                echo "update was successful"
+                return
+            fi
+            echo "emerge --resume has failed, running the full update command"
+        fi
         echo "Update command:"
         echo "${UPDATE_COMMAND}"
         eval "${UPDATE_COMMAND}"
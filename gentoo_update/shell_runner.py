@@ -2,10 +2,67 @@
 
 import logging
 import os
+import selectors
+import signal
 import subprocess
 import sys
+import threading
+import time
+from collections import deque
 from datetime import datetime
-from typing import List
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+from ._version import __version__
+from .checkpoint import Checkpoint
+from .elogs import ELOG_DIR
+from .estimator import EMERGE_LOG, estimate_update
+from .events import EVENTS_VERSION, EventLogHandler, EventWriter
+from .fetch import DISTDIR, FETCH_COMMAND
+from .glsa import REPO_DIRS
+from .log_files import get_log_suffix
+from .log_index import SectionIndexHandler
+from .parser_package import PackageParser
+from .report_objects import PackageInfo, StageStats
+from .repos import REPOS_CONF_PATHS
+from .scheduler import StageOutputGrouper, StageScheduler
+from .stage_stats import (
+    add_process_stats,
+    finish_native_stage,
+    get_thread_rusage,
+    wait_for_stage,
+)
+from .stages import DEFAULT_BACKEND, STAGES, StageContext, StageIO, StageTimeoutError
+from .tuning import BUILD_DIR
+from .vdb import (
+    VDB_DIR,
+    diff_vdb_snapshots,
+    load_vdb_snapshots,
+    read_vdb_snapshot,
+    save_vdb_snapshots,
+    summarize_vdb_changes,
+)
+
+FINAL_MESSAGE = "gentoo-update is done!"
+OUTPUT_TAIL_LINES = 100
+READ_SIZE = 65536
+MAX_LINE_SIZE = 1024 * 1024
+STAGE_DEPENDENCIES = {
+    "check_root_part_limit": [],
+    "check_disk_usage_before_update": [],
+    "sync_tree": ["check_root_part_limit"],
+    "emerge_pretend": ["sync_tree"],
+    "update": ["emerge_pretend", "check_disk_usage_before_update"],
+    "config_update": ["update"],
+    "clean_up": ["config_update"],
+    "check_restart": ["clean_up"],
+    "get_logs": ["clean_up"],
+    "get_news": ["update"],
+    "check_disk_usage_after_update": ["clean_up"],
+}
+SCRIPT_STAGES = list(STAGE_DEPENDENCIES)
+PARALLEL_STAGES = 3
+TIMEOUT_EXIT_CODE = 124
+KILL_GRACE_PERIOD = 10.0
 
 
 class ShellRunner:
@@ -16,43 +73,128 @@ class ShellRunner:
         quiet (str): If 'y', suppresses terminal output.
         log_dir (str): Directory to save log files.
         log_dir_messages (List[str]): List of messages to log.
+        log_compression (str): Log compression method: none, gzip or zstd.
+        log_prefix (str): Log file name prefix, "log" for update logs.
+        parallel_stages (int): Maximum amount of stages running at once,
+            1 runs stages one by one.
+        log_filename (Optional[str]): Existing log to append to, used when
+            an interrupted run is resumed.
+        stage_timeouts (Optional[Dict[str, float]]): Time limits of stages
+            in seconds, the "default" key applies to other stages.
+        stall_timeout (float): Kill a stage that produces no output for
+            this many seconds, 0 - no limit.
+        backend (str): "python" runs stages with the in-process stage engine,
+            "shell" runs them with updater.sh.
 
     Attributes:
     ----------
         quiet (bool): If True, suppresses terminal output.
+        parallel_stages (int): Maximum amount of stages running at once.
         timestamp (str): Current timestamp in the format of '%Y-%m-%d-%H-%M'.
         log_dir (str): Directory to save log files.
         log_dir_messages (str): List of messages to log.
         log_filename (str): Log filename.
+        events (EventWriter): Writer of the JSONL event stream next to the log.
         logger (logging.Logger): Configured logger.
         script_dir (str): Directory of the shell script.
         script_path (str): Path to the shell script.
-        stdout_output (List[str]): List containing the standard output.
-        stderr_output (List[str]): List containing the standard error output.
+        emerge_log (str): Path to emerge.log used to estimate update time.
+        elog_dir (str): Directory with elog files of merged packages.
+        repo_dirs (Tuple[str, ...]): Possible paths to the Gentoo repository,
+            GLSA files are read from the first one that has them.
+        vdb_dir (str): Path to /var/db/pkg with installed packages.
+        repos_conf_paths (Tuple[str, ...]): repos.conf files or directories
+            with the repositories that are synced.
+        fetch_command (List[str]): Command that prefetches distfiles,
+            package atoms are appended to it.
+        distdir (str): Directory with distfiles.
+        makeopts (str): MAKEOPTS of make.conf.
+        build_dir (str): Portage build directory, PORTAGE_TMPDIR/portage.
+        started_at (float): Unix time when the runner was created.
+        stage_started_at (Dict[str, float]): Unix time when stages started,
+            elogs older than the update stage are not read.
+        checkpoint (Optional[Checkpoint]): Progress of the run, saved next
+            to the log after every stage.
+        resume_merge (bool): Whether the update stage continues an
+            interrupted merge with emerge --resume.
+        stage_timeouts (Dict[str, float]): Time limits of stages in seconds.
+        stall_timeout (float): Time limit without output in seconds.
+        backend (str): Backend that runs stages, python or shell.
+        stage_context (Optional[StageContext]): State shared by the stages
+            of the python backend, created when the first stage runs.
+        running_streams (Dict[str, subprocess.Popen]): Commands of stages
+            that are running, killed if the run is interrupted.
+        stage_stats (List[StageStats]): Time and resources used by finished stages.
+        stdout_output (Deque[str]): Last lines of the standard output
+            of the last finished or failed stage.
+        stderr_output (Deque[str]): Last lines of the standard error output
+            of the last finished or failed stage.
     """
 
-    def __init__(self, quiet: str, log_dir: str, log_dir_messages: List[str]) -> None:
+    def __init__(
+        self,
+        quiet: str,
+        log_dir: str,
+        log_dir_messages: List[str],
+        log_compression: str = "none",
+        log_prefix: str = "log",
+        parallel_stages: int = PARALLEL_STAGES,
+        log_filename: Optional[str] = None,
+        stage_timeouts: Optional[Dict[str, float]] = None,
+        stall_timeout: float = 0,
+        backend: str = DEFAULT_BACKEND,
+    ) -> None:
         """Initialize ShellRunner class."""
         self.quiet = True if quiet == "y" else False
+        self.parallel_stages = parallel_stages
 
         self.timestamp = datetime.now().strftime("%Y-%m-%d-%H-%M")
         self.log_dir = log_dir
         self.log_dir_messages = log_dir_messages
 
-        self.log_filename = f"{self.log_dir}/log_{self.timestamp}"
+        if log_filename is None:
+            log_suffix = get_log_suffix(log_compression)
+            log_filename = f"{self.log_dir}/{log_prefix}_{self.timestamp}{log_suffix}"
+        self.log_filename = log_filename
+        self.events = None
         self.logger = self.initiate_logger()
 
+        self.emerge_log = EMERGE_LOG
+        self.elog_dir = ELOG_DIR
+        self.repo_dirs = REPO_DIRS
+        self.vdb_dir = VDB_DIR
+        self.repos_conf_paths = REPOS_CONF_PATHS
+        self.fetch_command = list(FETCH_COMMAND)
+        self.distdir = DISTDIR
+        self.makeopts = ""
+        self.build_dir = BUILD_DIR
+        self.started_at = time.time()
+        self.stage_started_at: Dict[str, float] = {}
+        self.checkpoint: Optional[Checkpoint] = None
+        self.resume_merge = False
+        self.stage_timeouts = stage_timeouts or {}
+        self.stall_timeout = stall_timeout
+        self.backend = backend
+        self.stage_context: Optional[StageContext] = None
+        self.running_streams: Dict[str, subprocess.Popen] = {}
+        self.streams_lock = threading.Lock()
+        self.stage_stats: List[StageStats] = []
+        self.stdout_output: Deque[str] = deque(maxlen=OUTPUT_TAIL_LINES)
+        self.stderr_output: Deque[str] = deque(maxlen=OUTPUT_TAIL_LINES)
+
         self.script_dir = os.path.join(os.path.dirname(__file__), "scripts")
         self.script_path = os.path.join(self.script_dir, "updater.sh")
 
     def initiate_logger(self) -> logging.Logger:
-        """Create a logger with two handlers.
+        """Create a logger with three handlers.
 
             1. terminal output
             2. file output
+            3. event stream output
 
         Both handlers have the same logging level (INFO)
         and share the same formatter.
+        File handler also keeps an index of section offsets next to the log.
         Formatters include timestamp, log level and the message.
 
         Returns
@@ -75,7 +217,7 @@ class ShellRunner:
             logger.addHandler(terminal_handler)
 
         try:
-            file_handler = logging.FileHandler(self.log_filename)
+            file_handler = SectionIndexHandler(self.log_filename)
         except PermissionError:
             print("Not enough permissions to create a log file, exiting")
             sys.exit(1)
@@ -83,97 +225,631 @@ class ShellRunner:
         file_handler.setFormatter(formater)
         logger.addHandler(file_handler)
 
+        self.events = EventWriter(self.log_filename)
+        logger.addHandler(EventLogHandler(self.events))
+
         for message in self.log_dir_messages:
             logger.info(message)
 
         return logger
 
-    def _log_stream_output(self, stream, logger) -> List[str]:
-        """Process sterr from the upadte script.
+    def _log_stream_output(
+        self,
+        script_stream: subprocess.Popen,
+        log_line: Callable[[int, str], None],
+        timeout: float = 0,
+        stall_timeout: float = 0,
+        started: Optional[float] = None,
+    ) -> Tuple[Deque[str], Deque[str], Optional[str]]:
+        """Read standard output and standard error of updater.sh concurrently.
+
+        Both pipes are read as soon as they have data, so a stage that fills
+        the stderr pipe can not block while stdout is being read.
+        Every line is passed to log_line right after it is read, so the log
+        timestamp is the time the line was produced. A stage that runs
+        longer than timeout or produces no output for stall_timeout seconds
+        is killed together with its process group.
 
         Args:
         ----
-            stream (Popen.stdin | Popen.stderr ): output stream from subprocess.Popen
-            logger (Logger.info | Logger.error): info() of error() methods
+            script_stream (subprocess.Popen): Running updater.sh.
+            log_line (Callable[[int, str], None]): Logs a line with a level.
+            timeout (float): Time limit of the stage in seconds, 0 - no limit.
+            stall_timeout (float): Time limit without output, 0 - no limit.
+            started (Optional[float]): time.monotonic() when the stage was
+                started, the time limit counts from it. Now if not given.
 
         Returns:
         -------
-            List[str]: List containing the output
+            Tuple[Deque[str], Deque[str], Optional[str]]: Last OUTPUT_TAIL_LINES
+                lines of the standard output and of the standard error output,
+                "timeout" or "stall" if the stage was killed.
+        """
+        stdout_output: Deque[str] = deque(maxlen=OUTPUT_TAIL_LINES)
+        stderr_output: Deque[str] = deque(maxlen=OUTPUT_TAIL_LINES)
+
+        streams = {
+            script_stream.stdout: (logging.INFO, stdout_output),
+            script_stream.stderr: (logging.ERROR, stderr_output),
+        }
+        partial_lines = dict.fromkeys(streams, b"")
+        last_output = time.monotonic()
+        if started is None:
+            started = last_output
+
+        with selectors.DefaultSelector() as selector:
+            for stream in streams:
+                selector.register(stream, selectors.EVENT_READ)
+
+            while selector.get_map():
+                limits = []
+                if timeout:
+                    limits.append(
+                        (started + timeout, "timeout", f"Time limit of {timeout}")
+                    )
+                if stall_timeout:
+                    limits.append(
+                        (
+                            last_output + stall_timeout,
+                            "stall",
+                            f"No output for {stall_timeout}",
+                        )
+                    )
+                wait_time = None
+                if limits:
+                    expires_at, timeout_reason, limit_message = min(limits)
+                    wait_time = expires_at - time.monotonic()
+                    if wait_time <= 0:
+                        log_line(
+                            logging.ERROR,
+                            f"{limit_message} seconds reached, "
+                            "killing the process group of the stage",
+                        )
+                        self._kill_stage(script_stream)
+                        return stdout_output, stderr_output, timeout_reason
+
+                for key, _ in selector.select(wait_time):
+                    last_output = time.monotonic()
+                    stream = key.fileobj
+                    data = os.read(key.fd, READ_SIZE)
+                    lines = (partial_lines[stream] + data).split(b"\n")
+                    partial_lines[stream] = lines.pop()
+                    if not data or len(partial_lines[stream]) > MAX_LINE_SIZE:
+                        if partial_lines[stream]:
+                            lines.append(partial_lines[stream])
+                        partial_lines[stream] = b""
+                    if not data:
+                        selector.unregister(stream)
+
+                    level, output = streams[stream]
+                    for raw_line in lines:
+                        line = raw_line.decode("utf-8", "replace")
+                        output.append(line)
+                        log_line(level, line)
+
+        return stdout_output, stderr_output, None
+
+    def _kill_stage(self, script_stream: subprocess.Popen) -> None:
+        """Kill a stage together with every process it has started.
+
+        Stages run in their own process group. The group gets SIGTERM,
+        and SIGKILL after KILL_GRACE_PERIOD seconds or as soon as
+        updater.sh has exited, so no emerge or build process is left behind.
+        The process is not reaped, wait_for_stage still collects its stats.
+
+        Args:
+        ----
+            script_stream (subprocess.Popen): Running stage.
         """
-        output = []
+        try:
+            os.killpg(script_stream.pid, signal.SIGTERM)
+        except ProcessLookupError:
+            return
+
+        grace_end = time.monotonic() + KILL_GRACE_PERIOD
+        while time.monotonic() < grace_end:
+            try:
+                exited = os.waitid(
+                    os.P_PID, script_stream.pid, os.WEXITED | os.WNOHANG | os.WNOWAIT
+                )
+            except ChildProcessError:
+                break
+            if exited is not None:
+                break
+            time.sleep(0.1)
+
+        try:
+            os.killpg(script_stream.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
 
-        for stream_line in stream:
-            line = stream_line.decode().rstrip("\n")
-            output.append(line)
-            logger(line)
-        return output
+    def _kill_running_stages(self) -> None:
+        """Kill every running stage, used when the run is interrupted."""
+        with self.streams_lock:
+            running_streams = list(self.running_streams.values())
+        for script_stream in running_streams:
+            self._kill_stage(script_stream)
 
-    def _exit_with_error_message(self, stream: subprocess.Popen) -> None:
-        """Exit runner if updater.sh encounters an error and log that error.
+    def _exit_with_error_message(self, stage: str, returncode: int) -> None:
+        """Exit runner if a stage encounters an error and log that error.
 
         Args:
         ----
-            stream: output stream from subprocess.Popen
-            stderr_output: List containing the standard error output.
+            stage (str): Stage that failed.
+            returncode (int): Exit code of the stage.
         """
-        error_message = "updater.sh exited with error code {script_stream.returncode}"
+        backend_name = "updater.sh" if self.backend == "shell" else "stage engine"
+        error_message = (
+            f"{backend_name} exited with error code {returncode} in stage {stage}"
+        )
         if self.stderr_output:
-            stderr_output_message = "n".join(self.stderr_output)
+            stderr_output_message = "\n".join(self.stderr_output)
             error_message += f"\nStandard error output:\n{stderr_output_message}"
         self.logger.error(error_message)
-        sys.exit(stream.returncode)
+        sys.exit(returncode)
 
-    def run_shell_function(self, command: List) -> None:
-        """Run a shell script and stream standard output.
+    def _run_stage(
+        self, command: List[str], grouper: StageOutputGrouper
+    ) -> Tuple[StageStats, Deque[str], Deque[str]]:
+        """Run one stage and log its output through the grouper.
 
-        and standard error to terminal and a log file.
+        Stages from STAGES run in Python with the python backend, and so
+        do native stages with the shell backend. Other stages run updater.sh.
 
         Args:
         ----
-            command (List(str)): A call to specific function in
+            command (List[str]): A call to specific function in
                                  update.sh with all parameters.
+            grouper (StageOutputGrouper): Keeps output of the stage together.
+
+        Returns:
+        -------
+            Tuple[StageStats, Deque[str], Deque[str]]: Exit code with time and
+                resources used by the stage, last lines of the standard output
+                and of the standard error output.
+        """
+        stage = command[1]
+        pretend_lines: List[str] = []
+
+        def log_line(level: int, line: str) -> None:
+            record = self.logger.makeRecord(
+                self.logger.name, level, __file__, 0, line, (), None
+            )
+            grouper.handle(stage, record)
+            if stage == "emerge_pretend":
+                pretend_lines.append(line.strip())
+
+        self.events.emit("stage_start", stage=stage)
+        self.stage_started_at[stage] = time.time()
+        if self.checkpoint:
+            self.checkpoint.start_stage(stage, self.stage_started_at[stage])
+        started = time.monotonic()
+        stage_class = STAGES.get(stage)
+        if stage == "update":
+            self._snapshot_vdb("before", log_line)
+        try:
+            if stage_class and (self.backend == "python" or stage_class.native):
+                stats, stdout_output, stderr_output = self._run_python_stage(
+                    command, log_line, started
+                )
+            else:
+                stats, stdout_output, stderr_output = self._run_script_stage(
+                    command, log_line, started
+                )
+            if pretend_lines and stats.exit_code == 0:
+                packages = PackageParser().parse_update_details(pretend_lines)
+                if self.stage_context:
+                    self.stage_context.pretend_packages = packages
+                self._log_update_estimate(packages, log_line)
+            if stage == "update":
+                changes = self._snapshot_vdb("after", log_line)
+                if changes is not None:
+                    log_line(logging.INFO, summarize_vdb_changes(changes))
+        finally:
+            grouper.finish(stage)
+
+        self.stage_stats.append(stats)
+        if self.checkpoint:
+            self.checkpoint.finish_stage(stats)
+        self.events.emit("stage_end", **vars(stats))
+        return stats, stdout_output, stderr_output
+
+    def _get_stage_timeout(self, stage: str) -> float:
+        """Get time limit of a stage in seconds, 0 - no limit."""
+        return self.stage_timeouts.get(stage, self.stage_timeouts.get("default", 0))
+
+    def _run_command(
+        self,
+        command: List[str],
+        stage: str,
+        log_line: Callable[[int, str], None],
+        started: float,
+        env: Optional[Dict[str, str]] = None,
+        stream_key: Optional[str] = None,
+    ) -> Tuple[StageStats, Deque[str], Deque[str], Optional[str]]:
+        """Run a command of a stage in its own process group with time limits.
+
+        Args:
+        ----
+            command (List[str]): Command to run.
+            stage (str): Stage that runs the command.
+            log_line (Callable[[int, str], None]): Logs a line with a level.
+            started (float): time.monotonic() when the stage was started.
+            env (Optional[Dict[str, str]]): Environment of the command.
+            stream_key (Optional[str]): Key of the command in running_streams,
+                the stage if not given. Commands of a stage that run at
+                the same time need different keys.
+
+        Returns:
+        -------
+            Tuple[StageStats, Deque[str], Deque[str], Optional[str]]: Exit code
+                with time and resources used by the command, last lines of
+                its standard output and of its standard error output,
+                "timeout" or "stall" if the command was killed.
         """
         with subprocess.Popen(
-            command, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+            command,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            env=env,
+            start_new_session=True,
         ) as script_stream:
-            self.stdout_output = self._log_stream_output(
-                script_stream.stdout, self.logger.info
+            stream_key = stream_key or stage
+            with self.streams_lock:
+                self.running_streams[stream_key] = script_stream
+            try:
+                stdout_output, stderr_output, timeout_reason = self._log_stream_output(
+                    script_stream,
+                    log_line,
+                    self._get_stage_timeout(stage),
+                    self.stall_timeout,
+                    started,
+                )
+            except BaseException:
+                self._kill_stage(script_stream)
+                raise
+            finally:
+                with self.streams_lock:
+                    self.running_streams.pop(stream_key, None)
+            stats = wait_for_stage(script_stream, stage, started)
+        return stats, stdout_output, stderr_output, timeout_reason
+
+    def _run_script_stage(
+        self,
+        command: List[str],
+        log_line: Callable[[int, str], None],
+        started: float,
+    ) -> Tuple[StageStats, Deque[str], Deque[str]]:
+        """Run a stage of updater.sh in its own process group with time limits.
+
+        Args:
+        ----
+            command (List[str]): A call to specific function in
+                                 update.sh with all parameters.
+            log_line (Callable[[int, str], None]): Logs a line with a level.
+            started (float): time.monotonic() when the stage was started.
+
+        Returns:
+        -------
+            Tuple[StageStats, Deque[str], Deque[str]]: The same as _run_stage,
+                the exit code is TIMEOUT_EXIT_CODE if the stage was killed.
+        """
+        stage = command[1]
+        env = None
+        if stage == "update" and self.resume_merge:
+            env = {**os.environ, "RESUME_MERGE": "y"}
+
+        stats, stdout_output, stderr_output, timeout_reason = self._run_command(
+            command, stage, log_line, started, env
+        )
+        if timeout_reason:
+            stats.exit_code = TIMEOUT_EXIT_CODE
+            stats.timeout_reason = timeout_reason
+            stderr_output.append(stats.get_timeout_message())
+        return stats, stdout_output, stderr_output
+
+    def _get_stage_context(self, args: List[str]) -> StageContext:
+        """Get state shared by python stages, created once per run arguments."""
+        with self.streams_lock:
+            if self.stage_context is None or self.stage_context.args != args:
+                self.stage_context = StageContext(
+                    args, self.elog_dir, self.started_at, self.stage_started_at
+                )
+                self.stage_context.resume_merge = self.resume_merge
+                self.stage_context.checkpoint = self.checkpoint
+                self.stage_context.cache_dir = self.log_dir
+                self.stage_context.repo_dirs = self.repo_dirs
+                self.stage_context.vdb_dir = self.vdb_dir
+                self.stage_context.repos_conf_paths = self.repos_conf_paths
+                self.stage_context.fetch_command = self.fetch_command
+                self.stage_context.distdir = self.distdir
+                self.stage_context.makeopts = self.makeopts
+                self.stage_context.build_dir = self.build_dir
+                if self.checkpoint:
+                    self.stage_context.batches = self.checkpoint.batches
+                    self.stage_context.completed_batches = (
+                        self.checkpoint.completed_batches
+                    )
+            return self.stage_context
+
+    def _run_python_stage(
+        self,
+        command: List[str],
+        log_line: Callable[[int, str], None],
+        started: float,
+    ) -> Tuple[StageStats, Deque[str], Deque[str]]:
+        """Run a stage from STAGES with the in-process stage engine.
+
+        External commands of the stage get the same process groups and
+        time limits as updater.sh stages, and the resources they use are
+        added to the stats of the stage.
+
+        Args:
+        ----
+            command (List[str]): The same command that updater.sh would get.
+            log_line (Callable[[int, str], None]): Logs a line with a level.
+            started (float): time.monotonic() when the stage was started.
+
+        Returns:
+        -------
+            Tuple[StageStats, Deque[str], Deque[str]]: The same as _run_stage,
+                the exit code is TIMEOUT_EXIT_CODE if the stage was killed.
+        """
+        stage = command[1]
+        stdout_output: Deque[str] = deque(maxlen=OUTPUT_TAIL_LINES)
+        stderr_output: Deque[str] = deque(maxlen=OUTPUT_TAIL_LINES)
+        process_stats: List[StageStats] = []
+
+        def log(line: str) -> None:
+            stdout_output.append(line)
+            log_line(logging.INFO, line)
+
+        def log_error(line: str) -> None:
+            stderr_output.append(line)
+            log_line(logging.ERROR, line)
+
+        def run(
+            process_command: List[str],
+            label: Optional[str] = None,
+            watch: Optional[Callable[[str], None]] = None,
+            env: Optional[Dict[str, str]] = None,
+        ) -> int:
+            def command_log_line(level: int, line: str) -> None:
+                if watch:
+                    watch(line)
+                log_line(level, f"[{label}] {line}" if label else line)
+
+            stats, process_stdout, process_stderr, timeout_reason = self._run_command(
+                process_command,
+                stage,
+                command_log_line,
+                started,
+                env,
+                stream_key=f"{stage}:{label}" if label else None,
             )
-            self.stderr_output = self._log_stream_output(
-                script_stream.stderr, self.logger.error
+            stdout_output.extend(process_stdout)
+            stderr_output.extend(process_stderr)
+            process_stats.append(stats)
+            if timeout_reason:
+                raise StageTimeoutError(timeout_reason)
+            return stats.exit_code
+
+        def stop(label: str) -> None:
+            with self.streams_lock:
+                process = self.running_streams.get(f"{stage}:{label}")
+            if process:
+                self._kill_stage(process)
+
+        rusage_before = get_thread_rusage()
+        timeout_reason = None
+        for line in ("", STAGES[stage].section, ""):
+            log(line)
+        try:
+            context = self._get_stage_context(command[2:])
+            exit_code = STAGES[stage]().run(context, StageIO(log, log_error, run, stop))
+        except StageTimeoutError as error:
+            exit_code = TIMEOUT_EXIT_CODE
+            timeout_reason = error.reason
+        except subprocess.CalledProcessError as error:
+            for line in (error.stderr or "").splitlines():
+                log_error(line)
+            log_error(str(error))
+            exit_code = error.returncode or 1
+        except (OSError, ValueError) as error:
+            log_error(str(error))
+            exit_code = 1
+
+        stats = finish_native_stage(stage, exit_code, started, rusage_before)
+        for command_stats in process_stats:
+            add_process_stats(stats, command_stats)
+        if timeout_reason:
+            stats.timeout_reason = timeout_reason
+            stderr_output.append(stats.get_timeout_message())
+        return stats, stdout_output, stderr_output
+
+    def _log_update_estimate(
+        self, packages: List[PackageInfo], log_line: Callable[[int, str], None]
+    ) -> None:
+        """Log estimated update duration at the end of the emerge pretend section.
+
+        Args:
+        ----
+            packages (List[PackageInfo]): Packages from the output
+                of the emerge_pretend stage.
+            log_line (Callable[[int, str], None]): Logs a line of the stage.
+        """
+        if not packages:
+            return
+        try:
+            estimate = estimate_update(self.log_dir, packages, self.emerge_log)
+        except OSError as error:
+            log_line(logging.INFO, f"Update time can not be estimated: {error}")
+            return
+        log_line(logging.INFO, estimate.to_log_line())
+
+    def _snapshot_vdb(
+        self, name: str, log_line: Callable[[int, str], None]
+    ) -> Optional[List[PackageInfo]]:
+        """Save a snapshot of installed packages next to the log.
+
+        A resumed run keeps the "before" snapshot of the interrupted run,
+        so the diff covers everything merged by the update.
+
+        Args:
+        ----
+            name (str): "before" or "after" the update stage.
+            log_line (Callable[[int, str], None]): Logs a line of the stage.
+
+        Returns:
+        -------
+            Optional[List[PackageInfo]]: Packages changed since the "before"
+                snapshot, None if there is nothing to compare.
+        """
+        if not os.path.isdir(self.vdb_dir):
+            return None
+        try:
+            snapshots = load_vdb_snapshots(self.log_filename)
+            if name == "before" and "before" in snapshots:
+                return None
+            snapshots[name] = read_vdb_snapshot(self.vdb_dir)
+            save_vdb_snapshots(self.log_filename, snapshots)
+        except OSError as error:
+            log_line(
+                logging.WARNING, f"Installed packages can not be recorded: {error}"
             )
-            script_stream.wait()
+            return None
+        if name == "before" or "before" not in snapshots:
+            return None
+        return diff_vdb_snapshots(snapshots["before"], snapshots[name])
+
+    def _log_stage_summary(self, stages: List[str]) -> None:
+        """Log time and resources used by every stage that has run.
+
+        Args:
+        ----
+            stages (List[str]): Stages of the run, the summary follows their order.
+        """
+        self.logger.info("")
+        self.logger.info("{{ STAGE SUMMARY }}")
+        self.logger.info("")
+        stage_order = {stage: position for position, stage in enumerate(stages)}
+        for stats in sorted(
+            self.stage_stats, key=lambda stats: stage_order.get(stats.stage, 0)
+        ):
+            self.logger.info(stats.to_log_line())
+
+    def run_shell_function(self, command: List) -> None:
+        """Run a shell script and stream standard output.
 
-            if script_stream.returncode != 0:
-                self._exit_with_error_message(script_stream)
+        and standard error to terminal and a log file.
 
-    def run_shell_script(self, *args: str) -> None:
-        """Run every function in update.sh one by one.
+        Args:
+        ----
+            command (List(str)): A call to specific function in
+                                 update.sh with all parameters.
+        """
+        grouper = StageOutputGrouper(self.logger)
+        grouper.start(command[1])
+        stats, self.stdout_output, self.stderr_output = self._run_stage(
+            command, grouper
+        )
+        if stats.exit_code != 0:
+            self._exit_with_error_message(command[1], stats.exit_code)
+
+    def run_shell_script(self, *args: str, stages: Optional[List[str]] = None) -> None:
+        """Run functions in update.sh, independent ones at the same time.
+
+        Stages start when the stages they depend on (STAGE_DEPENDENCIES)
+        have finished, output of every stage is kept together in the log.
+        Time and resources used by the stages are logged in the
+        {{ STAGE SUMMARY }} section at the end. Progress is saved in
+        a checkpoint, so an interrupted run can be resumed.
 
         Args:
         ----
             *args (str): Arguments for the shell script.
                          They need to be handled by the script.
+            stages (Optional[List[str]]): Functions to run, all SCRIPT_STAGES
+                         by default.
+        """
+        script_stages = SCRIPT_STAGES if stages is None else stages
+        self.checkpoint = Checkpoint(self.log_filename, list(args), script_stages)
+        self.checkpoint.save()
+        self._run_stages(list(args), script_stages, script_stages)
+
+    def resume_shell_script(self) -> None:
+        """Resume an interrupted run from the checkpoint of its log.
+
+        Stages that have completed are skipped, the output of the other
+        stages is appended to the same log. If the update stage was
+        interrupted, emerge continues the interrupted merge with --resume.
         """
-        script_stages = [
-            "check_root_part_limit",
-            "check_disk_usage_before_update",
-            "sync_tree",
-            "emerge_pretend",
-            "update",
-            "config_update",
-            "clean_up",
-            "check_restart",
-            "get_logs",
-            "get_news",
-            "check_disk_usage_after_update",
+        checkpoint = Checkpoint.load(self.log_filename)
+        if checkpoint is None:
+            print(f"No checkpoint found for {self.log_filename}, exiting")
+            sys.exit(1)
+
+        self.checkpoint = checkpoint
+        self.resume_merge = "update" in checkpoint.get_interrupted_stages()
+        self.stage_stats = list(checkpoint.completed)
+        self.stage_started_at.update(checkpoint.started_at)
+        completed_stages = checkpoint.get_completed_stages()
+        checkpoint.reset_interrupted_stages()
+
+        self.logger.info("")
+        completed = ", ".join(completed_stages) or "none"
+        self.logger.info(f"Resuming interrupted update, completed stages: {completed}")
+        pending_stages = [
+            stage for stage in checkpoint.stages if stage not in completed_stages
         ]
-        for stage in script_stages:
-            command = [self.script_path] + [stage] + list(args)
-            self.run_shell_function(command)
+        self._run_stages(checkpoint.args, checkpoint.stages, pending_stages)
+
+    def _run_stages(
+        self, args: List[str], script_stages: List[str], pending_stages: List[str]
+    ) -> None:
+        """Run stages with the scheduler and log the result of the run.
 
-        final_message = f"gentoo-update is done! Log:file: {self.log_filename}"
+        Args:
+        ----
+            args (List[str]): Arguments for the shell script.
+            script_stages (List[str]): All stages of the run.
+            pending_stages (List[str]): Stages that still have to run.
+        """
+        self.events.emit(
+            "run_start",
+            version=EVENTS_VERSION,
+            gentoo_update_version=__version__,
+            args=args,
+            stages=script_stages,
+            resumed=pending_stages != script_stages,
+        )
+
+        grouper = StageOutputGrouper(self.logger)
+        stage_outputs = {}
+
+        def run_stage(stage: str) -> int:
+            command = [self.script_path, stage] + args
+            stats, stdout_output, stderr_output = self._run_stage(command, grouper)
+            stage_outputs[stage] = (stdout_output, stderr_output)
+            return stats.exit_code
+
+        scheduler = StageScheduler(STAGE_DEPENDENCIES, self.parallel_stages)
+        failed_stage, returncode = scheduler.run(
+            pending_stages,
+            run_stage,
+            on_start=grouper.start,
+            on_interrupt=self._kill_running_stages,
+        )
+        self._log_stage_summary(script_stages)
+        if failed_stage is not None:
+            self.stdout_output, self.stderr_output = stage_outputs[failed_stage]
+            self._exit_with_error_message(failed_stage, returncode)
+
+        if self.checkpoint:
+            self.checkpoint.remove()
+        final_message = f"{FINAL_MESSAGE} Log:file: {self.log_filename}"
         self.logger.info(final_message)
+        self.events.emit("run_end")
         if self.quiet:
             print(final_message)
 
@@ -181,11 +857,13 @@ class ShellRunner:
         """Close all file handlers after ShellRunner is closed."""
         try:
             if self.logger:
-                for handler in self.logger.handlers:
+                for handler in self.logger.handlers[:]:
                     try:
                         handler.close()
                         self.logger.removeHandler(handler)
                     except Exception as exc:
                         print(f"Handler Error: Could not close handler: {exc}")
+            if self.events:
+                self.events.close()
         except AttributeError as attrerr:
             print(f"Handler Error: {attrerr}. Logger object was not defined")
@@ -0,0 +1,43 @@
+"""Sizes in bytes with binary unit suffixes, like df -h prints them."""
+
+import re
+from typing import Optional
+
+HUMAN_SIZE_PATTERN = re.compile(r"^(\d+(?:[.,]\d+)?)([KMGTPE]?)i?B?$")
+SIZE_UNITS = ["", "K", "M", "G", "T", "P", "E"]
+
+
+def parse_human_size(size: str) -> Optional[int]:
+    """Convert size printed by df -h, like 253G, to bytes.
+
+    Args:
+    ----
+        size (str): Size with an optional binary unit suffix.
+
+    Returns:
+    -------
+        Optional[int]: Size in bytes, None if the size can not be parsed.
+    """
+    match_size = HUMAN_SIZE_PATTERN.match(size.strip())
+    if match_size is None:
+        return None
+    number = float(match_size.group(1).replace(",", "."))
+    return int(number * 1024 ** SIZE_UNITS.index(match_size.group(2)))
+
+
+def format_size(size_bytes: int) -> str:
+    """Format a size in bytes with a binary unit suffix, like df -h."""
+    size = float(size_bytes)
+    unit = 0
+    while size >= 1024 and unit < len(SIZE_UNITS) - 1:
+        size /= 1024
+        unit += 1
+    if unit == 0:
+        return f"{int(size)}B"
+    return f"{size:.1f}{SIZE_UNITS[unit]}"
+
+
+def format_size_delta(delta: int) -> str:
+    """Format a difference in bytes with a sign and a binary unit suffix."""
+    sign = "-" if delta < 0 else "+"
+    return f"{sign}{format_size(abs(delta))}"
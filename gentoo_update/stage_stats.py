@@ -0,0 +1,142 @@
+"""Measure time and resources used by updater stages.
+
+A finished stage is first waited for without reaping it, so its
+/proc/<pid>/io can still be read, then it is reaped with wait4 to get
+its resource usage. Both include every process the stage has waited for,
+so the numbers cover emerge and the builds it runs. Resource usage is
+taken per process, so the numbers stay correct when stages run at the
+same time. Stages that run in Python are measured with the resource
+usage of their thread.
+"""
+
+import os
+import resource
+import subprocess
+import time
+from typing import Dict, Optional
+
+from .report_objects import StageStats
+
+
+def read_proc_io(pid: int) -> Optional[Dict[str, int]]:
+    """Read I/O counters of a process.
+
+    Args:
+    ----
+        pid (int): Process id.
+
+    Returns:
+    -------
+        Optional[Dict[str, int]]: Counters like read_bytes and write_bytes,
+            None if /proc/<pid>/io is not available.
+    """
+    try:
+        with open(f"/proc/{pid}/io", encoding="utf-8") as io_file:
+            counters = {}
+            for line in io_file:
+                name, _, value = line.partition(":")
+                counters[name.strip()] = int(value)
+            return counters
+    except (OSError, ValueError):
+        return None
+
+
+def wait_for_stage(
+    script_stream: subprocess.Popen, stage: str, started: float
+) -> StageStats:
+    """Wait for a stage to finish and collect its stats.
+
+    Sets returncode of script_stream like Popen.wait does.
+
+    Args:
+    ----
+        script_stream (subprocess.Popen): Running stage.
+        stage (str): Name of the stage.
+        started (float): time.monotonic() when the stage was started.
+
+    Returns:
+    -------
+        StageStats: Exit code, wall time, CPU times, peak RSS and disk I/O.
+    """
+    pid = script_stream.pid
+    io_counters = None
+    rusage = None
+
+    if hasattr(os, "waitid") and hasattr(os, "WNOWAIT"):
+        try:
+            os.waitid(os.P_PID, pid, os.WEXITED | os.WNOWAIT)
+            io_counters = read_proc_io(pid)
+        except ChildProcessError:
+            pass
+
+    try:
+        _, status, rusage = os.wait4(pid, 0)
+        script_stream.returncode = os.waitstatus_to_exitcode(status)
+    except ChildProcessError:
+        script_stream.wait()
+
+    wall_time = round(time.monotonic() - started, 3)
+    stats = StageStats(stage, script_stream.returncode, wall_time)
+    if rusage is not None:
+        stats.user_time = round(rusage.ru_utime, 3)
+        stats.system_time = round(rusage.ru_stime, 3)
+        stats.max_rss_kib = rusage.ru_maxrss
+    if io_counters is not None:
+        stats.read_bytes = io_counters.get("read_bytes")
+        stats.write_bytes = io_counters.get("write_bytes")
+    return stats
+
+
+def get_thread_rusage() -> Optional[resource.struct_rusage]:
+    """Get resource usage of the calling thread, None if it is not supported."""
+    if not hasattr(resource, "RUSAGE_THREAD"):
+        return None
+    return resource.getrusage(resource.RUSAGE_THREAD)
+
+
+def finish_native_stage(
+    stage: str,
+    exit_code: int,
+    started: float,
+    rusage_before: Optional[resource.struct_rusage],
+) -> StageStats:
+    """Collect stats of a stage that has run in the calling thread.
+
+    Args:
+    ----
+        stage (str): Name of the stage.
+        exit_code (int): Exit code of the stage.
+        started (float): time.monotonic() when the stage was started.
+        rusage_before (Optional[resource.struct_rusage]): get_thread_rusage()
+            when the stage was started.
+
+    Returns:
+    -------
+        StageStats: Exit code, wall time, CPU times and peak RSS.
+    """
+    wall_time = round(time.monotonic() - started, 3)
+    stats = StageStats(stage, exit_code, wall_time)
+    rusage = get_thread_rusage()
+    if rusage is not None and rusage_before is not None:
+        stats.user_time = round(rusage.ru_utime - rusage_before.ru_utime, 3)
+        stats.system_time = round(rusage.ru_stime - rusage_before.ru_stime, 3)
+        stats.max_rss_kib = rusage.ru_maxrss
+    return stats
+
+
+def add_process_stats(stats: StageStats, process_stats: StageStats) -> None:
+    """Add resources used by a process that a stage has run to the stage stats.
+
+    Args:
+    ----
+        stats (StageStats): Stats of the stage, updated in place.
+        process_stats (StageStats): Stats of the process from wait_for_stage.
+    """
+    for field in ("user_time", "system_time", "read_bytes", "write_bytes"):
+        value = getattr(process_stats, field)
+        if value is None:
+            continue
+        total = (getattr(stats, field) or 0) + value
+        setattr(stats, field, round(total, 3) if isinstance(total, float) else total)
+    if process_stats.max_rss_kib is not None:
+        stats.max_rss_kib = max(stats.max_rss_kib or 0, process_stats.max_rss_kib)
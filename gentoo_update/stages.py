@@ -0,0 +1,803 @@
+"""In-process stage engine, an alternative to running updater.sh for every stage.
+
+updater.sh starts a new bash process for every stage, and both
+emerge_pretend and update run glsa-check again to find the packages
+to update. Stages of this engine run in the gentoo-update process and
+share a StageContext, so the packages to update are looked up once per
+run and external tools are started only for the work they actually do:
+emerge, etc-update, needrestart and the like. Packages affected by GLSAs
+are found by the scanner in glsa.py, glsa-check is run only if there is
+no GLSA directory.
+
+Every stage logs the same lines as its updater.sh function, so logs of
+both backends are parsed the same way. updater.sh is kept as the "shell"
+backend, stages marked native run in Python with both backends.
+
+With a batch size, the update stage splits the pretend plan into batches
+and merges them one by one. emerge prints the plan in merge order, so
+every batch depends only on packages of the same or earlier batches.
+Merged batches are saved in the checkpoint, a failure costs only the
+batch that was being merged, and a final @world pass merges whatever
+the batches have not covered.
+"""
+
+import configparser
+import os
+import shlex
+import shutil
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple, Type
+
+from .checkpoint import Checkpoint
+from .disk_usage import check_free_space, log_disk_usage
+from .elogs import ELOG_DIR, log_elogs
+from .fetch import DISTDIR, FETCH_COMMAND, Prefetch
+from .glsa import (
+    GLSA_INJECTED,
+    REPO_DIRS,
+    VDB_DIR,
+    find_repo_dir,
+    get_affected_packages,
+)
+from .report_objects import MergeSettings, PackageInfo, UpdateBatch
+from .repos import REPOS_CONF_PATHS, get_repo_age, read_repos_conf
+from .tuning import (
+    BUILD_DIR,
+    BuildMemorySampler,
+    choose_merge_settings,
+    has_job_flags,
+    load_memory_history,
+    parse_make_jobs,
+    read_mem_available,
+    save_memory_peaks,
+)
+
+STAGE_BACKENDS = ("python", "shell")
+DEFAULT_BACKEND = "python"
+GLSA_COMMAND = ["glsa-check", "--list", "--quiet", "affected"]
+
+
+class StageTimeoutError(Exception):
+    """A command of a stage was killed because of a time limit.
+
+    Attributes
+    ----------
+        reason (str): "timeout" or "stall".
+    """
+
+    def __init__(self, reason: str) -> None:
+        """Initialize StageTimeoutError class."""
+        super().__init__(reason)
+        self.reason = reason
+
+
+class StageOptions:
+    """Options of a run, the positional arguments of updater.sh.
+
+    Attributes
+    ----------
+        update_mode (str): security or full.
+        update_flags (str): Extra emerge flags, empty if there are none.
+        disk_usage_limit (str): Required free space on / in GiB.
+        config_update_mode (str): merge or ignore.
+        daemon_restart (str): y to restart services after the update.
+        clean (str): y to remove unused packages and distfiles.
+        read_elogs (str): y to log elogs of merged packages.
+        read_news (str): y to read Gentoo news.
+        batch_size (int): Packages per batch of a batched update,
+            0 merges all packages at once. Optional ninth argument.
+        sync_max_age (float): Repositories synced less than this many hours
+            ago are not synced, 0 syncs all. Optional tenth argument.
+        sync_jobs (int): Repositories that are synced at the same time,
+            1 syncs them one by one. Optional eleventh argument.
+        prefetch (str): y to fetch distfiles in the background during
+            the update. Optional twelfth argument.
+        auto_jobs (str): y to pick --jobs, --load-average and MAKEOPTS
+            of the update from host resources. Optional thirteenth argument.
+    """
+
+    def __init__(self, *args: str) -> None:
+        """Initialize StageOptions class from updater.sh arguments."""
+        (
+            self.update_mode,
+            update_flags,
+            self.disk_usage_limit,
+            self.config_update_mode,
+            self.daemon_restart,
+            self.clean,
+            self.read_elogs,
+            self.read_news,
+        ) = args[:8]
+        self.update_flags = "" if update_flags == "NOARGS" else update_flags
+        self.batch_size = int(args[8]) if len(args) > 8 else 0
+        self.sync_max_age = float(args[9]) if len(args) > 9 else 0
+        self.sync_jobs = int(args[10]) if len(args) > 10 else 1
+        self.prefetch = args[11] if len(args) > 11 else "n"
+        self.auto_jobs = args[12] if len(args) > 12 else "n"
+
+
+def get_package_atom(package: PackageInfo) -> str:
+    """Get an atom that selects the exact version of a planned package.
+
+    Example: =dev-libs/openssl-3.0.11::gentoo
+    """
+    version = package.new_version.split(":")[0]
+    atom = f"={package.package_name}-{version}"
+    if package.repo:
+        atom += f"::{package.repo}"
+    return atom
+
+
+def get_plan_atoms(packages: List[PackageInfo]) -> List[str]:
+    """Get atoms of the ebuilds of a pretend plan, in merge order."""
+    ebuilds = [package for package in packages if package.package_type == "ebuild"]
+    return [
+        get_package_atom(package)
+        for package in ebuilds
+        if package.package_name and package.new_version
+    ]
+
+
+def plan_update_batches(
+    packages: List[PackageInfo], batch_size: int
+) -> List[List[str]]:
+    """Split packages of the pretend plan into batches in merge order.
+
+    Args:
+    ----
+        packages (List[PackageInfo]): Packages from the pretend plan,
+            only ebuilds are merged.
+        batch_size (int): Maximum amount of packages in a batch.
+
+    Returns:
+    -------
+        List[List[str]]: Package atoms of every batch.
+    """
+    atoms = get_plan_atoms(packages)
+    return [
+        atoms[start : start + batch_size] for start in range(0, len(atoms), batch_size)
+    ]
+
+
+class StageContext:
+    """State shared by the stages of one run.
+
+    Attributes
+    ----------
+        options (StageOptions): Options of the run.
+        args (List[str]): updater.sh arguments the options were created from.
+        elog_dir (str): Directory with elog files of merged packages.
+        started_at (float): Unix time when the run started.
+        stage_started_at (Dict[str, float]): Unix time when stages started.
+        resume_merge (bool): Whether the update stage continues an
+            interrupted merge with emerge --resume.
+        pretend_packages (Optional[List[PackageInfo]]): Packages from the
+            output of the emerge_pretend stage.
+        checkpoint (Optional[Checkpoint]): Progress of the run, merged
+            batches are saved in it.
+        batches (List[List[str]]): Package atoms of every update batch.
+        completed_batches (int): Amount of batches that have been merged.
+        cache_dir (Optional[str]): Directory of the GLSA scanner cache.
+        repo_dirs (Tuple[str, ...]): Possible paths to the Gentoo repository.
+        vdb_dir (str): Path to /var/db/pkg.
+        glsa_injected (str): File with ids of applied GLSAs.
+        repos_conf_paths (Tuple[str, ...]): repos.conf files or directories
+            with the repositories to sync.
+        fetch_command (List[str]): Command that prefetches distfiles,
+            package atoms are appended to it.
+        distdir (str): Directory with distfiles.
+        makeopts (str): MAKEOPTS of make.conf.
+        build_dir (str): Portage build directory, memory of the processes
+            in it is sampled during the update.
+        merge_settings (Optional[MergeSettings]): Parallelism of the merge
+            picked from host resources, None if emerge defaults are used.
+    """
+
+    def __init__(
+        self,
+        args: List[str],
+        elog_dir: str = ELOG_DIR,
+        started_at: Optional[float] = None,
+        stage_started_at: Optional[Dict[str, float]] = None,
+    ) -> None:
+        """Initialize StageContext class."""
+        self.options = StageOptions(*args)
+        self.args = list(args)
+        self.elog_dir = elog_dir
+        self.started_at = time.time() if started_at is None else started_at
+        self.stage_started_at = {} if stage_started_at is None else stage_started_at
+        self.resume_merge = False
+        self.pretend_packages: Optional[List[PackageInfo]] = None
+        self.checkpoint: Optional[Checkpoint] = None
+        self.batches: List[List[str]] = []
+        self.completed_batches = 0
+        self.cache_dir: Optional[str] = None
+        self.repo_dirs: Tuple[str, ...] = REPO_DIRS
+        self.vdb_dir = VDB_DIR
+        self.glsa_injected = GLSA_INJECTED
+        self.repos_conf_paths: Tuple[str, ...] = REPOS_CONF_PATHS
+        self.fetch_command: List[str] = list(FETCH_COMMAND)
+        self.distdir = DISTDIR
+        self.makeopts = ""
+        self.build_dir = BUILD_DIR
+        self.merge_settings: Optional[MergeSettings] = None
+        self._update_targets: Optional[List[str]] = None
+        self.lock = threading.Lock()
+
+    def get_update_targets(self) -> List[str]:
+        """Get packages to update, looked up only once per run.
+
+        Returns
+        -------
+            List[str]: @world for a full update, packages affected by
+                GLSAs for a security update.
+
+        Raises
+        ------
+            ValueError: If the update mode is invalid.
+            OSError: If GLSA files can not be read.
+            subprocess.CalledProcessError: If glsa-check fails.
+        """
+        with self.lock:
+            if self._update_targets is None:
+                self._update_targets = self._find_update_targets()
+            return self._update_targets
+
+    def _find_update_targets(self) -> List[str]:
+        """Find packages to update, like get_update_packages_and_commands."""
+        if self.options.update_mode == "full":
+            return ["@world"]
+        if self.options.update_mode != "security":
+            raise ValueError("Invalid update mode, exiting....")
+
+        repo_dir = find_repo_dir(self.repo_dirs)
+        if repo_dir:
+            return get_affected_packages(
+                self.cache_dir, repo_dir, self.vdb_dir, self.glsa_injected
+            )
+        glsa = subprocess.run(
+            GLSA_COMMAND,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            check=True,
+        ).stdout
+        return [
+            fields[-2]
+            for fields in (line.split() for line in glsa.splitlines())
+            if len(fields) > 1
+        ]
+
+    def get_update_command(self) -> List[str]:
+        """Get the emerge command that updates the packages."""
+        flags = shlex.split(self.options.update_flags)
+        if self.options.update_mode == "security":
+            command = ["emerge", "--verbose", "--quiet-build", "--update"]
+        else:
+            command = [
+                "emerge",
+                "--verbose",
+                "--quiet-build",
+                "--update",
+                "--newuse",
+                "--deep",
+            ]
+        return command + flags + self.get_job_flags() + self.get_update_targets()
+
+    def get_batch_command(self, atoms: List[str]) -> List[str]:
+        """Get the emerge command that merges one batch of the update."""
+        flags = shlex.split(self.options.update_flags)
+        command = ["emerge", "--verbose", "--quiet-build", "--oneshot", "--update"]
+        return command + ["--newuse"] + flags + self.get_job_flags() + atoms
+
+    def get_job_flags(self) -> List[str]:
+        """Get --jobs and --load-average of the merge, empty if not picked."""
+        if self.merge_settings is None:
+            return []
+        return [
+            "--jobs",
+            str(self.merge_settings.jobs),
+            "--load-average",
+            str(self.merge_settings.load_average),
+        ]
+
+    def get_merge_env(self) -> Optional[Dict[str, str]]:
+        """Get environment of the merge with MAKEOPTS, None to inherit it."""
+        if self.merge_settings is None:
+            return None
+        return {**os.environ, "MAKEOPTS": self.merge_settings.makeopts}
+
+    def get_update_batches(self) -> List[List[str]]:
+        """Get batches of the update, planned once from the pretend plan.
+
+        Only full updates are batched. A security update is small, and its
+        command does not use --newuse, which every batch command adds.
+
+        Returns
+        -------
+            List[List[str]]: Package atoms of every batch, empty if the
+                update is merged at once: batches are disabled, it is not
+                a full update, there is no pretend plan or it fits in one batch.
+        """
+        if self.options.batch_size <= 0 or self.options.update_mode != "full":
+            return []
+        if not self.batches and self.pretend_packages:
+            batches = plan_update_batches(
+                self.pretend_packages, self.options.batch_size
+            )
+            if len(batches) > 1:
+                self.batches = batches
+                self.completed_batches = 0
+                if self.checkpoint:
+                    self.checkpoint.start_batches(batches)
+        return self.batches
+
+    def finish_batch(self) -> None:
+        """Record that the next batch has been merged."""
+        self.completed_batches += 1
+        if self.checkpoint:
+            self.checkpoint.finish_batch()
+
+
+class StageIO:
+    """Output and external commands of a running stage.
+
+    Attributes
+    ----------
+        log (Callable[[str], None]): Logs a line of standard output.
+        log_error (Callable[[str], None]): Logs a line of standard error output.
+        run (Callable[..., int]): Runs a command, streams its output to
+            the log and returns its exit code. Commands that run at the same
+            time get a label, it prefixes every line of their output,
+            a watch callable gets every output line as it is read, and
+            env replaces the environment of the command.
+        stop (Callable[[str], None]): Kills the process group of a running
+            command by its label.
+    """
+
+    def __init__(
+        self,
+        log: Callable[[str], None],
+        log_error: Callable[[str], None],
+        run: Callable[..., int],
+        stop: Callable[[str], None],
+    ) -> None:
+        """Initialize StageIO class."""
+        self.log = log
+        self.log_error = log_error
+        self.run = run
+        self.stop = stop
+
+
+class Stage:
+    """Base class of stages.
+
+    Attributes
+    ----------
+        name (str): Name of the stage, the same as the updater.sh function.
+        section (str): Section marker logged before the output of the stage.
+        native (bool): Whether the stage runs in Python with the shell
+            backend too, it does not need any external tools.
+    """
+
+    name = ""
+    section = ""
+    native = False
+
+    def run(self, context: StageContext, stage_io: StageIO) -> int:
+        """Run the stage.
+
+        Args:
+        ----
+            context (StageContext): State shared by the stages of the run.
+            stage_io (StageIO): Output and external commands of the stage.
+
+        Returns:
+        -------
+            int: Exit code of the stage.
+        """
+        raise NotImplementedError
+
+
+class CheckRootPartLimitStage(Stage):
+    """Check that / has more free space than the disk usage limit."""
+
+    name = "check_root_part_limit"
+    section = "{{ VERIFYING AVAILABLE DISK SPACE }}"
+    native = True
+
+    def run(self, context: StageContext, stage_io: StageIO) -> int:
+        """Run the stage."""
+        return check_free_space(float(context.options.disk_usage_limit), stage_io.log)
+
+
+class DiskUsageBeforeUpdateStage(Stage):
+    """Log disk usage before the update."""
+
+    name = "check_disk_usage_before_update"
+    section = "{{ CALCULATE DISK USAGE 1 }}"
+    native = True
+
+    def run(self, context: StageContext, stage_io: StageIO) -> int:
+        """Run the stage."""
+        return log_disk_usage(stage_io.log)
+
+
+class DiskUsageAfterUpdateStage(DiskUsageBeforeUpdateStage):
+    """Log disk usage after the update."""
+
+    name = "check_disk_usage_after_update"
+    section = "{{ CALCULATE DISK USAGE 2 }}"
+
+
+class SyncTreeStage(Stage):
+    """Sync the Portage tree.
+
+    With a maximum age, repositories synced more recently are skipped.
+    With more than one sync job, the other repositories are synced at the
+    same time, every one with its own emerge --sync. Both options exist
+    only in this backend, sync_tree of updater.sh always syncs everything.
+    """
+
+    name = "sync_tree"
+    section = "{{ SYNC PORTAGE TREE }}"
+
+    def run(self, context: StageContext, stage_io: StageIO) -> int:
+        """Run the stage."""
+        stage_io.log("Syncing Portage Tree")
+        options = context.options
+        if options.sync_max_age <= 0 and options.sync_jobs <= 1:
+            return stage_io.run(["emerge", "--sync"])
+
+        try:
+            repos = read_repos_conf(context.repos_conf_paths)
+        except (OSError, configparser.Error) as error:
+            stage_io.log_error(f"repos.conf can not be read: {error}")
+            repos = []
+        if not repos:
+            return stage_io.run(["emerge", "--sync"])
+
+        stale_repos = []
+        for repo in repos:
+            age = get_repo_age(repo.location)
+            if age is not None and age < options.sync_max_age * 3600:
+                stage_io.log(
+                    f"Repository {repo.name} was synced {age / 3600:.1f} hours ago, "
+                    "skipping"
+                )
+            else:
+                stale_repos.append(repo.name)
+        if not stale_repos:
+            stage_io.log("All repositories are up to date, skipping sync")
+            return 0
+
+        if options.sync_jobs <= 1 or len(stale_repos) == 1:
+            return stage_io.run(["emerge", "--sync"] + stale_repos)
+        stage_io.log(
+            f"Syncing {len(stale_repos)} repositories, "
+            f"{min(options.sync_jobs, len(stale_repos))} at a time"
+        )
+        with ThreadPoolExecutor(max_workers=options.sync_jobs) as executor:
+            exit_codes = list(
+                executor.map(
+                    lambda name: stage_io.run(["emerge", "--sync", name], name),
+                    stale_repos,
+                )
+            )
+        return next((exit_code for exit_code in exit_codes if exit_code), 0)
+
+
+class EmergePretendStage(Stage):
+    """Run the update with --pretend to detect issues before updating."""
+
+    name = "emerge_pretend"
+    section = "{{ PRETEND EMERGE }}"
+
+    def run(self, context: StageContext, stage_io: StageIO) -> int:
+        """Run the stage."""
+        targets = context.get_update_targets()
+        if not targets:
+            stage_io.log("There are no packages to update, skipping...")
+            return 0
+
+        command = context.get_update_command() + ["--pretend"]
+        stage_io.log("emerging with --pretend...")
+        stage_io.log(f"Updating: {' '.join(targets)}")
+        stage_io.log("Update command:")
+        stage_io.log(shlex.join(command))
+        if stage_io.run(command) != 0:
+            stage_io.log("emerge pretend has failed, exiting")
+            return 1
+        stage_io.log("emerge pretend was successful, updating...")
+        return 0
+
+
+class UpdateStage(Stage):
+    """Update the packages at once or in batches, or continue an interrupted merge.
+
+    With prefetch, distfiles of the pretend plan are fetched in the
+    background while the packages are merged. With auto jobs, --jobs,
+    --load-average and MAKEOPTS are picked from host resources. Memory
+    of package builds is sampled during every update for later picks.
+    """
+
+    name = "update"
+    section = "{{ UPDATE SYSTEM }}"
+
+    def run(self, context: StageContext, stage_io: StageIO) -> int:
+        """Run the stage."""
+        targets = context.get_update_targets()
+        if not targets:
+            stage_io.log("There are no packages to update, skipping...")
+            return 0
+
+        stage_io.log("emerging...")
+        stage_io.log(f"Updating: {' '.join(targets)}")
+        prefetch = None
+        atoms = get_plan_atoms(context.pretend_packages or [])
+        if context.options.prefetch == "y" and atoms:
+            stage_io.log(
+                f"Prefetching distfiles of {len(atoms)} packages in the background"
+            )
+            prefetch = Prefetch(context.fetch_command + atoms, context.distdir)
+            prefetch.start(stage_io.run)
+        if context.options.auto_jobs == "y":
+            self._pick_merge_settings(context, stage_io)
+
+        sampler = BuildMemorySampler(context.build_dir)
+        sampler.start()
+        exit_code = 1
+        try:
+            exit_code = self._merge(
+                context, stage_io, prefetch.wait_timer.feed if prefetch else None
+            )
+        finally:
+            make_jobs = parse_make_jobs(
+                context.merge_settings.makeopts
+                if context.merge_settings
+                else context.makeopts
+            )
+            save_memory_peaks(
+                context.cache_dir, sampler.stop(), make_jobs or os.cpu_count() or 1
+            )
+            if prefetch and exit_code != 0:
+                prefetch.stop(stage_io.stop)
+                stage_io.log("Prefetch was stopped because the update has failed")
+        if prefetch:
+            fetch = prefetch.finish()
+            if prefetch.exit_code and exit_code == 0:
+                stage_io.log(
+                    f"Prefetch has failed with code {prefetch.exit_code}, "
+                    "emerge has fetched the missing distfiles"
+                )
+            stage_io.log(fetch.to_log_line())
+        return exit_code
+
+    def _pick_merge_settings(self, context: StageContext, stage_io: StageIO) -> None:
+        """Pick parallelism of the merge unless update flags already set it."""
+        if has_job_flags(context.options.update_flags):
+            stage_io.log("--jobs or --load-average is set in update flags, keeping it")
+            return
+        package_names = [
+            package.package_name
+            for package in context.pretend_packages or []
+            if package.package_type == "ebuild" and package.package_name
+        ]
+        cpus = os.cpu_count() or 1
+        mem_available_kib = read_mem_available()
+        context.merge_settings, make_job_kib = choose_merge_settings(
+            cpus,
+            mem_available_kib,
+            context.makeopts,
+            package_names,
+            load_memory_history(context.cache_dir),
+        )
+        stage_io.log(context.merge_settings.to_log_line())
+        memory = "unknown" if mem_available_kib is None else f"{mem_available_kib} KiB"
+        stage_io.log(
+            f"Picked for {cpus} CPUs, {memory} of available memory "
+            f"and {make_job_kib} KiB per make job"
+        )
+
+    def _merge(
+        self,
+        context: StageContext,
+        stage_io: StageIO,
+        watch: Optional[Callable[[str], None]],
+    ) -> int:
+        """Merge the update at once, in batches or with emerge --resume.
+
+        Args:
+        ----
+            context (StageContext): State shared by the stages of the run.
+            stage_io (StageIO): Output and external commands of the stage.
+            watch (Optional[Callable[[str], None]]): Gets every output line
+                of the merge.
+
+        Returns:
+        -------
+            int: Exit code of the merge.
+        """
+        env = context.get_merge_env()
+        batches = context.get_update_batches()
+        if batches:
+            exit_code = self._merge_batches(context, stage_io, batches, watch)
+            if exit_code != 0:
+                return exit_code
+        elif context.resume_merge:
+            resume_command = ["emerge", "--verbose", "--quiet-build", "--resume"]
+            stage_io.log("Update command:")
+            stage_io.log(shlex.join(resume_command))
+            if stage_io.run(resume_command, watch=watch, env=env) == 0:
+                stage_io.log("update was successful")
+                return 0
+            stage_io.log("emerge --resume has failed, running the full update command")
+
+        command = context.get_update_command()
+        stage_io.log("Update command:")
+        stage_io.log(shlex.join(command))
+        exit_code = stage_io.run(command, watch=watch, env=env)
+        if exit_code != 0:
+            return exit_code
+        stage_io.log("update was successful")
+        return 0
+
+    def _merge_batches(
+        self,
+        context: StageContext,
+        stage_io: StageIO,
+        batches: List[List[str]],
+        watch: Optional[Callable[[str], None]] = None,
+    ) -> int:
+        """Merge batches that have not been merged yet, one by one.
+
+        A batch that was interrupted is merged again, packages it has
+        already merged are skipped by emerge --update.
+
+        Args:
+        ----
+            context (StageContext): State shared by the stages of the run.
+            stage_io (StageIO): Output and external commands of the stage.
+            batches (List[List[str]]): Package atoms of every batch.
+            watch (Optional[Callable[[str], None]]): Gets every output line
+                of the merge.
+
+        Returns:
+        -------
+            int: Exit code of the first failed batch, 0 if all were merged.
+        """
+        for number, atoms in enumerate(batches, 1):
+            batch = UpdateBatch(number, len(batches), len(atoms), "started")
+            if number <= context.completed_batches:
+                batch.status = "done"
+                stage_io.log(batch.to_log_line())
+                continue
+
+            stage_io.log(batch.to_log_line())
+            command = context.get_batch_command(atoms)
+            stage_io.log("Update command:")
+            stage_io.log(shlex.join(command))
+            exit_code = stage_io.run(command, watch=watch, env=context.get_merge_env())
+            batch.status = "failed" if exit_code != 0 else "done"
+            stage_io.log(batch.to_log_line())
+            if exit_code != 0:
+                return exit_code
+            context.finish_batch()
+        return 0
+
+
+class ConfigUpdateStage(Stage):
+    """Merge or ignore configuration file updates."""
+
+    name = "config_update"
+    section = "{{ UPDATE SYSTEM CONFIGURATION FILES }}"
+
+    def run(self, context: StageContext, stage_io: StageIO) -> int:
+        """Run the stage."""
+        update_mode = context.options.config_update_mode
+        if update_mode == "merge":
+            return stage_io.run(["etc-update", "--automode", "-5"])
+        if update_mode == "ignore":
+            stage_io.log("Ignoring configuration update for now...")
+            stage_io.log("Please UPDATE IT MANUALLY LATER")
+        else:
+            stage_io.log_error(f"Invalid update mode: {update_mode}")
+            stage_io.log_error("Please set UPDATE_MODE to 'merge' or 'ignore'.")
+        return 0
+
+
+class CleanUpStage(Stage):
+    """Remove unused packages, rebuild reverse dependencies and clean distfiles."""
+
+    name = "clean_up"
+    section = "{{ CLEAN UP }}"
+
+    def run(self, context: StageContext, stage_io: StageIO) -> int:
+        """Run the stage."""
+        if context.options.clean != "y":
+            stage_io.log("Clean up is not enabled.")
+            return 0
+
+        stage_io.log("Cleaning packages that are not part of the tree...")
+        exit_code = stage_io.run(["emerge", "--depclean"])
+        if exit_code != 0:
+            return exit_code
+
+        if shutil.which("revdep-rebuild") is None:
+            stage_io.log("app-portage/gentoolkit is not installed")
+            return 0
+        stage_io.log("Checking reverse dependencies...")
+        exit_code = stage_io.run(["revdep-rebuild"])
+        if exit_code != 0:
+            return exit_code
+        stage_io.log("Clean source code...")
+        return stage_io.run(["eclean", "--deep", "distfiles"])
+
+
+class CheckRestartStage(Stage):
+    """List or restart services that use updated libraries."""
+
+    name = "check_restart"
+    section = "{{ RESTART SERVICES }}"
+
+    def run(self, context: StageContext, stage_io: StageIO) -> int:
+        """Run the stage."""
+        if shutil.which("needrestart") is None:
+            stage_io.log("app-admin/needrestart is not installed")
+            return 0
+        stage_io.log("Checking is any service needs a restart")
+        restart_mode = "a" if context.options.daemon_restart == "y" else "l"
+        return stage_io.run(["needrestart", "-r", restart_mode])
+
+
+class GetLogsStage(Stage):
+    """Log elogs written since the update stage started."""
+
+    name = "get_logs"
+    section = "{{ READ ELOGS }}"
+    native = True
+
+    def run(self, context: StageContext, stage_io: StageIO) -> int:
+        """Run the stage."""
+        if context.options.read_elogs != "y":
+            stage_io.log("not reading elogs")
+            return 0
+        stage_io.log("reading elogs")
+        since = context.stage_started_at.get("update", context.started_at)
+        return log_elogs(since, stage_io.log, context.elog_dir)
+
+
+class GetNewsStage(Stage):
+    """Read unread Gentoo news items."""
+
+    name = "get_news"
+    section = "{{ READ NEWS }}"
+
+    def run(self, context: StageContext, stage_io: StageIO) -> int:
+        """Run the stage."""
+        if context.options.read_news != "y":
+            stage_io.log("not reading news")
+            return 0
+        stage_io.log("Getting important news")
+        return stage_io.run(["eselect", "news", "read", "new"])
+
+
+STAGES: Dict[str, Type[Stage]] = {
+    stage.name: stage
+    for stage in (
+        CheckRootPartLimitStage,
+        DiskUsageBeforeUpdateStage,
+        DiskUsageAfterUpdateStage,
+        SyncTreeStage,
+        EmergePretendStage,
+        UpdateStage,
+        ConfigUpdateStage,
+        CleanUpStage,
+        CheckRestartStage,
+        GetLogsStage,
+        GetNewsStage,
+    )
+}
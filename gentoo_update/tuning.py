@@ -0,0 +1,263 @@
+"""Pick emerge --jobs, --load-average and MAKEOPTS from host resources.
+
+Parallel merges finish sooner, but make jobs of large C++ builds take
+gigabytes each, and too many of them at once get killed by the OOM
+killer. The settings are chosen from the amount of CPUs, MemAvailable
+of /proc/meminfo, MAKEOPTS of make.conf and the memory that make jobs of
+the planned packages used in previous runs:
+
+    memory per make job = largest peak / make jobs of the planned packages,
+        DEFAULT_MAKE_JOB_KIB for packages without history
+    slots = make jobs that fit in 90% of MemAvailable, at most one per CPU
+    MAKEOPTS = -j<min(MAKEOPTS jobs, slots)> -l<CPUs>
+    --jobs = slots / make jobs, at most one per planned package
+    --load-average = CPUs
+
+Peaks are sampled during the update: every process whose working
+directory is in the Portage build directory is counted for the package
+that is being built there, and the largest sum of their RSS is saved
+in the gentoo-update log directory.
+
+Memory history file layout:
+    {"version": 1, "packages": {"dev-qt/qtwebengine": [peak_kib, make_jobs]}}
+"""
+
+import json
+import os
+import re
+import shlex
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from .atom import parse_atom
+from .atomic_file import atomic_write
+from .report_objects import MergeSettings
+
+MEMINFO = "/proc/meminfo"
+PROC_DIR = "/proc"
+BUILD_DIR = "/var/tmp/portage"
+MEMORY_FILENAME = "package_memory.json"
+MEMORY_VERSION = 1
+DEFAULT_MAKE_JOB_KIB = 2 * 1024 * 1024
+MEMORY_SAFETY = 0.9
+SAMPLE_INTERVAL = 5.0
+MAKE_JOBS_PATTERN = re.compile(r"^(?:-j|--jobs=?)(\d*)$")
+JOB_FLAGS_PATTERN = re.compile(r"^(?:--jobs|--load-average|-[a-zA-Z]*[jl])")
+
+MemoryHistory = Dict[str, Tuple[int, int]]
+
+
+def read_mem_available(meminfo: str = MEMINFO) -> Optional[int]:
+    """Get MemAvailable in KiB, None if it can not be read."""
+    try:
+        with open(meminfo, encoding="utf-8") as meminfo_file:
+            for line in meminfo_file:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1])
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+def parse_make_jobs(makeopts: str) -> Optional[int]:
+    """Get the amount of jobs from MAKEOPTS, None if it is not limited.
+
+    Example: "-j8 -l8" => 8
+    """
+    tokens = shlex.split(makeopts)
+    for position, token in enumerate(tokens):
+        match_jobs = MAKE_JOBS_PATTERN.match(token)
+        if match_jobs is None:
+            continue
+        jobs = match_jobs.group(1)
+        if not jobs and position + 1 < len(tokens):
+            jobs = tokens[position + 1]
+        return int(jobs) if jobs.isdigit() and int(jobs) > 0 else None
+    return None
+
+
+def has_job_flags(update_flags: str) -> bool:
+    """Check if update flags already set --jobs or --load-average of emerge."""
+    return any(JOB_FLAGS_PATTERN.match(flag) for flag in shlex.split(update_flags))
+
+
+def choose_merge_settings(
+    cpus: int,
+    mem_available_kib: Optional[int],
+    makeopts: str,
+    package_names: List[str],
+    history: MemoryHistory,
+) -> Tuple[MergeSettings, int]:
+    """Choose emerge and make parallelism for the planned packages.
+
+    Args:
+    ----
+        cpus (int): Amount of CPUs.
+        mem_available_kib (Optional[int]): MemAvailable, None if unknown.
+        makeopts (str): MAKEOPTS of make.conf.
+        package_names (List[str]): Packages of the pretend plan.
+        history (MemoryHistory): Memory peaks and make jobs by package name.
+
+    Returns:
+    -------
+        Tuple[MergeSettings, int]: Settings and the memory per make job
+            in KiB they are based on.
+    """
+    make_job_kib = max(
+        (
+            (
+                history[name][0] // max(history[name][1], 1)
+                if name in history
+                else DEFAULT_MAKE_JOB_KIB
+            )
+            for name in package_names
+        ),
+        default=DEFAULT_MAKE_JOB_KIB,
+    )
+    slots = cpus
+    if mem_available_kib is not None:
+        memory_slots = int(mem_available_kib * MEMORY_SAFETY) // max(make_job_kib, 1)
+        slots = max(1, min(cpus, memory_slots))
+
+    make_jobs = min(parse_make_jobs(makeopts) or cpus, slots)
+    jobs = max(1, slots // make_jobs)
+    if package_names:
+        jobs = min(jobs, len(package_names))
+    settings = MergeSettings(jobs, float(cpus), f"-j{make_jobs} -l{cpus}")
+    return settings, make_job_kib
+
+
+def sample_build_memory(
+    build_dir: str = BUILD_DIR, proc_dir: str = PROC_DIR
+) -> Dict[str, int]:
+    """Get RSS in KiB of processes that build packages, by category/PF.
+
+    Args:
+    ----
+        build_dir (str): Portage build directory, PORTAGE_TMPDIR/portage.
+        proc_dir (str): Path to /proc.
+
+    Returns:
+    -------
+        Dict[str, int]: Memory of every package that is being built,
+            like {"dev-libs/openssl-3.0.11": 524288}.
+    """
+    prefix = build_dir.rstrip("/") + "/"
+    page_kib = os.sysconf("SC_PAGE_SIZE") // 1024
+    usage: Dict[str, int] = {}
+    try:
+        pids = [pid for pid in os.listdir(proc_dir) if pid.isdigit()]
+    except OSError:
+        return usage
+    for pid in pids:
+        try:
+            cwd = os.readlink(os.path.join(proc_dir, pid, "cwd"))
+            if not cwd.startswith(prefix):
+                continue
+            with open(os.path.join(proc_dir, pid, "statm"), encoding="utf-8") as statm:
+                resident_pages = int(statm.read().split()[1])
+        except (OSError, ValueError, IndexError):
+            continue
+        build_path = cwd[len(prefix) :].split("/")
+        if len(build_path) < 2:
+            continue
+        cpv = f"{build_path[0]}/{build_path[1]}"
+        usage[cpv] = usage.get(cpv, 0) + resident_pages * page_kib
+    return usage
+
+
+class BuildMemorySampler:
+    """Sample memory of package builds in a thread while the update runs.
+
+    Attributes
+    ----------
+        build_dir (str): Portage build directory.
+        interval (float): Seconds between samples.
+        peaks (Dict[str, int]): Largest memory in KiB by category/PF.
+    """
+
+    def __init__(
+        self, build_dir: str = BUILD_DIR, interval: float = SAMPLE_INTERVAL
+    ) -> None:
+        """Initialize BuildMemorySampler class."""
+        self.build_dir = build_dir
+        self.interval = interval
+        self.peaks: Dict[str, int] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def sample(self) -> None:
+        """Take one sample and update the peaks."""
+        for cpv, memory_kib in sample_build_memory(self.build_dir).items():
+            self.peaks[cpv] = max(self.peaks.get(cpv, 0), memory_kib)
+
+    def _run(self) -> None:
+        """Sample until stopped."""
+        while True:
+            self.sample()
+            if self._stop.wait(self.interval):
+                return
+
+    def start(self) -> None:
+        """Start sampling in a thread."""
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> Dict[str, int]:
+        """Stop sampling and get the peaks."""
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        return self.peaks
+
+
+def load_memory_history(cache_dir: Optional[str]) -> MemoryHistory:
+    """Load memory peaks of previous runs, empty if there are none."""
+    if not cache_dir:
+        return {}
+    try:
+        with open(
+            os.path.join(cache_dir, MEMORY_FILENAME), encoding="utf-8"
+        ) as memory_file:
+            saved = json.load(memory_file)
+        if saved.get("version") != MEMORY_VERSION:
+            return {}
+        return {
+            name: (int(peak_kib), int(make_jobs))
+            for name, (peak_kib, make_jobs) in saved["packages"].items()
+        }
+    except (OSError, ValueError, TypeError, KeyError, AttributeError):
+        return {}
+
+
+def save_memory_peaks(
+    cache_dir: Optional[str], peaks: Dict[str, int], make_jobs: int
+) -> None:
+    """Atomically add memory peaks of this run to the memory history.
+
+    A package keeps only its latest peak, builds change between versions.
+
+    Args:
+    ----
+        cache_dir (Optional[str]): gentoo-update log directory.
+        peaks (Dict[str, int]): Largest memory in KiB by category/PF.
+        make_jobs (int): Make jobs the packages were built with.
+    """
+    if not cache_dir or not peaks:
+        return
+    history = load_memory_history(cache_dir)
+    for cpv, peak_kib in peaks.items():
+        try:
+            history[parse_atom(cpv).package_name] = (peak_kib, make_jobs)
+        except ValueError:
+            continue
+    memory_path = os.path.join(cache_dir, MEMORY_FILENAME)
+    try:
+        with atomic_write(memory_path) as memory_file:
+            json.dump(
+                {"version": MEMORY_VERSION, "packages": history},
+                memory_file,
+                sort_keys=True,
+            )
+    except OSError:
+        pass
@@ -0,0 +1,232 @@
+"""Snapshots of installed packages (the vdb) taken around the update.
+
+A snapshot lists every package in /var/db/pkg with its SLOT, repository
+and BUILD_TIME, read from the small metadata files of the package with
+os.scandir, so it takes a fraction of a second on hosts with thousands
+of packages. The snapshots before and after the update stage are stored
+next to the log as gzip compressed JSON, and their difference is used by
+the report instead of the package lines scraped from emerge output.
+
+Snapshot file layout:
+    {"version": 1, "before": [[cpv, slot, repo, build_time], ...],
+     "after": [...]}
+"""
+
+import gzip
+import json
+import os
+from typing import Dict, List, Optional, Tuple
+
+from .atom import parse_atom, vercmp
+from .atomic_file import atomic_write
+from .report_objects import PackageInfo
+
+VDB_DIR = "/var/db/pkg"
+VDB_SUFFIX = ".vdb.json.gz"
+VDB_SNAPSHOT_VERSION = 1
+READ_SIZE = 4096
+
+Snapshot = Dict[str, Tuple[str, str, int]]
+
+
+def get_vdb_snapshot_path(log_file: str) -> str:
+    """Get path of the vdb snapshots that belong to a log file."""
+    return f"{log_file}{VDB_SUFFIX}"
+
+
+def _read_small_file(file_path: str) -> str:
+    """Read the first line of a small metadata file, empty if it is missing."""
+    try:
+        file_descriptor = os.open(file_path, os.O_RDONLY)
+    except OSError:
+        return ""
+    try:
+        data = os.read(file_descriptor, READ_SIZE)
+    finally:
+        os.close(file_descriptor)
+    return data.decode("utf-8", "replace").strip()
+
+
+def read_vdb_snapshot(vdb_dir: str = VDB_DIR) -> Snapshot:
+    """Take a snapshot of installed packages.
+
+    Args:
+    ----
+        vdb_dir (str): Path to /var/db/pkg.
+
+    Returns:
+    -------
+        Snapshot: SLOT without the subslot, repository and BUILD_TIME
+            by category/PF, like dev-libs/openssl-3.0.11.
+
+    Raises:
+    ------
+        OSError: If the vdb can not be read.
+    """
+    snapshot: Snapshot = {}
+    with os.scandir(vdb_dir) as categories:
+        category_dirs = [
+            (category.name, category.path)
+            for category in categories
+            if category.is_dir() and not category.name.startswith(".")
+        ]
+    for category_name, category_path in category_dirs:
+        with os.scandir(category_path) as packages:
+            for package in packages:
+                if package.name.startswith("-MERGING-") or not package.is_dir():
+                    continue
+                join = os.path.join
+                slot = _read_small_file(join(package.path, "SLOT"))
+                repo = _read_small_file(join(package.path, "repository"))
+                build_time = _read_small_file(join(package.path, "BUILD_TIME"))
+                snapshot[f"{category_name}/{package.name}"] = (
+                    slot.split("/")[0] or "0",
+                    repo,
+                    int(build_time) if build_time.isdigit() else 0,
+                )
+    return snapshot
+
+
+def save_vdb_snapshots(log_file: str, snapshots: Dict[str, Snapshot]) -> None:
+    """Atomically write the snapshot file of a log.
+
+    Args:
+    ----
+        log_file (str): Path to the update log.
+        snapshots (Dict[str, Snapshot]): Snapshots by name, "before"
+            and "after".
+    """
+    saved = {
+        "version": VDB_SNAPSHOT_VERSION,
+        **{
+            snapshot_name: [
+                [cpv, *package] for cpv, package in sorted(saved_snapshot.items())
+            ]
+            for snapshot_name, saved_snapshot in snapshots.items()
+        },
+    }
+    with atomic_write(get_vdb_snapshot_path(log_file), binary=True) as raw_file:
+        with gzip.open(raw_file, "wt", encoding="utf-8") as snapshot_file:
+            json.dump(saved, snapshot_file, separators=(",", ":"))
+
+
+def load_vdb_snapshots(log_file: str) -> Dict[str, Snapshot]:
+    """Load snapshots of a log.
+
+    Args:
+    ----
+        log_file (str): Path to the update log.
+
+    Returns:
+    -------
+        Dict[str, Snapshot]: Snapshots by name, empty if there are none.
+    """
+    try:
+        with gzip.open(
+            get_vdb_snapshot_path(log_file), "rt", encoding="utf-8"
+        ) as snapshot_file:
+            saved = json.load(snapshot_file)
+        if saved.get("version") != VDB_SNAPSHOT_VERSION:
+            return {}
+        return {
+            name: {row[0]: tuple(row[1:]) for row in rows}
+            for name, rows in saved.items()
+            if name != "version"
+        }
+    except (OSError, ValueError, TypeError, AttributeError):
+        return {}
+
+
+def _index_by_slot(
+    snapshot: Snapshot,
+) -> Dict[Tuple[str, str], Tuple[str, str, int]]:
+    """Index a snapshot by package name and slot."""
+    index = {}
+    for cpv, (slot, repo, build_time) in snapshot.items():
+        try:
+            atom = parse_atom(cpv)
+        except ValueError:
+            continue
+        index[(atom.package_name, slot)] = (str(atom.version), repo, build_time)
+    return index
+
+
+def diff_vdb_snapshots(before: Snapshot, after: Snapshot) -> List[PackageInfo]:
+    """Find packages that were merged or removed between two snapshots.
+
+    Packages are matched by name and slot. A package that moved to
+    another slot is reported as updated from the version it replaced.
+
+    Args:
+    ----
+        before (Snapshot): Installed packages before the update.
+        after (Snapshot): Installed packages after the update.
+
+    Returns:
+    -------
+        List[PackageInfo]: Changes with update_status Update, Downgrade,
+            NewPackage or ReEmerge, and removed packages with
+            package_type "uninstall".
+    """
+    old_index = _index_by_slot(before)
+    new_index = _index_by_slot(after)
+    removed = {key: old_index[key] for key in old_index.keys() - new_index.keys()}
+    removed_by_name = {key[0]: key for key in removed}
+
+    changes = []
+    for key in sorted(new_index):
+        package_name, _ = key
+        new_version, repo, build_time = new_index[key]
+        old = old_index.get(key)
+        if old is None and package_name in removed_by_name:
+            old = removed.pop(removed_by_name.pop(package_name))
+        if old is None:
+            status = "NewPackage"
+            old_version = None
+        else:
+            old_version, _, old_build_time = old
+            result = vercmp(new_version, old_version)
+            if result > 0:
+                status = "Update"
+            elif result < 0:
+                status = "Downgrade"
+            elif build_time != old_build_time:
+                status = "ReEmerge"
+                old_version = None
+            else:
+                continue
+        changes.append(
+            PackageInfo("ebuild", package_name, new_version, old_version, status, repo)
+        )
+
+    for (package_name, _), (old_version, repo, _) in sorted(removed.items()):
+        changes.append(
+            PackageInfo("uninstall", package_name, None, old_version, None, repo)
+        )
+    return changes
+
+
+def load_vdb_changes(log_file: str) -> Optional[List[PackageInfo]]:
+    """Get packages changed by the update of a log.
+
+    Returns
+    -------
+        Optional[List[PackageInfo]]: Changes, None if the log does not have
+            both snapshots.
+    """
+    snapshots = load_vdb_snapshots(log_file)
+    if "before" not in snapshots or "after" not in snapshots:
+        return None
+    return diff_vdb_snapshots(snapshots["before"], snapshots["after"])
+
+
+def summarize_vdb_changes(changes: List[PackageInfo]) -> str:
+    """Format changes as a line of the update system section."""
+    statuses = [change.update_status for change in changes]
+    removed = sum(1 for change in changes if change.package_type == "uninstall")
+    return (
+        f"Installed packages: {statuses.count('Update')} updated, "
+        f"{statuses.count('NewPackage')} new, "
+        f"{statuses.count('ReEmerge')} rebuilt, "
+        f"{statuses.count('Downgrade')} downgraded, {removed} removed"
+    )
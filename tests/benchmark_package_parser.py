@@ -0,0 +1,117 @@
+"""Benchmark the package line tokenizer against the old implementation.
+
+Run it from a source checkout, no install or PYTHONPATH needed:
+    python tests/benchmark_package_parser.py
+"""
+
+import re
+import sys
+import time
+from os import path
+from typing import Callable, List
+
+sys.path.insert(0, path.dirname(path.dirname(path.abspath(__file__))))
+
+from gentoo_update.parser_package import (  # noqa: E402
+    PackageParser,
+    tokenize_package_line,
+)
+
+PACKAGES = 5000
+ROUNDS = 5
+PACKAGE_LINES = [
+    '[ebuild     U  ] dev-libs/openssl-3.0.11:0/3::gentoo [3.0.10:0/3::gentoo] USE="asm -fips -ktls -rfc3779 -sctp -static-libs -test -tls-compression -vanilla -verify-sig -weak-ssl-ciphers" ABI_X86="(64) -32 (-x32)" CPU_FLAGS_X86="(sse2)" 0 KiB',  # noqa: E501
+    '[ebuild     U  ] net-fs/samba-4.18.8::gentoo [4.18.4-r1::gentoo] USE="acl client cups pam regedit system-mitkrb5 systemd -addc -ads -ceph -cluster -debug (-fam) -glusterfs -gpg -iprint -json -ldap -llvm-libunwind -profiling-data -python -quota (-selinux) -snapper -spotlight -syslog (-system-heimdal) (-test) -unwind -winbind -zeroconf" ABI_X86="(64) -32 (-x32)" CPU_FLAGS_X86="-aes" PYTHON_SINGLE_TARGET="python3_11 -python3_10" 40368 KiB',  # noqa: E501
+    '[ebuild     U  ] dev-python/setuptools-69.0.2-r1::gentoo [68.2.2-r1::gentoo] USE="-test" PYTHON_TARGETS="python3_11 (-pypy3) -python3_10 -python3_12" 2175 KiB',  # noqa: E501
+    "[ebuild  N     ] acct-group/pipewire-0-r1::gentoo  0 KiB",
+    '[blocks b      ] <perl-core/Compress-Raw-Zlib-2.204.1_rc ("<perl-core/Compress-Raw-Zlib-2.204.1_rc" is soft blocking virtual/perl-Compress-Raw-Zlib-2.204.1_rc)',  # noqa: E501
+    "[uninstall     ] perl-core/Compress-Raw-Zlib-2.202.0::gentoo",
+]
+
+
+def legacy_parse_package_string(package_string: str) -> List[str]:
+    """Split package string the way PackageParser did before the tokenizer."""
+    split_package_string = []
+    temp = ""
+    quotes_count = 0
+    brackets_count = 0
+
+    for char in package_string:
+        temp += char
+        if char == '"':
+            quotes_count += 1
+        elif char == "[":
+            brackets_count += 1
+        elif char == "]":
+            brackets_count -= 1
+
+        if char == " " and quotes_count % 2 == 0 and brackets_count == 0:
+            split_package_string.append(temp.strip())
+            temp = ""
+
+    if temp:
+        split_package_string.append(temp.strip())
+
+    return split_package_string
+
+
+def legacy_parse_update_details(section_content: List[str]) -> List[List[str]]:
+    """Tokenize package lines the way PackageParser did before the tokenizer."""
+    packages = []
+    for line in section_content:
+        if re.search(r"\[(.+?)\]", line) and line != "[ ok ]":
+            split_package_string = legacy_parse_package_string(line)
+            attributes = {}
+            for var in split_package_string:
+                if '="' in var:
+                    splitvar = var.split("=")
+                    attributes[splitvar[0]] = splitvar[1][1:-1].split(" ")
+            packages.append(split_package_string)
+    return packages
+
+
+def legacy_tokenize(section_content: List[str]) -> None:
+    """Split each package line with the old per-character loop."""
+    for line in section_content:
+        legacy_parse_package_string(line)
+
+
+def tokenize(section_content: List[str]) -> None:
+    """Split each package line with the precompiled tokenizer."""
+    for line in section_content:
+        tokenize_package_line(line)
+
+
+def measure(name: str, parse: Callable, section_content: List[str]) -> float:
+    """Print and return the best lines/sec of a parse function."""
+    best = None
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        parse(section_content)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    lines_per_second = len(section_content) / best
+    print(f"{name:<20} {lines_per_second:>12,.0f} lines/sec")
+    return lines_per_second
+
+
+def main() -> None:
+    """Run the benchmark on a synthetic update with 5,000 packages."""
+    section_content = [
+        PACKAGE_LINES[number % len(PACKAGE_LINES)] for number in range(PACKAGES)
+    ]
+    print(f"Parsing {PACKAGES} package lines, best of {ROUNDS} rounds")
+    print("Tokenizing only:")
+    legacy = measure("legacy", legacy_tokenize, section_content)
+    current = measure("tokenizer", tokenize, section_content)
+    print(f"speedup: {current / legacy:.1f}x")
+    print("Tokenizing and collecting attributes:")
+    legacy = measure("legacy", legacy_parse_update_details, section_content)
+    current = measure(
+        "parse_update_details", PackageParser().parse_update_details, section_content
+    )
+    print(f"speedup: {current / legacy:.1f}x (the new path also builds PackageInfo)")
+
+
+if __name__ == "__main__":
+    main()
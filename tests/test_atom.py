@@ -0,0 +1,73 @@
+"""Unit tests for atom.py file."""
+
+import unittest
+from functools import cmp_to_key
+
+from gentoo_update.atom import (
+    classify_version_change,
+    parse_atom,
+    parse_version,
+    vercmp,
+)
+
+
+class TestAtom(unittest.TestCase):
+    """Unit tests for atom parsing and version comparison."""
+
+    def test_parse_atom(self):
+        """Test if all parts of an atom are found."""
+        atom = parse_atom("dev-libs/openssl-3.0.11-r1:0/3::gentoo")
+        self.assertEqual(atom.package_name, "dev-libs/openssl")
+        self.assertEqual(str(atom.version), "3.0.11-r1")
+        self.assertEqual(atom.version.revision, 1)
+        self.assertEqual((atom.slot, atom.subslot, atom.repo), ("0", "3", "gentoo"))
+
+        atom = parse_atom("virtual/perl-Compress-Raw-Zlib-2.204.1_rc")
+        self.assertEqual(atom.name, "perl-Compress-Raw-Zlib")
+        self.assertEqual(atom.version.suffixes, (("rc", 0),))
+        self.assertEqual(parse_atom("dev-util/foo-1-2").name, "foo-1")
+
+        for invalid_atom in ["openssl-3.0.11", "dev-libs/openssl", "dev-libs/a-1.x"]:
+            with self.assertRaises(ValueError):
+                parse_atom(invalid_atom)
+
+    def test_vercmp(self):
+        """Test version ordering from PMS examples."""
+        ordered = [
+            "1.0_alpha",
+            "1.0_beta2",
+            "1.0_pre",
+            "1.0_rc1",
+            "1.0",
+            "1.0-r1",
+            "1.0-r10",
+            "1.0_p1",
+            "1.0a",
+            "1.01",
+            "1.1",
+            "1.1.0",
+            "1.2",
+            "1.10",
+            "2",
+        ]
+        for older, newer in zip(ordered, ordered[1:]):
+            self.assertEqual(vercmp(older, newer), -1, f"{older} < {newer}")
+            self.assertEqual(vercmp(newer, older), 1, f"{newer} > {older}")
+        self.assertEqual(sorted(reversed(ordered), key=cmp_to_key(vercmp)), ordered)
+        self.assertEqual(vercmp("1.010", "1.01"), 0)
+        self.assertEqual(vercmp("3.0.10:0/3", "3.0.10"), 0)
+        self.assertEqual(str(parse_version("1.0_p3-r2")), "1.0_p3-r2")
+
+    def test_classify_version_change(self):
+        """Test classification of version bumps."""
+        self.assertEqual(classify_version_change("68.2.2-r1", "69.0.2-r1"), "major")
+        self.assertEqual(classify_version_change("3.0.10:0/3", "3.0.11:0/3"), "minor")
+        self.assertEqual(classify_version_change("1.0_rc1", "1.0"), "minor")
+        self.assertEqual(classify_version_change("1.0", "1.0-r1"), "revision")
+        self.assertEqual(classify_version_change("2.0", "1.9"), "downgrade")
+        self.assertEqual(classify_version_change("2.0", "2.0"), "same")
+        self.assertEqual(classify_version_change("9999", "live"), "unknown")
+
+
+if __name__ == "__main__":
+    unittest.main()
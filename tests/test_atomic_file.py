@@ -0,0 +1,47 @@
+"""Unit tests for atomic_file.py file."""
+
+import os
+import stat
+import tempfile
+import unittest
+from os import path
+
+from gentoo_update.atomic_file import atomic_write
+
+
+class TestAtomicWrite(unittest.TestCase):
+    """Unit tests for atomic writes with unique temporary files."""
+
+    def setUp(self):
+        """Create a temporary directory."""
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.file_path = path.join(self.tmp_dir.name, "cache.json")
+
+    def test_file_is_replaced_when_complete(self):
+        """Test if the target keeps its old content until the write is done."""
+        with open(self.file_path, "w", encoding="utf-8") as old_file:
+            old_file.write("old")
+        with atomic_write(self.file_path) as first:
+            with atomic_write(self.file_path) as second:
+                first.write("first")
+                second.write("second")
+                with open(self.file_path, encoding="utf-8") as current_file:
+                    self.assertEqual(current_file.read(), "old")
+
+        with open(self.file_path, encoding="utf-8") as new_file:
+            self.assertEqual(new_file.read(), "first")
+        self.assertEqual(os.listdir(self.tmp_dir.name), ["cache.json"])
+        self.assertEqual(stat.S_IMODE(os.stat(self.file_path).st_mode), 0o644)
+
+    def test_failed_write_is_removed(self):
+        """Test if a failed write leaves neither the target nor a temporary file."""
+        with self.assertRaises(ValueError):
+            with atomic_write(self.file_path, binary=True) as new_file:
+                new_file.write(b"partial")
+                raise ValueError("write failed")
+        self.assertEqual(os.listdir(self.tmp_dir.name), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,101 @@
+"""Unit tests for cache.py file."""
+
+import os
+import shutil
+import tempfile
+import unittest
+from os import path
+from unittest.mock import patch
+
+from gentoo_update.cache import (
+    get_cache_path,
+    load_cached_log_info,
+    load_log_info,
+    load_pretend_plan,
+    save_log_info_cache,
+    save_pretend_plan,
+)
+from gentoo_update.parser import Parser
+
+LOGS_FOR_TESTS = path.join(path.dirname(path.abspath(__file__)), "logs_for_unit_tests")
+
+
+class TestCache(unittest.TestCase):
+    """Unit tests for the LogInfo cache."""
+
+    def setUp(self):
+        """Copy a test log to a temporary directory."""
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.log_path = path.join(self.tmp_dir.name, "log_2023-12-30-21-06")
+        shutil.copy(path.join(LOGS_FOR_TESTS, "log_2023-12-30-21-06"), self.log_path)
+        self.log_info = Parser(self.log_path).extract_info_for_report()
+
+    def test_cache_round_trip(self):
+        """Test if cached LogInfo equals parsed LogInfo, package attributes too."""
+        save_log_info_cache(self.log_path, self.log_info)
+        cached_info = load_cached_log_info(self.log_path)
+        self.assertEqual(cached_info, self.log_info)
+
+        packages = self.log_info.update_system.update_details["updated_packages"]
+        cached_packages = cached_info.update_system.update_details["updated_packages"]
+        self.assertEqual(vars(cached_packages[0]), vars(packages[0]))
+
+    def test_cache_hit_does_not_read_log(self):
+        """Test if the log is not parsed when the cache is valid."""
+        self.assertEqual(load_log_info(self.log_path), self.log_info)
+        with patch("gentoo_update.cache.Parser") as parser:
+            self.assertEqual(load_log_info(self.log_path), self.log_info)
+            parser.assert_not_called()
+
+    def test_cache_invalidated_by_log_change(self):
+        """Test if changing the log size or mtime invalidates the cache."""
+        save_log_info_cache(self.log_path, self.log_info)
+        log_stat = os.stat(self.log_path)
+        os.utime(self.log_path, ns=(log_stat.st_atime_ns, log_stat.st_mtime_ns + 1))
+        self.assertIsNone(load_cached_log_info(self.log_path))
+
+        save_log_info_cache(self.log_path, self.log_info)
+        with open(self.log_path, "a", encoding="utf-8") as log_file:
+            log_file.write("\n")
+        self.assertIsNone(load_cached_log_info(self.log_path))
+
+    def test_growing_log_is_not_cached_as_complete(self):
+        """Test if a log that grows while it is parsed is parsed again later."""
+        extract_info = Parser.extract_info_for_report
+
+        def extract_info_while_written(parser):
+            log_info = extract_info(parser)
+            with open(self.log_path, "a", encoding="utf-8") as log_file:
+                log_file.write("more output\n")
+            return log_info
+
+        with patch.object(
+            Parser, "extract_info_for_report", extract_info_while_written
+        ):
+            load_log_info(self.log_path)
+        self.assertIsNone(load_cached_log_info(self.log_path))
+        self.assertEqual(
+            [name for name in os.listdir(self.tmp_dir.name) if name.endswith(".tmp")],
+            [],
+        )
+
+    def test_cache_invalidated_by_schema_version(self):
+        """Test if a cache written with another schema version is ignored."""
+        save_log_info_cache(self.log_path, self.log_info)
+        with patch("gentoo_update.cache.CACHE_VERSION", 0):
+            self.assertIsNone(load_cached_log_info(self.log_path))
+        self.assertTrue(path.exists(get_cache_path(self.log_path)))
+
+    def test_pretend_plan_round_trip(self):
+        """Test if the saved plan of a check run is loaded back."""
+        self.assertIsNone(load_pretend_plan(self.tmp_dir.name))
+        plan = Parser(self.log_path).extract_pretend_plan()
+        save_pretend_plan(self.tmp_dir.name, self.log_path, plan)
+        cached_plan = load_pretend_plan(self.tmp_dir.name)
+        self.assertEqual(cached_plan, plan)
+        self.assertEqual(cached_plan.packages[0].size_kib, plan.packages[0].size_kib)
+
+
+if __name__ == "__main__":
+    unittest.main()
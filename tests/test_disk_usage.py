@@ -0,0 +1,71 @@
+"""Unit tests for disk_usage.py file."""
+
+import tempfile
+import unittest
+from os import path
+
+from gentoo_update.disk_usage import (
+    check_free_space,
+    get_disk_usage,
+    read_mount_points,
+)
+from gentoo_update.report_objects import DiskUsageStats
+
+MOUNTINFO = """\
+23 28 0:22 / /proc rw,relatime - proc proc rw
+28 1 254:0 / / rw,relatime - ext4 /dev/vda rw
+29 28 254:16 / /mnt/ro ro,relatime - ext4 /dev/vdb ro
+30 28 254:0 /home /home rw,relatime - ext4 /dev/vda rw
+31 28 254:32 / /mnt/my\\040disk rw,relatime - xfs /dev/vdc rw
+32 28 0:40 / /tmp rw,relatime - tmpfs tmpfs rw
+33 28 254:48 / /boot/efi rw,relatime - vfat /dev/vdd1 rw
+34 28 0:41 / /tank rw,relatime - zfs tank rw
+"""
+FILESYSTEMS = "nodev\tproc\nnodev\ttmpfs\n\text4\nnodev\tzfs\n\txfs\n\tvfat\n"
+
+
+class TestDiskUsage(unittest.TestCase):
+    """Unit tests for the native disk usage collector."""
+
+    def test_read_mount_points(self):
+        """Test if only writable disk backed mounts are measured once."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            mountinfo = path.join(tmp_dir, "mountinfo")
+            filesystems = path.join(tmp_dir, "filesystems")
+            with open(mountinfo, "w", encoding="utf-8") as mountinfo_file:
+                mountinfo_file.write(MOUNTINFO)
+            with open(filesystems, "w", encoding="utf-8") as filesystems_file:
+                filesystems_file.write(FILESYSTEMS)
+
+            self.assertEqual(
+                read_mount_points(mountinfo, filesystems),
+                ["/", "/mnt/my disk", "/tank"],
+            )
+            self.assertEqual(
+                read_mount_points(path.join(tmp_dir, "missing"), filesystems), ["/"]
+            )
+
+    def test_log_line(self):
+        """Test if byte counts survive a round trip through the log."""
+        stats = get_disk_usage("/")
+        self.assertGreaterEqual(stats.total_bytes, stats.used_bytes + stats.free_bytes)
+        self.assertEqual(DiskUsageStats.from_log_line(stats.to_log_line()), stats)
+
+        old_line = (
+            "Disk usage for / ===> Total=453G, Used=177G, Free=253G, Percent used=42%"
+        )
+        old_stats = DiskUsageStats.from_log_line(old_line)
+        self.assertEqual(old_stats.used, "177G")
+        self.assertIsNone(old_stats.used_bytes)
+        self.assertEqual(old_stats.to_log_line(), old_line)
+
+    def test_check_free_space(self):
+        """Test if the free space limit fails the stage."""
+        lines = []
+        self.assertEqual(check_free_space(0, lines.append), 0)
+        self.assertEqual(check_free_space(1024**3, lines.append), 1)
+        self.assertEqual(lines[2], "There is no sufficient free space.")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+"""Unit tests for elogs.py file."""
+
+import os
+import tempfile
+import time
+import unittest
+from os import path
+
+from gentoo_update import elogs
+from gentoo_update.elogs import (
+    ElogCollector,
+    get_elog_package,
+    log_elogs,
+    scan_elogs,
+)
+
+ELOG = """\
+INFO: setup
+Package:    dev-libs/openssl-3.0.11:0/3
+Repository: gentoo
+USE:        amd64 asm elibc_glibc
+
+WARN: postinst
+Please rebuild packages that link to openssl.
+"""
+
+
+class TestElogs(unittest.TestCase):
+    """Unit tests for the native elog scanner."""
+
+    def setUp(self):
+        """Create an elog directory with old and new elogs."""
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.elog_dir = self.tmp_dir.name
+        self.since = time.time() - 60
+
+        self.write_elog("dev-libs:openssl-3.0.11:20231012-101010.log", ELOG)
+        self.write_elog("sys-apps:old-1.0:20201012-101010.log", "old\n", 1000)
+        os.mkdir(path.join(self.elog_dir, "www-client"))
+        self.write_elog("www-client/firefox-bin-118.0.2:20231012-101011.log", "x\n")
+        self.write_elog("summary.log", "summary\n")
+
+    def write_elog(self, name: str, content: str, age: int = 0) -> None:
+        """Write an elog file that was modified age seconds before setUp."""
+        elog_path = path.join(self.elog_dir, name)
+        with open(elog_path, "w", encoding="utf-8") as elog_file:
+            elog_file.write(content)
+        modified = self.since + 1 - age
+        os.utime(elog_path, (modified, modified))
+
+    def test_get_elog_package(self):
+        """Test if packages are found in flat and split elog names."""
+        self.assertEqual(
+            get_elog_package("/elog/dev-libs:openssl-3.0.11:20231012-101010.log"),
+            "dev-libs/openssl",
+        )
+        self.assertEqual(
+            get_elog_package("/elog/www-client/firefox-bin-118.0.2:20231012-1.log"),
+            "www-client/firefox-bin",
+        )
+        self.assertIsNone(get_elog_package("/elog/summary.log"))
+
+    def test_scan_elogs(self):
+        """Test if only elogs modified since the update started are found."""
+        names = sorted(entry.name for entry in scan_elogs(self.since, self.elog_dir))
+        self.assertEqual(
+            names,
+            [
+                "dev-libs:openssl-3.0.11:20231012-101010.log",
+                "firefox-bin-118.0.2:20231012-101011.log",
+                "summary.log",
+            ],
+        )
+
+    def test_log_elogs(self):
+        """Test if logged elogs are parsed back with packages and size caps."""
+        original_max_bytes = elogs.MAX_ELOG_BYTES
+        elogs.MAX_ELOG_BYTES = 64
+        self.addCleanup(setattr, elogs, "MAX_ELOG_BYTES", original_max_bytes)
+
+        collector = ElogCollector()
+        self.assertEqual(log_elogs(self.since, collector.feed, self.elog_dir), 0)
+        entries = {elog.package_name: elog for elog in collector.elogs}
+        self.assertEqual(
+            set(entries), {"dev-libs/openssl", "www-client/firefox-bin", None}
+        )
+        openssl = entries["dev-libs/openssl"]
+        self.assertEqual(openssl.messages[0], "INFO: setup")
+        self.assertEqual(
+            openssl.truncated_bytes,
+            len(ELOG.encode()) - sum(len(line) + 1 for line in openssl.messages),
+        )
+        self.assertEqual(entries["www-client/firefox-bin"].messages, ["x"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+"""Unit tests for estimator.py file."""
+
+import os
+import tempfile
+import unittest
+from os import path
+
+from gentoo_update import estimator
+from gentoo_update.estimator import MergeDurationIndex, iter_lines_backwards
+from gentoo_update.report_objects import PackageInfo, UpdateEstimate
+
+
+def merge_lines(package: str, started: int, duration: int) -> str:
+    """Create emerge.log lines of one merge."""
+    return (
+        f"{started}:  >>> emerge (1 of 1) {package}::gentoo to /\n"
+        f"{started + 1}:  === (1 of 1) Compiling/Merging ({package}::gentoo)\n"
+        f"{started + duration}:  ::: completed emerge (1 of 1) {package}::gentoo to /\n"
+    )
+
+
+class TestEstimator(unittest.TestCase):
+    """Unit tests for MergeDurationIndex."""
+
+    def setUp(self):
+        """Create a log directory with a fake emerge.log."""
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.emerge_log = path.join(self.tmp_dir.name, "emerge.log")
+        self.write_log(
+            merge_lines("dev-libs/openssl-3.0.10", 1000, 300)
+            + merge_lines("sys-devel/gcc-13.2.1_p20230826", 2000, 3600)
+            + merge_lines("dev-libs/openssl-3.0.11", 9000, 500),
+            "w",
+        )
+
+    def write_log(self, content: str, mode: str = "a") -> None:
+        """Write lines to the fake emerge.log."""
+        with open(self.emerge_log, mode, encoding="utf-8") as emerge_log:
+            emerge_log.write(content)
+
+    def test_iter_lines_backwards(self):
+        """Test if lines are read newest first across chunk borders."""
+        lines = [f"line {number}".encode() for number in range(1000)]
+        self.write_log("\n".join(line.decode() for line in lines) + "\n", "w")
+        size = os.path.getsize(self.emerge_log)
+        original_chunk_size = estimator.READ_CHUNK_SIZE
+        estimator.READ_CHUNK_SIZE = 7
+        self.addCleanup(setattr, estimator, "READ_CHUNK_SIZE", original_chunk_size)
+
+        self.assertEqual(
+            list(iter_lines_backwards(self.emerge_log, 0, size)), lines[::-1]
+        )
+        self.assertEqual(
+            list(iter_lines_backwards(self.emerge_log, 3, size, True)),
+            lines[:0:-1],
+        )
+
+    def test_refresh(self):
+        """Test if durations are indexed and only new merges are read later."""
+        index = MergeDurationIndex(self.tmp_dir.name, self.emerge_log)
+        self.assertTrue(index.refresh())
+        self.assertEqual(index.durations["dev-libs/openssl"], [500, 300])
+        self.assertEqual(index.get_duration("dev-libs/openssl"), 400)
+        index.save()
+
+        index = MergeDurationIndex(self.tmp_dir.name, self.emerge_log)
+        self.assertFalse(index.refresh())
+        self.write_log(merge_lines("dev-libs/openssl-3.0.12", 20000, 100))
+        self.assertTrue(index.refresh())
+        self.assertEqual(index.durations["dev-libs/openssl"], [100, 500, 300])
+
+    def test_rebuild_after_truncate(self):
+        """Test if the index is rebuilt when emerge.log was truncated."""
+        index = MergeDurationIndex(self.tmp_dir.name, self.emerge_log)
+        index.refresh()
+        self.write_log(merge_lines("app-misc/foo-1.0", 30000, 60), "w")
+        self.assertTrue(index.refresh())
+        self.assertEqual(index.durations, {"app-misc/foo": [60]})
+
+    def test_estimate(self):
+        """Test if only ebuilds are estimated and unknown ones are counted."""
+        packages = [
+            PackageInfo("ebuild", "sys-devel/gcc", "13.2.1", None, "U", "gentoo"),
+            PackageInfo("ebuild", "app-misc/new", "1.0", None, "N", "gentoo"),
+            PackageInfo("blocks", "app-misc/blocked", None, None, "b", None),
+        ]
+        estimate = estimator.estimate_update(
+            self.tmp_dir.name, packages, self.emerge_log
+        )
+        self.assertEqual(estimate, UpdateEstimate(3600, 1, 1))
+        index_path = path.join(self.tmp_dir.name, "merge_durations.json")
+        self.assertTrue(path.isfile(index_path))
+        self.assertEqual(UpdateEstimate.from_log_line(estimate.to_log_line()), estimate)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,52 @@
+"""Unit tests for fetch.py file."""
+
+import os
+import tempfile
+import unittest
+from os import path
+
+from gentoo_update.fetch import FetchWaitTimer, get_fetched_bytes, read_distfiles
+from gentoo_update.report_objects import FetchStats
+
+
+class TestFetch(unittest.TestCase):
+    """Unit tests for fetched distfiles and the time the merge waits on fetch."""
+
+    def test_fetched_bytes(self):
+        """Test if only added and changed distfiles are counted."""
+        with tempfile.TemporaryDirectory() as distdir:
+            for name, size in (("old.tar.gz", 100), ("changed.tar.xz", 200)):
+                with open(path.join(distdir, name), "wb") as distfile:
+                    distfile.write(b"x" * size)
+            before = read_distfiles(distdir)
+
+            with open(path.join(distdir, "changed.tar.xz"), "ab") as distfile:
+                distfile.write(b"x" * 50)
+            for name in ("new.tar.gz", "partial.tar.gz.__download__"):
+                with open(path.join(distdir, name), "wb") as distfile:
+                    distfile.write(b"x" * 1000)
+            os.mkdir(path.join(distdir, ".locks"))
+            self.assertEqual(get_fetched_bytes(before, read_distfiles(distdir)), 1250)
+        self.assertEqual(read_distfiles(distdir), {})
+
+    def test_wait_timer(self):
+        """Test waits for own downloads and for distfiles locked by the prefetch."""
+        timer = FetchWaitTimer()
+        timer.feed(">>> Emerging (1 of 2) dev-libs/openssl-3.0.11::gentoo", 0)
+        timer.feed(">>> Downloading 'https://example.org/openssl.tar.gz'", 1)
+        timer.feed("Saving to: 'openssl.tar.gz'", 2)
+        timer.feed(" * openssl.tar.gz BLAKE2B SHA512 size ;-) ...   [ ok ]", 4)
+        timer.feed(">>> Emerging (2 of 2) dev-libs/foo-1.0::gentoo", 10)
+        timer.feed(" * waiting for lock on foo.tar.gz.portage_lockfile ...  [ ok ]", 12)
+        timer.feed(">>> Downloading 'https://example.org/bar.tar.gz'", 20)
+        self.assertEqual(timer.finish(21), 6)
+
+    def test_fetch_stats_log_line(self):
+        """Test if prefetch stats are read back from their log line."""
+        fetch = FetchStats(15486976, 12.3, 1.2)
+        self.assertEqual(FetchStats.from_log_line(fetch.to_log_line()), fetch)
+        self.assertIsNone(FetchStats.from_log_line("Prefetch: nothing"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,88 @@
+"""Unit tests for follower.py file."""
+
+import tempfile
+import unittest
+from os import path
+
+from gentoo_update.follower import IncrementalParser, LogFollower, PollingWatcher
+from gentoo_update.parser import Parser
+
+LOGS_FOR_TESTS = path.join(path.dirname(path.abspath(__file__)), "logs_for_unit_tests")
+LOG_PATH = path.join(LOGS_FOR_TESTS, "log_2023-10-12-10-58")
+
+
+class TestFollower(unittest.TestCase):
+    """Unit tests for the incremental parser and follow mode."""
+
+    def test_incremental_parser_matches_parser(self):
+        """Test if feeding small chunks gives the same result as Parser."""
+        with open(LOG_PATH, "rb") as log_file:
+            data = log_file.read()
+
+        parser = IncrementalParser(LOG_PATH)
+        completed = []
+        for start in range(0, len(data), 1000):
+            completed += parser.feed(data[start : start + 1000])
+
+        self.assertTrue(parser.finished)
+        self.assertEqual(
+            completed,
+            [
+                "calculate_disk_usage_1",
+                "pretend_emerge",
+                "update_system",
+                "read_elogs",
+                "calculate_disk_usage_2",
+            ],
+        )
+        self.assertEqual(
+            parser.extract_info_for_report(),
+            Parser(LOG_PATH).extract_info_for_report(),
+        )
+
+    def test_only_the_runner_error_ends_the_follow(self):
+        """Test if output that mentions an error code does not end the follow."""
+        parser = IncrementalParser(LOG_PATH)
+        parser.feed(
+            b"[12-Oct-23 10:58:59 INFO] ::: [fetch] Prefetch exited with error "
+            b"code 1 in stage update\n"
+        )
+        self.assertFalse(parser.finished)
+        parser.feed(
+            b"[12-Oct-23 10:59:00 ERROR] ::: stage engine exited with error code 1 "
+            b"in stage update\n"
+        )
+        self.assertTrue(parser.finished)
+
+    def test_follow_reads_only_appended_data(self):
+        """Test if the follower reports progress and reads only new bytes."""
+        with open(LOG_PATH, encoding="utf-8") as log_file:
+            lines = log_file.readlines()
+        update_index = next(
+            i for i, line in enumerate(lines) if "UPDATE SYSTEM" in line
+        )
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            log_path = path.join(tmp_dir, "log_2023-10-12-10-58")
+            with open(log_path, "w", encoding="utf-8") as log_file:
+                log_file.writelines(lines[: update_index + 3])
+
+            follower = LogFollower(log_path)
+            follower.read_new_data()
+            report = follower.render()
+            self.assertEqual(report[2], "emerge pretend status: SUCCESS")
+            self.assertEqual(report[3], "update is in progress: update_system")
+            first_position = follower.position
+
+            with open(log_path, "a", encoding="utf-8") as log_file:
+                log_file.writelines(lines[update_index + 3 :])
+            follower.follow(watcher=PollingWatcher(log_path, 0.01))
+
+        self.assertTrue(follower.parser.finished)
+        self.assertEqual(follower.position, path.getsize(LOG_PATH))
+        self.assertGreater(first_position, 0)
+        self.assertEqual(follower.render()[2], "update status: SUCCESS")
+
+
+if __name__ == "__main__":
+    unittest.main()
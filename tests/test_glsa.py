@@ -0,0 +1,150 @@
+"""Unit tests for glsa.py file."""
+
+import os
+import tempfile
+import unittest
+from os import path
+
+from gentoo_update.glsa import (
+    CACHE_FILENAME,
+    GlsaRange,
+    get_affected_packages,
+    matches_range,
+    scan_affected_packages,
+)
+
+GLSA_TEMPLATE = """<?xml version="1.0" encoding="UTF-8"?>
+<glsa id="{glsa_id}">
+  <title>{title}</title>
+  <affected>
+    <package name="{package_name}" auto="yes" arch="{arch}">
+      {ranges}
+    </package>
+  </affected>
+</glsa>
+"""
+GLSAS = {
+    "202310-01": (
+        "dev-libs/openssl",
+        "*",
+        '<unaffected range="ge">3.0.11</unaffected>'
+        '<vulnerable range="lt">3.0.11</vulnerable>',
+    ),
+    "202310-02": (
+        "sys-libs/zlib",
+        "*",
+        '<unaffected range="ge">1.2.13</unaffected>'
+        '<vulnerable range="lt">1.2.13</vulnerable>',
+    ),
+    "202310-03": (
+        "dev-lang/python",
+        "*",
+        '<unaffected range="ge" slot="3.11">3.11.5</unaffected>'
+        '<unaffected range="rge">3.10.12-r1</unaffected>'
+        '<vulnerable range="lt">3.11.5</vulnerable>',
+    ),
+    "202310-04": (
+        "net-misc/curl",
+        "ppc",
+        '<vulnerable range="lt">9.0</vulnerable>',
+    ),
+    "202310-05": (
+        "net-misc/wget",
+        "*",
+        '<vulnerable range="lt">9.0</vulnerable>',
+    ),
+}
+INSTALLED = {
+    "dev-libs/openssl-3.0.10": "0/3",
+    "sys-libs/zlib-1.3": "0/1",
+    "dev-lang/python-3.10.12-r2": "3.10",
+    "dev-lang/python-3.11.4": "3.11",
+    "net-misc/curl-8.4.0": "0",
+    "net-misc/wget-1.21": "0",
+}
+
+
+class TestGlsaScanner(unittest.TestCase):
+    """Unit tests for the GLSA scanner with a fake repository and vdb."""
+
+    def setUp(self):
+        """Create GLSA files, installed packages and an applied GLSA."""
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.repo_dir = path.join(self.tmp_dir.name, "repo")
+        self.glsa_dir = path.join(self.repo_dir, "metadata", "glsa")
+        os.makedirs(self.glsa_dir)
+        for glsa_id, (package_name, arch, ranges) in GLSAS.items():
+            self.write_glsa(glsa_id, package_name, arch, ranges)
+        with open(
+            path.join(self.repo_dir, "metadata", "timestamp.chk"), "w", encoding="utf-8"
+        ) as timestamp:
+            timestamp.write("Sun, 15 Oct 2023 00:30:01 +0000\n")
+
+        self.vdb_dir = path.join(self.tmp_dir.name, "pkg")
+        for atom, slot in INSTALLED.items():
+            vdb_entry = path.join(self.vdb_dir, atom)
+            os.makedirs(vdb_entry)
+            with open(path.join(vdb_entry, "SLOT"), "w", encoding="utf-8") as slot_file:
+                slot_file.write(f"{slot}\n")
+
+        self.injected_file = path.join(self.tmp_dir.name, "glsa_injected")
+        with open(self.injected_file, "w", encoding="utf-8") as injected:
+            injected.write("202310-05\n")
+
+    def write_glsa(self, glsa_id: str, package_name: str, arch: str, ranges: str):
+        """Write one GLSA XML file."""
+        with open(
+            path.join(self.glsa_dir, f"glsa-{glsa_id}.xml"), "w", encoding="utf-8"
+        ) as glsa_file:
+            glsa_file.write(
+                GLSA_TEMPLATE.format(
+                    glsa_id=glsa_id,
+                    title=f"{package_name}: Vulnerability",
+                    package_name=package_name,
+                    arch=arch,
+                    ranges=ranges,
+                )
+            )
+
+    def test_scan_affected_packages(self):
+        """Test if only vulnerable packages of this arch are found."""
+        affected = scan_affected_packages(
+            self.repo_dir, self.vdb_dir, self.injected_file, "amd64"
+        )
+        self.assertEqual(affected, ["dev-libs/openssl", "dev-lang/python"])
+
+    def test_matches_range(self):
+        """Test revision ranges and wildcard versions."""
+        vdb_entry = path.join(self.vdb_dir, "dev-lang/python-3.10.12-r2")
+        revision_range = GlsaRange("rge", "3.10.12")
+        self.assertTrue(matches_range("3.10.12-r2", vdb_entry, revision_range))
+        self.assertFalse(matches_range("3.10.13", vdb_entry, revision_range))
+        wildcard_range = GlsaRange("eq", "3.10*")
+        self.assertTrue(matches_range("3.10.12-r2", vdb_entry, wildcard_range))
+        slot_range = GlsaRange("lt", "4", "3.11")
+        self.assertFalse(matches_range("3.10.12-r2", vdb_entry, slot_range))
+
+    def test_cache(self):
+        """Test if the cached result is used until the tree is synced."""
+        cache_dir = path.join(self.tmp_dir.name, "logs")
+        os.mkdir(cache_dir)
+        arguments = (cache_dir, self.repo_dir, self.vdb_dir, self.injected_file)
+        first = get_affected_packages(*arguments)
+        self.assertIn("dev-libs/openssl", first)
+        self.assertTrue(path.exists(path.join(cache_dir, CACHE_FILENAME)))
+
+        self.write_glsa(
+            "202310-06", "sys-libs/zlib", "*", '<vulnerable range="le">1.3</vulnerable>'
+        )
+        self.assertEqual(get_affected_packages(*arguments), first)
+
+        with open(
+            path.join(self.repo_dir, "metadata", "timestamp.chk"), "w", encoding="utf-8"
+        ) as timestamp:
+            timestamp.write("Mon, 16 Oct 2023 00:30:01 +0000\n")
+        self.assertIn("sys-libs/zlib", get_affected_packages(*arguments))
+
+
+if __name__ == "__main__":
+    unittest.main()
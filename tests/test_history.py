@@ -0,0 +1,45 @@
+"""Unit tests for history.py file."""
+
+import shutil
+import tempfile
+import unittest
+from os import path
+
+from gentoo_update.gentoo_update import get_available_log_files
+from gentoo_update.history import HistoryReporter, iter_log_history
+from gentoo_update.parser import Parser
+
+LOGS_FOR_TESTS = path.join(path.dirname(path.abspath(__file__)), "logs_for_unit_tests")
+
+
+class TestHistory(unittest.TestCase):
+    """Unit tests for the history report."""
+
+    def test_history_report(self):
+        """Test if runs are reported in order and aggregated."""
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        logs_dir = path.join(tmp_dir.name, "logs")
+        shutil.copytree(LOGS_FOR_TESTS, logs_dir)
+
+        logs = get_available_log_files(logs_dir, 2)
+        history = HistoryReporter()
+        for log, log_info in iter_log_history(logs_dir, logs, max_workers=2):
+            expected = Parser(path.join(logs_dir, log)).extract_info_for_report()
+            self.assertEqual(log_info, expected)
+            history.add_run(log, log_info)
+
+        report = history.create_report()
+        self.assertEqual(
+            report[1],
+            "log_2023-10-12-10-58: SUCCESS, 4 packages (4 updated), / +0B",
+        )
+        self.assertTrue(report[2].startswith("log_2023-12-30-21-06: SUCCESS"))
+        self.assertIn("Runs: 2 (2 successful, 0 failed, 0 incomplete)", report)
+        self.assertIn("--- / +3.0G", report)
+        self.assertIn("--- major: 7", report)
+        self.assertIn("--- dev-libs/openssl 2", report)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,128 @@
+"""Unit tests for log_files.py file."""
+
+import gzip
+import os
+import shutil
+import tempfile
+import unittest
+from os import path
+from unittest import mock
+
+from gentoo_update.cache import load_log_info
+from gentoo_update.gentoo_update import get_available_log_files, get_last_log_filename
+from gentoo_update.history import iter_log_history
+from gentoo_update.log_files import is_log_file, open_log, prune_logs
+from gentoo_update.parser import Parser
+
+LOGS_FOR_TESTS = path.join(path.dirname(path.abspath(__file__)), "logs_for_unit_tests")
+
+
+class TestLogFiles(unittest.TestCase):
+    """Unit tests for compressed logs and log retention."""
+
+    def setUp(self):
+        """Create a temporary log directory."""
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.log_dir = self.tmp_dir.name
+
+    def test_is_log_file(self):
+        """Test if only update logs are recognized."""
+        self.assertTrue(is_log_file("log_2023-10-12-10-58"))
+        self.assertTrue(is_log_file("log_2023-10-12-10-58.gz"))
+        self.assertTrue(is_log_file("log_2023-10-12-10-58.zst"))
+        self.assertFalse(is_log_file("log_2023-10-12-10-58.idx"))
+        self.assertFalse(is_log_file("log_2023-10-12-10-58.gz.cache.json"))
+        self.assertTrue(is_log_file("check_2023-10-12-10-58", "check"))
+        self.assertFalse(is_log_file("check_2023-10-12-10-58"))
+        self.assertFalse(is_log_file("log_2023-10-12-10-58", "check"))
+
+    def test_gzip_log_is_parsed(self):
+        """Test if a gzip log gives the same information as a plain log."""
+        plain_log = path.join(LOGS_FOR_TESTS, "log_2023-12-30-21-06")
+        gzip_log = path.join(self.log_dir, "log_2023-12-30-21-06.gz")
+        with open(plain_log, "rb") as source, gzip.open(gzip_log, "wb") as target:
+            shutil.copyfileobj(source, target)
+
+        plain_info = Parser(plain_log).extract_info_for_report()
+        for mode in ["full", "stream", "index"]:
+            gzip_info = Parser(gzip_log, mode=mode).extract_info_for_report()
+            self.assertEqual(gzip_info, plain_info)
+        self.assertEqual(
+            get_available_log_files(self.log_dir, 1), [path.basename(gzip_log)]
+        )
+        self.assertEqual(get_last_log_filename(self.log_dir), gzip_log)
+
+    def test_truncated_gzip_log(self):
+        """Test if a gzip log cut short by an interrupted run gives a clear error."""
+        plain_log = path.join(LOGS_FOR_TESTS, "log_2023-12-30-21-06")
+        gzip_log = path.join(self.log_dir, "log_2023-12-30-21-06.gz")
+        with open(plain_log, "rb") as source:
+            compressed = gzip.compress(source.read())
+        with open(gzip_log, "wb") as target:
+            target.write(compressed[: len(compressed) // 2])
+
+        with self.assertRaisesRegex(OSError, "truncated or damaged"):
+            load_log_info(gzip_log)
+        self.assertEqual(
+            list(iter_log_history(self.log_dir, [path.basename(gzip_log)])),
+            [(path.basename(gzip_log), None)],
+        )
+
+    def test_gzip_log_append(self):
+        """Test if appending to a gzip log keeps earlier lines."""
+        gzip_log = path.join(self.log_dir, "log_2024-01-01-00-00.gz")
+        for line in ["first", "second"]:
+            with open_log(gzip_log, "a") as log_file:
+                log_file.write(f"{line}\n")
+        with open_log(gzip_log) as log_file:
+            self.assertEqual(log_file.read(), "first\nsecond\n")
+
+    def test_prune_logs(self):
+        """Test if the oldest logs and their sidecars are removed."""
+        for day in range(1, 6):
+            log = path.join(self.log_dir, f"log_2024-01-0{day}-00-00")
+            with open(log, "w", encoding="utf-8") as log_file:
+                log_file.write("x" * 100)
+            with open(f"{log}.idx", "w", encoding="utf-8") as index_file:
+                index_file.write("{}")
+
+        removed = prune_logs(self.log_dir, max_logs=3, keep=["log_2024-01-01-00-00"])
+        self.assertEqual(removed, ["log_2024-01-02-00-00", "log_2024-01-03-00-00"])
+
+        removed = prune_logs(self.log_dir, max_total_size=250)
+        self.assertEqual(removed, ["log_2024-01-01-00-00"])
+        self.assertEqual(
+            sorted(os.listdir(self.log_dir)),
+            [
+                "log_2024-01-04-00-00",
+                "log_2024-01-04-00-00.idx",
+                "log_2024-01-05-00-00",
+                "log_2024-01-05-00-00.idx",
+            ],
+        )
+
+    def test_prune_logs_counts_sidecars(self):
+        """Test if sidecars count towards the size limit and may vanish."""
+        for day in range(1, 4):
+            log = path.join(self.log_dir, f"log_2024-01-0{day}-00-00.gz")
+            with open(log, "w", encoding="utf-8") as log_file:
+                log_file.write("x" * 10)
+            with open(f"{log}.cache.json", "w", encoding="utf-8") as cache_file:
+                cache_file.write("x" * 100)
+
+        remove = os.remove
+
+        def remove_replaced_cache(file_path):
+            remove(file_path)
+            if file_path.endswith(".cache.json"):
+                raise FileNotFoundError(file_path)
+
+        with mock.patch("os.remove", remove_replaced_cache):
+            removed = prune_logs(self.log_dir, max_total_size=250)
+        self.assertEqual(removed, ["log_2024-01-01-00-00.gz"])
+        self.assertEqual(len(os.listdir(self.log_dir)), 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
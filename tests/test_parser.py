@@ -0,0 +1,158 @@
+"""Unit tests for parser.py file."""
+
+import logging
+import os
+import shutil
+import tempfile
+import tracemalloc
+import unittest
+from os import path
+
+from gentoo_update.log_index import (
+    SectionIndexHandler,
+    build_section_index,
+    get_index_path,
+    load_section_index,
+    save_section_index,
+)
+from gentoo_update.parser import Parser
+
+LOGS_FOR_TESTS = path.join(path.dirname(path.abspath(__file__)), "logs_for_unit_tests")
+LOG_PREFIX = "[12-Oct-23 10:58:52 INFO] ::: "
+
+
+def write_large_log(log_path: str, noise_lines: int) -> None:
+    """Write a log with a huge sync section and small report sections."""
+    small_log_path = path.join(LOGS_FOR_TESTS, "log_2023-10-12-10-58")
+    with open(small_log_path, encoding="utf-8") as small_log:
+        lines = small_log.readlines()
+    sync_index = next(i for i, line in enumerate(lines) if "SYNC PORTAGE TREE" in line)
+
+    with open(log_path, "w", encoding="utf-8") as large_log:
+        large_log.writelines(lines[: sync_index + 1])
+        for number in range(noise_lines):
+            large_log.write(f"{LOG_PREFIX}>>> Syncing noise line number {number:08d}\n")
+        large_log.writelines(lines[sync_index + 1 :])
+
+
+class TestParser(unittest.TestCase):
+    """Unit tests for the Parser class."""
+
+    def test_stream_mode_matches_full_mode(self):
+        """Test if both parser modes produce the same information."""
+        for log_filename in sorted(os.listdir(LOGS_FOR_TESTS)):
+            log_path = path.join(LOGS_FOR_TESTS, log_filename)
+            full_info = Parser(log_path).extract_info_for_report()
+            stream_info = Parser(log_path, mode="stream").extract_info_for_report()
+            self.assertEqual(full_info, stream_info)
+
+    def test_stream_mode_does_not_keep_log_data(self):
+        """Test if stream mode does not read the log at initialization."""
+        log_path = path.join(LOGS_FOR_TESTS, "log_2023-10-12-10-58")
+        self.assertEqual(Parser(log_path, mode="stream").log_data, {})
+
+    def test_unsupported_mode(self):
+        """Test if an unknown parser mode is rejected."""
+        with self.assertRaises(ValueError):
+            Parser("log_file", mode="unknown")
+
+    def test_stream_mode_peak_memory(self):
+        """Test if peak memory does not depend on the size of skipped sections."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            log_path = path.join(tmp_dir, "log_large")
+            write_large_log(log_path, 200_000)
+            self.assertGreater(path.getsize(log_path), 10 * 1024 * 1024)
+
+            tracemalloc.start()
+            try:
+                info = Parser(log_path, mode="stream").extract_info_for_report()
+                _, peak = tracemalloc.get_traced_memory()
+            finally:
+                tracemalloc.stop()
+
+        self.assertTrue(info.update_system.update_status)
+        self.assertLess(peak, 1024 * 1024)
+
+
+class TestSectionIndex(unittest.TestCase):
+    """Unit tests for the section index and Parser's index mode."""
+
+    def setUp(self):
+        """Copy test logs to a temporary directory."""
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.logs_dir = path.join(self.tmp_dir.name, "logs")
+        shutil.copytree(LOGS_FOR_TESTS, self.logs_dir)
+
+    def test_pretend_plan(self):
+        """Test if packages and download size are parsed from the pretend section."""
+        log_path = path.join(LOGS_FOR_TESTS, "log_2023-12-30-21-06")
+        plan = Parser(log_path, mode="stream").extract_pretend_plan()
+        self.assertEqual(plan, Parser(log_path).extract_pretend_plan())
+        self.assertEqual(len(plan.packages), 124)
+        self.assertEqual((plan.updated, plan.new, plan.reemerged), (95, 16, 12))
+        self.assertEqual(plan.download_size_kib, 1756159)
+
+        section = [
+            "[ebuild     U  ] dev-libs/openssl-3.0.11:0/3::gentoo "
+            "[3.0.10:0/3::gentoo] 15,123 KiB",
+            "[ebuild  N     ] acct-group/pipewire-0-r1::gentoo 0 KiB",
+        ]
+        plan = Parser(log_path, mode="stream").parse_pretend_plan(section)
+        self.assertEqual((plan.updated, plan.new), (1, 1))
+        self.assertEqual(plan.download_size_kib, 15123)
+
+    def test_index_mode_matches_full_mode(self):
+        """Test if index mode builds a missing index and parses the same info."""
+        for log_filename in sorted(os.listdir(self.logs_dir)):
+            log_path = path.join(self.logs_dir, log_filename)
+            full_info = Parser(log_path).extract_info_for_report()
+            index_info = Parser(log_path, mode="index").extract_info_for_report()
+            self.assertEqual(full_info, index_info)
+            index = load_section_index(log_path)
+            self.assertEqual(index, build_section_index(log_path))
+
+    def test_outdated_index_is_rebuilt(self):
+        """Test if an index with wrong offsets is replaced."""
+        log_path = path.join(self.logs_dir, "log_2023-10-12-10-58")
+        with open(get_index_path(log_path), "w", encoding="utf-8") as index_file:
+            index_file.write('{"version": 1, "sections": [["update_system", 10]]}')
+        full_info = Parser(log_path).extract_info_for_report()
+        index_info = Parser(log_path, mode="index").extract_info_for_report()
+        self.assertEqual(full_info, index_info)
+
+    def test_incomplete_index_is_completed(self):
+        """Test if sections after the last indexed one are not dropped."""
+        log_path = path.join(self.logs_dir, "log_2023-10-12-10-58")
+        sections = build_section_index(log_path)
+        save_section_index(log_path, sections[:2])
+        full_info = Parser(log_path).extract_info_for_report()
+        index_info = Parser(log_path, mode="index").extract_info_for_report()
+        self.assertEqual(full_info, index_info)
+        self.assertEqual(load_section_index(log_path), sections)
+
+    def test_handler_records_section_offsets(self):
+        """Test if SectionIndexHandler writes offsets of section markers."""
+        log_path = path.join(self.tmp_dir.name, "log_handler")
+        handler = SectionIndexHandler(log_path)
+        handler.setFormatter(logging.Formatter("[%(levelname)s] ::: %(message)s"))
+        logger = logging.getLogger("test_handler_records_section_offsets")
+        logger.propagate = False
+        logger.setLevel(logging.INFO)
+        logger.addHandler(handler)
+        try:
+            for line in ["start", "{{ PRETEND EMERGE }}", "", "{{ UPDATE SYSTEM }}"]:
+                logger.info(line)
+        finally:
+            logger.removeHandler(handler)
+            handler.close()
+
+        self.assertEqual(
+            load_section_index(log_path),
+            [("pretend_emerge", 17), ("update_system", 61)],
+        )
+        self.assertEqual(load_section_index(log_path), build_section_index(log_path))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+"""Unit tests for parser_package.py file."""
+
+import unittest
+
+from gentoo_update.parser_package import PackageParser, tokenize_package_line
+
+EBUILD_LINE = (
+    '[ebuild     U  ] dev-python/setuptools-69.0.2-r1::gentoo [68.2.2-r1::gentoo] '
+    'USE="-test" PYTHON_TARGETS="python3_11 (-pypy3) -python3_10" 2,175 KiB'
+)
+BLOCKS_LINE = (
+    "[blocks b      ] <perl-core/Compress-Raw-Zlib-2.204.1_rc "
+    '("<perl-core/Compress-Raw-Zlib-2.204.1_rc" is soft blocking '
+    "virtual/perl-Compress-Raw-Zlib-2.204.1_rc)"
+)
+
+
+class TestPackageParser(unittest.TestCase):
+    """Unit tests for the package line tokenizer and PackageParser."""
+
+    def test_tokenize_ebuild_line(self):
+        """Test if tokens, attributes and size are found in one pass."""
+        package_tokens = tokenize_package_line(EBUILD_LINE)
+        self.assertEqual(package_tokens.package_type, "ebuild")
+        self.assertEqual(
+            package_tokens.tokens,
+            [
+                "[ebuild     U  ]",
+                "dev-python/setuptools-69.0.2-r1::gentoo",
+                "[68.2.2-r1::gentoo]",
+                'USE="-test"',
+                'PYTHON_TARGETS="python3_11 (-pypy3) -python3_10"',
+                "2,175",
+                "KiB",
+            ],
+        )
+        self.assertEqual(
+            package_tokens.attributes,
+            {
+                "USE": ["-test"],
+                "PYTHON_TARGETS": ["python3_11", "(-pypy3)", "-python3_10"],
+            },
+        )
+        self.assertEqual(package_tokens.size_kib, 2175)
+
+    def test_tokenize_blocks_line(self):
+        """Test if quoted text does not split tokens."""
+        package_tokens = tokenize_package_line(BLOCKS_LINE)
+        self.assertEqual(package_tokens.package_type, "blocks")
+        self.assertEqual(
+            package_tokens.tokens[2], '("<perl-core/Compress-Raw-Zlib-2.204.1_rc"'
+        )
+        self.assertIsNone(package_tokens.size_kib)
+
+    def test_tokenize_other_lines(self):
+        """Test if lines that are not package lines are skipped."""
+        for line in ["[ ok ]", " * Refreshing keys via WKD ... [ ok ]", ">>> Jobs: 0"]:
+            self.assertIsNone(tokenize_package_line(line))
+
+    def test_parse_update_details(self):
+        """Test if package lines are parsed into PackageInfo objects."""
+        packages = PackageParser().parse_update_details(
+            [EBUILD_LINE, BLOCKS_LINE, "[ ok ]"]
+        )
+        self.assertEqual(len(packages), 2)
+        self.assertEqual(packages[0].package_name, "dev-python/setuptools")
+        self.assertEqual(packages[0].new_version, "69.0.2-r1")
+        self.assertEqual(packages[0].old_version, "68.2.2-r1")
+        self.assertEqual(packages[0].USE, ["-test"])
+        self.assertEqual(
+            packages[1].blocked_package, "virtual/perl-Compress-Raw-Zlib-2.204.1_rc"
+        )
+
+    def test_parse_new_package(self):
+        """Test if a new package without an installed version has no old_version."""
+        packages = PackageParser().parse_update_details(
+            ['[ebuild  N     ] acct-group/pipewire-0-r1::gentoo  USE="-test" 0 KiB']
+        )
+        self.assertEqual(packages[0].package_name, "acct-group/pipewire")
+        self.assertEqual(packages[0].new_version, "0-r1")
+        self.assertIsNone(packages[0].old_version)
+
+
+if __name__ == "__main__":
+    unittest.main()
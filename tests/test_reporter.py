@@ -1,5 +1,7 @@
 """Unit tests for reporter.py file."""
 
+import shutil
+import tempfile
 import unittest
 from os import path
 
@@ -7,6 +9,7 @@ from gentoo_update.gentoo_update import (
     generate_report,
     get_available_log_files,
 )
+from gentoo_update.report_objects import DiskUsage, DiskUsageStats, StageStats
 from gentoo_update.reporter import Reporter
 from _report_packages_2 import report_2_packages
 
@@ -17,7 +20,10 @@ class TestGentooUpdate(unittest.TestCase):
     def setUp(self):
         """Initialize test prerequisites."""
         test_reporter_path = path.dirname(path.abspath(__file__))
-        logs_for_tests = f"{test_reporter_path}/logs_for_unit_tests"
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        logs_for_tests = f"{self.tmp_dir.name}/logs_for_unit_tests"
+        shutil.copytree(f"{test_reporter_path}/logs_for_unit_tests", logs_for_tests)
         log_1, log_2 = get_available_log_files(logs_for_tests, 2)
 
         self.report_object_1 = generate_report(logs_for_tests, log_1)
@@ -83,6 +89,61 @@ class TestGentooUpdate(unittest.TestCase):
         ]
         self.assertEqual(disk_usage, correct_disk_usage)
 
+    def test_disk_usage_bytes(self):
+        """Test if exact byte deltas are shown when the log has byte counts."""
+        self.report_object_1.info.disk_usage = DiskUsage(
+            [DiskUsageStats("/", "10.0G", "4.0G", "6.0G", "40%", 10, 4, 6)],
+            [DiskUsageStats("/", "10.0G", "4.0G", "6.0G", "40%", 10, 7, 3)],
+        )
+        report = self.report_object_1.create_report()
+        self.assertEqual(
+            report[-3:-1],
+            ["Free Space 6.0G => 6.0G (-3 B)", "Used Space 4.0G => 4.0G (+3 B)"],
+        )
+
+    def test_timeout_report(self):
+        """Test if a stage killed by a time limit is the failure reason."""
+        self.report_object_1.info.stages = [
+            StageStats("sync_tree", 124, 1800.2, timeout_reason="stall"),
+        ]
+        report = self.report_object_1.create_report()
+        self.assertEqual(
+            report[1:3],
+            [
+                "update status: FAIL",
+                "stage sync_tree stalled without output, killed after 1800 seconds",
+            ],
+        )
+        self.assertEqual(report[-1], "--- sync_tree 30m 00s, killed: stall")
+
+        self.report_object_1.short_report = True
+        self.assertEqual(
+            self.report_object_1.create_report(),
+            [
+                "update status: FAIL, stage sync_tree stalled without output, "
+                "killed after 1800 seconds"
+            ],
+        )
+
+    def test_timing(self):
+        """Test if stage stats are shown only when the log has them."""
+        self.assertNotIn("Timing:", self.report_1)
+
+        self.report_object_1.info.stages = [
+            StageStats("sync_tree", 0, 7.5, 1.25, 0.5, 2048, 0, 5 * 1024**2),
+            StageStats("update", 0, 3723.0),
+        ]
+        report = self.report_object_1.create_report()
+        self.assertEqual(
+            report[-3:],
+            [
+                "Timing:",
+                "--- sync_tree 7.5s, CPU user 1.2s sys 0.5s, max RSS 2.0M, "
+                "read 0B, written 5.0M",
+                "--- update 1h 02m 03s",
+            ],
+        )
+
 
 if __name__ == "__main__":
     unittest.main()
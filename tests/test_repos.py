@@ -0,0 +1,92 @@
+"""Unit tests for repos.py file."""
+
+import os
+import tempfile
+import time
+import unittest
+from email.utils import formatdate
+from os import path
+
+from gentoo_update.repos import RepoConfig, get_repo_age, read_repos_conf
+
+DEFAULT_REPOS_CONF = """[DEFAULT]
+main-repo = gentoo
+
+[gentoo]
+location = /var/db/repos/gentoo
+sync-type = rsync
+auto-sync = yes
+"""
+USER_REPOS_CONF = {
+    "eselect-repo.conf": """[guru]
+location = /var/db/repos/guru
+sync-type = git
+""",
+    "gentoo.conf": """[gentoo]
+location = /var/db/repos/gentoo
+sync-type = git
+""",
+    "local.conf": """[local]
+location = /var/db/repos/local
+""",
+    "manual.conf": """[manual]
+location = /var/db/repos/manual
+sync-type = git
+auto-sync = no
+""",
+    "gentoo.conf~": """[backup]
+location = /var/db/repos/backup
+sync-type = git
+""",
+}
+
+
+class TestRepos(unittest.TestCase):
+    """Unit tests for repositories that are synced and their age."""
+
+    def setUp(self):
+        """Create the default repos.conf and a repos.conf directory."""
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.default_conf = path.join(self.tmp_dir.name, "repos.conf.default")
+        with open(self.default_conf, "w", encoding="utf-8") as conf:
+            conf.write(DEFAULT_REPOS_CONF)
+        self.conf_dir = path.join(self.tmp_dir.name, "repos.conf")
+        os.mkdir(self.conf_dir)
+        for file_name, content in USER_REPOS_CONF.items():
+            conf_path = path.join(self.conf_dir, file_name)
+            with open(conf_path, "w", encoding="utf-8") as conf:
+                conf.write(content)
+
+    def test_read_repos_conf(self):
+        """Test overrides and repositories that emerge --sync skips."""
+        self.assertEqual(
+            read_repos_conf((self.default_conf, self.conf_dir)),
+            [
+                RepoConfig("gentoo", "/var/db/repos/gentoo", "git"),
+                RepoConfig("guru", "/var/db/repos/guru", "git"),
+            ],
+        )
+
+    def test_get_repo_age(self):
+        """Test the age from timestamp.chk and from the last git fetch."""
+        location = path.join(self.tmp_dir.name, "gentoo")
+        self.assertIsNone(get_repo_age(location))
+
+        os.makedirs(path.join(location, "metadata"))
+        now = time.time()
+        with open(
+            path.join(location, "metadata", "timestamp.chk"), "w", encoding="utf-8"
+        ) as timestamp:
+            timestamp.write(formatdate(now - 7200) + "\n")
+        self.assertAlmostEqual(get_repo_age(location, now), 7200, delta=1)
+
+        os.makedirs(path.join(location, ".git"))
+        fetch_head = path.join(location, ".git", "FETCH_HEAD")
+        open(fetch_head, "w", encoding="utf-8").close()
+        os.utime(fetch_head, (now - 60, now - 60))
+        self.assertAlmostEqual(get_repo_age(location, now), 60, delta=1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,144 @@
+"""Unit tests for scheduler.py file."""
+
+import logging
+import threading
+import time
+import unittest
+
+from gentoo_update.scheduler import StageOutputGrouper, StageScheduler
+from gentoo_update.shell_runner import PARALLEL_STAGES, STAGE_DEPENDENCIES
+
+
+class ListHandler(logging.Handler):
+    """Logging handler that keeps messages in a list."""
+
+    def __init__(self):
+        """Initialize ListHandler class."""
+        super().__init__()
+        self.messages = []
+
+    def emit(self, record):
+        """Keep the message of a record."""
+        self.messages.append(record.getMessage())
+
+
+class TestStageScheduler(unittest.TestCase):
+    """Unit tests for StageScheduler."""
+
+    def setUp(self):
+        """Create a stage function that records when stages run."""
+        self.lock = threading.Lock()
+        self.running = 0
+        self.max_running = 0
+        self.finished = []
+        self.exit_codes = {}
+
+    def run_stage(self, stage):
+        """Pretend to run a stage for a short time."""
+        with self.lock:
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        time.sleep(0.05)
+        with self.lock:
+            self.running -= 1
+            self.finished.append(stage)
+        return self.exit_codes.get(stage, 0)
+
+    def test_independent_stages_run_concurrently(self):
+        """Test if stages wait only for their dependencies."""
+        dependencies = {"a": [], "b": [], "c": ["a", "b"], "d": ["c"], "e": ["c"]}
+        result = StageScheduler(dependencies, 4).run("abcde", self.run_stage)
+        self.assertEqual(result, (None, 0))
+        self.assertEqual(self.max_running, 2)
+        self.assertEqual(set(self.finished[:2]), {"a", "b"})
+        self.assertEqual(self.finished[2], "c")
+        self.assertEqual(set(self.finished[3:]), {"d", "e"})
+
+    def test_system_changes_keep_their_order(self):
+        """Test if commands that change the system do not overlap."""
+        events = []
+
+        def run_stage(stage):
+            events.append(("start", stage))
+            exit_code = self.run_stage(stage)
+            events.append(("finish", stage))
+            return exit_code
+
+        stages = list(STAGE_DEPENDENCIES)
+        StageScheduler(STAGE_DEPENDENCIES, PARALLEL_STAGES).run(stages, run_stage)
+        for before, after in [
+            ("update", "config_update"),
+            ("config_update", "clean_up"),
+            ("clean_up", "get_logs"),
+            ("clean_up", "check_disk_usage_after_update"),
+        ]:
+            self.assertLess(
+                events.index(("finish", before)), events.index(("start", after))
+            )
+        self.assertGreater(self.max_running, 1)
+
+    def test_max_workers(self):
+        """Test if one worker runs stages one by one in the given order."""
+        dependencies = {"a": [], "b": [], "c": []}
+        StageScheduler(dependencies, 1).run(["c", "b", "a"], self.run_stage)
+        self.assertEqual(self.max_running, 1)
+        self.assertEqual(self.finished, ["c", "b", "a"])
+
+    def test_failed_stage_stops_scheduling(self):
+        """Test if stages are not started after a failure."""
+        self.exit_codes["b"] = 2
+        dependencies = {"a": [], "b": ["a"], "c": ["b"], "d": ["a"]}
+        result = StageScheduler(dependencies, 1).run("abcd", self.run_stage)
+        self.assertEqual(result, ("b", 2))
+        self.assertEqual(self.finished, ["a", "b"])
+
+    def test_unselected_dependencies_are_ignored(self):
+        """Test if a subset of stages runs without its dependencies."""
+        dependencies = {"a": [], "b": ["a"]}
+        result = StageScheduler(dependencies, 2).run(["b"], self.run_stage)
+        self.assertEqual(result, (None, 0))
+        self.assertEqual(self.finished, ["b"])
+
+    def test_cycle(self):
+        """Test if a dependency cycle is reported."""
+        dependencies = {"a": ["b"], "b": ["a"]}
+        with self.assertRaises(ValueError):
+            StageScheduler(dependencies, 2).run("ab", self.run_stage)
+
+
+class TestStageOutputGrouper(unittest.TestCase):
+    """Unit tests for StageOutputGrouper."""
+
+    def test_output_is_grouped_by_stage(self):
+        """Test if records of a waiting stage are written after the owner."""
+        logger = logging.getLogger("test_stage_output_grouper")
+        logger.propagate = False
+        handler = ListHandler()
+        logger.addHandler(handler)
+        self.addCleanup(logger.removeHandler, handler)
+
+        def record(message):
+            return logger.makeRecord(
+                logger.name, logging.INFO, "", 0, message, (), None
+            )
+
+        grouper = StageOutputGrouper(logger)
+        grouper.start("a")
+        grouper.start("b")
+        grouper.start("c")
+        grouper.handle("b", record("b1"))
+        grouper.handle("a", record("a1"))
+        grouper.handle("c", record("c1"))
+        self.assertEqual(handler.messages, ["a1"])
+
+        grouper.finish("b")
+        grouper.handle("a", record("a2"))
+        grouper.finish("a")
+        self.assertEqual(handler.messages, ["a1", "a2", "b1", "c1"])
+        grouper.handle("c", record("c2"))
+        grouper.finish("c")
+        self.assertEqual(handler.messages, ["a1", "a2", "b1", "c1", "c2"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,394 @@
+"""Unit tests for shell_runner.py file."""
+
+import os
+import stat
+import tempfile
+import threading
+import time
+import unittest
+from os import path
+
+from gentoo_update.checkpoint import Checkpoint, find_resumable_log
+from gentoo_update.events import read_events
+from gentoo_update.parser import Parser
+from gentoo_update.reporter import Reporter
+from gentoo_update.report_objects import StageStats
+from gentoo_update.shell_runner import (
+    OUTPUT_TAIL_LINES,
+    TIMEOUT_EXIT_CODE,
+    ShellRunner,
+)
+
+FAKE_UPDATER = """#!/bin/bash
+case "${1}" in
+emerge_pretend)
+    echo "{{ PRETEND EMERGE }}"
+    echo '[ebuild     U  ] dev-libs/openssl-3.0.11:0/3::gentoo '\\
+'[3.0.10:0/3::gentoo] USE="asm -test" 15,123 KiB'
+    echo "Total: 1 package (1 upgrade), Size of downloads: 15,123 KiB"
+    echo "emerge pretend was successful, updating..."
+    ;;
+update)
+    echo "{{ UPDATE SYSTEM }}"
+    echo ""
+    echo "emerging..."
+    echo "Updating: @world"
+    echo '[ebuild     U  ] dev-libs/openssl-3.0.11:0/3::gentoo '\\
+'[3.0.10:0/3::gentoo] USE="asm -test" 0 KiB'
+    echo ">>> Emerging (1 of 1) dev-libs/openssl-3.0.11::gentoo"
+    echo ">>> Completed (1 of 1) dev-libs/openssl-3.0.11::gentoo"
+    echo "update was successful"
+    ;;
+noisy)
+    echo "{{ NOISY }}"
+    for i in $(seq 1 20000); do echo "stderr line ${i} of a noisy stage" >&2; done
+    echo "stdout after stderr"
+    exit 3
+    ;;
+hang)
+    echo "{{ HANG }}"
+    sleep 60 &
+    echo "${!}" > "${2}"
+    wait
+    ;;
+ticking)
+    echo "{{ TICKING }}"
+    while true; do echo "tick"; sleep 0.1; done
+    ;;
+*)
+    echo "{{ ${1^^} }}"
+    echo "stage ${1} output"
+    ;;
+esac
+"""
+
+
+class TestShellRunner(unittest.TestCase):
+    """Unit tests for ShellRunner with a fake updater.sh."""
+
+    def setUp(self):
+        """Create a log directory and a fake updater script."""
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.script_path = path.join(self.tmp_dir.name, "updater.sh")
+        with open(self.script_path, "w", encoding="utf-8") as script:
+            script.write(FAKE_UPDATER)
+        script_mode = os.stat(self.script_path).st_mode
+        os.chmod(self.script_path, script_mode | stat.S_IEXEC)
+
+    def run_updater(self, read_elogs: str = "n") -> str:
+        """Run all stages of the fake updater and return the log path."""
+        self.runner = ShellRunner(
+            "y", self.tmp_dir.name, ["test run"], backend="shell"
+        )
+        self.addCleanup(self.runner.__del__)
+        self.runner.script_path = self.script_path
+        self.runner.emerge_log = path.join(self.tmp_dir.name, "emerge.log")
+        self.runner.elog_dir = path.join(self.tmp_dir.name, "elog")
+        self.runner.run_shell_script(
+            "full", "NOARGS", "0", "ignore", "n", "n", read_elogs, "n"
+        )
+        self.runner.__del__()
+        return self.runner.log_filename
+
+    def test_event_stream(self):
+        """Test if the event stream gives the same report as the log text."""
+        log_path = self.run_updater()
+        events = list(read_events(log_path))
+        self.assertEqual(events[0]["event"], "run_start")
+        self.assertEqual(events[-1]["event"], "run_end")
+        sections = [event["name"] for event in events if event["event"] == "section"]
+        self.assertIn("update_system", sections)
+
+        parser = Parser(log_path)
+        events_info = parser.read_log_info_from_events()
+        self.assertIsNotNone(events_info)
+        text_info = Parser(log_path, use_events=False).extract_info_for_report()
+        self.assertEqual(events_info.pretend_emerge, text_info.pretend_emerge)
+        self.assertEqual(events_info.disk_usage, text_info.disk_usage)
+        self.assertEqual(
+            events_info.update_system.update_type, text_info.update_system.update_type
+        )
+        self.assertEqual(
+            vars(events_info.update_system.update_details["updated_packages"][0]),
+            vars(text_info.update_system.update_details["updated_packages"][0]),
+        )
+
+        stage_ends = [event for event in events if event["event"] == "stage_end"]
+        self.assertEqual(len(stage_ends), 11)
+        self.assertTrue(all(event["exit_code"] == 0 for event in stage_ends))
+        merges = [event for event in events if event["event"] == "merge"]
+        self.assertEqual(
+            [merge["action"] for merge in merges], ["emerging", "completed"]
+        )
+
+    def test_failed_stage_falls_back_to_text(self):
+        """Test if a failed stage disables the event stream fast path."""
+        with open(self.script_path, "a", encoding="utf-8") as script:
+            script.write('if [ "${1}" = "update" ]; then exit 1; fi\n')
+        with self.assertRaises(SystemExit):
+            self.run_updater()
+        log_path = self.runner.log_filename
+
+        self.assertIsNone(Parser(log_path).read_log_info_from_events())
+        log_info = Parser(log_path).extract_info_for_report()
+        self.assertEqual(log_info.update_system.update_type, "@world")
+
+    def test_run_selected_stages(self):
+        """Test if only the pretend stage runs for a check log."""
+        runner = ShellRunner(
+            "y", self.tmp_dir.name, [], log_prefix="check", backend="shell"
+        )
+        self.addCleanup(runner.__del__)
+        runner.script_path = self.script_path
+        runner.run_shell_script(
+            "full",
+            "NOARGS",
+            "0",
+            "ignore",
+            "n",
+            "n",
+            "n",
+            "n",
+            stages=["emerge_pretend"],
+        )
+        runner.__del__()
+
+        self.assertTrue(path.basename(runner.log_filename).startswith("check_"))
+        stages = [
+            event["stage"]
+            for event in read_events(runner.log_filename)
+            if event["event"] == "stage_start"
+        ]
+        self.assertEqual(stages, ["emerge_pretend"])
+
+        plan = Parser(runner.log_filename, mode="stream").extract_pretend_plan()
+        self.assertEqual(plan.packages[0].package_name, "dev-libs/openssl")
+        self.assertEqual(plan.download_size_kib, 15123)
+
+    def test_large_stderr_does_not_block(self):
+        """Test if a stage that fills the stderr pipe finishes."""
+        runner = ShellRunner("y", self.tmp_dir.name, [], backend="shell")
+        self.addCleanup(runner.__del__)
+        runner.script_path = self.script_path
+        exit_codes = []
+
+        def run_noisy_stage():
+            try:
+                runner.run_shell_script("full", "NOARGS", stages=["noisy"])
+            except SystemExit as exit_error:
+                exit_codes.append(exit_error.code)
+
+        thread = threading.Thread(target=run_noisy_stage, daemon=True)
+        thread.start()
+        thread.join(timeout=60)
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(exit_codes, [3])
+
+        self.assertEqual(list(runner.stdout_output)[-1], "stdout after stderr")
+        self.assertEqual(len(runner.stderr_output), OUTPUT_TAIL_LINES)
+        self.assertEqual(
+            runner.stderr_output[-1], "stderr line 20000 of a noisy stage"
+        )
+        runner.__del__()
+        with open(runner.log_filename, encoding="utf-8") as log_file:
+            log = log_file.read()
+        self.assertIn("updater.sh exited with error code 3", log)
+        self.assertIn("stderr line 1 of a noisy stage", log)
+
+    def test_stage_output_is_grouped(self):
+        """Test if output of concurrent stages stays in their sections."""
+        log_path = self.run_updater()
+        section_name = None
+        with open(log_path, encoding="utf-8") as log_file:
+            for log_line in log_file:
+                line = log_line.split(" ::: ")[-1].strip()
+                if line.startswith("{{"):
+                    section_name = line[3:-3].lower()
+                elif line.startswith("stage ") and line.endswith(" output"):
+                    self.assertEqual(line.split()[1], section_name)
+
+    def test_update_estimate(self):
+        """Test if update time is estimated from emerge.log history."""
+        with open(
+            path.join(self.tmp_dir.name, "emerge.log"), "w", encoding="utf-8"
+        ) as emerge_log:
+            emerge_log.write(
+                "1697100000:  >>> emerge (1 of 1) "
+                "dev-libs/openssl-3.0.10::gentoo to /\n"
+                "1697100300:  ::: completed emerge (1 of 1) "
+                "dev-libs/openssl-3.0.10::gentoo to /\n"
+            )
+        log_path = self.run_updater()
+
+        text_info = Parser(log_path, use_events=False).extract_info_for_report()
+        estimate = text_info.pretend_emerge.update_estimate
+        self.assertEqual((estimate.seconds, estimate.known_packages), (300, 1))
+        events_info = Parser(log_path).read_log_info_from_events()
+        self.assertEqual(events_info.pretend_emerge, text_info.pretend_emerge)
+
+    def test_elogs(self):
+        """Test if elogs written during the update are attached to packages."""
+        elog_dir = path.join(self.tmp_dir.name, "elog")
+        os.mkdir(elog_dir)
+        elog_path = path.join(elog_dir, "dev-libs:openssl-3.0.11:20231012-101010.log")
+        with open(elog_path, "w", encoding="utf-8") as elog_file:
+            elog_file.write("WARN: postinst\nRebuild packages that use openssl.\n")
+        os.utime(elog_path, (0, 0))
+        with open(self.script_path, "a", encoding="utf-8") as script:
+            script.write(
+                f'if [ "${{1}}" = "update" ]; then touch {elog_dir}/*.log; fi\n'
+            )
+        log_path = self.run_updater(read_elogs="y")
+
+        text_info = Parser(log_path, use_events=False).extract_info_for_report()
+        self.assertEqual(len(text_info.elogs), 1)
+        self.assertEqual(text_info.elogs[0].package_name, "dev-libs/openssl")
+        events_info = Parser(log_path).read_log_info_from_events()
+        self.assertEqual(events_info.elogs, text_info.elogs)
+        self.assertIn(
+            "    elog: Rebuild packages that use openssl.",
+            Reporter(text_info, False).create_report(),
+        )
+
+    def test_resume(self):
+        """Test if a resumed run skips completed stages and reuses the log."""
+        marker = path.join(self.tmp_dir.name, "failed_once")
+        with open(self.script_path, "a", encoding="utf-8") as script:
+            script.write(
+                'if [ "${1}" = "update" ]; then\n'
+                '    echo "resume merge: ${RESUME_MERGE:-n}"\n'
+                f'    if [ ! -e {marker} ]; then touch {marker}; exit 1; fi\n'
+                "fi\n"
+            )
+        with self.assertRaises(SystemExit):
+            self.run_updater()
+        self.runner.__del__()
+        log_path = self.runner.log_filename
+        self.assertEqual(find_resumable_log(self.tmp_dir.name), log_path)
+        checkpoint = Checkpoint.load(log_path)
+        self.assertEqual(checkpoint.get_interrupted_stages(), ["update"])
+        self.assertIn("sync_tree", checkpoint.get_completed_stages())
+
+        runner = ShellRunner(
+            "y", self.tmp_dir.name, [], log_filename=log_path, backend="shell"
+        )
+        self.addCleanup(runner.__del__)
+        runner.script_path = self.script_path
+        runner.emerge_log = self.runner.emerge_log
+        runner.resume_shell_script()
+        runner.__del__()
+
+        self.assertIsNone(find_resumable_log(self.tmp_dir.name))
+        events = list(read_events(log_path))
+        resumed_start = max(
+            position
+            for position, event in enumerate(events)
+            if event["event"] == "run_start"
+        )
+        resumed_stages = [
+            event["stage"]
+            for event in events[resumed_start:]
+            if event["event"] == "stage_start"
+        ]
+        self.assertNotIn("sync_tree", resumed_stages)
+        self.assertIn("update", resumed_stages)
+
+        with open(log_path, encoding="utf-8") as log_file:
+            self.assertIn("resume merge: y", log_file.read())
+        log_info = Parser(log_path, use_events=False).extract_info_for_report()
+        self.assertTrue(log_info.update_system.update_status)
+        self.assertEqual(len(log_info.stages), 11)
+
+    def run_stuck_stage(self, stage: str, **limits) -> ShellRunner:
+        """Run a stage that never finishes with time limits."""
+        runner = ShellRunner("y", self.tmp_dir.name, [], backend="shell", **limits)
+        self.addCleanup(runner.__del__)
+        pid_file = path.join(self.tmp_dir.name, "sleep.pid")
+        started = time.monotonic()
+        with self.assertRaises(SystemExit) as exit_context:
+            runner.run_shell_function([self.script_path, stage, pid_file])
+        self.assertEqual(exit_context.exception.code, TIMEOUT_EXIT_CODE)
+        self.assertLess(time.monotonic() - started, 10)
+        runner.__del__()
+        return runner
+
+    def test_stall_timeout(self):
+        """Test if a stage without output is killed with its process group."""
+        runner = self.run_stuck_stage("hang", stall_timeout=0.5)
+        self.assertEqual(runner.stage_stats[-1].timeout_reason, "stall")
+        with open(path.join(self.tmp_dir.name, "sleep.pid"), encoding="utf-8") as pid:
+            sleep_pid = int(pid.read())
+        state = "Z"
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline:
+            try:
+                with open(f"/proc/{sleep_pid}/stat", encoding="utf-8") as stat_file:
+                    state = stat_file.read().split(")")[1].split()[0]
+            except FileNotFoundError:
+                state = "Z"
+            if state == "Z":
+                break
+            time.sleep(0.05)  # SIGKILL is delivered, the process is exiting
+        self.assertEqual(state, "Z")
+
+    def test_stage_timeout(self):
+        """Test if a stage that keeps printing is killed at its time limit."""
+        runner = self.run_stuck_stage(
+            "ticking", stage_timeouts={"default": 0.5}, stall_timeout=5
+        )
+        stats = runner.stage_stats[-1]
+        self.assertEqual(stats.timeout_reason, "timeout")
+        self.assertEqual(StageStats.from_log_line(stats.to_log_line()), stats)
+
+        log_info = Parser(runner.log_filename, use_events=False)
+        self.assertIn(
+            "Time limit of 0.5 seconds reached, killing the process group of the stage",
+            log_info.log_data["ticking"],
+        )
+
+    def test_stage_stats_log_line(self):
+        """Test if summary values get the types of their fields."""
+        stats = StageStats.from_log_line(
+            "Stage update: exit_code=124, wall_time=7.5, user_time=None, "
+            "max_rss_kib=1024, timeout_reason=stall, unknown=1"
+        )
+        self.assertEqual(
+            stats,
+            StageStats("update", 124, 7.5, max_rss_kib=1024, timeout_reason="stall"),
+        )
+        self.assertIsInstance(stats.exit_code, int)
+        self.assertIsInstance(stats.wall_time, float)
+
+    def test_stage_summary(self):
+        """Test if time and resources of every stage are logged."""
+        log_path = self.run_updater()
+        text_info = Parser(log_path, use_events=False).extract_info_for_report()
+        self.assertEqual(
+            [stats.stage for stats in text_info.stages],
+            [
+                "check_root_part_limit",
+                "check_disk_usage_before_update",
+                "sync_tree",
+                "emerge_pretend",
+                "update",
+                "config_update",
+                "clean_up",
+                "check_restart",
+                "get_logs",
+                "get_news",
+                "check_disk_usage_after_update",
+            ],
+        )
+        for stats in text_info.stages:
+            self.assertEqual(stats.exit_code, 0)
+            self.assertGreaterEqual(stats.wall_time, 0)
+            self.assertIsNotNone(stats.user_time)
+            self.assertGreater(stats.max_rss_kib, 0)
+
+        events_info = Parser(log_path).read_log_info_from_events()
+        self.assertEqual(events_info.stages, text_info.stages)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,22 @@
+"""Unit tests for sizes.py file."""
+
+import unittest
+
+from gentoo_update.sizes import format_size, format_size_delta, parse_human_size
+
+
+class TestSizes(unittest.TestCase):
+    """Unit tests for sizes with binary unit suffixes."""
+
+    def test_human_sizes(self):
+        """Test conversion of df -h sizes."""
+        self.assertEqual(parse_human_size("253G"), 253 * 1024**3)
+        self.assertEqual(parse_human_size("0"), 0)
+        self.assertIsNone(parse_human_size("-"))
+        self.assertEqual(format_size(4096), "4.0K")
+        self.assertEqual(format_size_delta(3 * 1024**3), "+3.0G")
+        self.assertEqual(format_size_delta(-512), "-512B")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,342 @@
+"""Unit tests for stages.py file."""
+
+import os
+import stat
+import tempfile
+import time
+import unittest
+from email.utils import formatdate
+from os import path
+from unittest import mock
+
+from gentoo_update.checkpoint import Checkpoint
+from gentoo_update.events import read_events
+from gentoo_update.parser import Parser
+from gentoo_update.reporter import Reporter
+from gentoo_update.shell_runner import ShellRunner
+from gentoo_update.stages import StageContext
+
+FAKE_TOOLS = {
+    "emerge": """#!/bin/bash
+echo "emerge $*" >> "${FAKE_CALLS}"
+case " $* " in
+*" --sync "*)
+    echo "Syncing repository '${2:-gentoo}'"
+    ;;
+*" --pretend "*)
+    [ -e "${FAKE_FAIL_PRETEND:-/nonexistent}" ] && exit 1
+    echo '[ebuild     U  ] dev-libs/openssl-3.0.11:0/3::gentoo '\\
+'[3.0.10:0/3::gentoo] USE="asm -test" 15,123 KiB'
+    echo '[ebuild  N     ] dev-libs/foo-1.0::gentoo  0 KiB'
+    echo '[ebuild   R    ] sys-apps/bar-2::gentoo  0 KiB'
+    echo "Total: 3 packages (1 upgrade, 1 new, 1 reinstall), "\\
+"Size of downloads: 15,123 KiB"
+    ;;
+*" --oneshot "*)
+    if [[ "$*" == *sys-apps/bar* && -e "${FAKE_FAIL_BATCH}" ]]; then
+        rm "${FAKE_FAIL_BATCH}"
+        exit 1
+    fi
+    for atom in "$@"; do
+        [[ "${atom}" == =* ]] && echo ">>> Emerging (1 of 1) ${atom#=}"
+    done
+    ;;
+*)
+    echo "MAKEOPTS=${MAKEOPTS:-}" >> "${FAKE_CALLS}"
+    [ -e "${FAKE_FAIL_UPDATE}" ] && exit 1
+    echo '[ebuild     U  ] dev-libs/openssl-3.0.11:0/3::gentoo '\\
+'[3.0.10:0/3::gentoo] USE="asm -test" 0 KiB'
+    echo ">>> Emerging (1 of 1) dev-libs/openssl-3.0.11::gentoo"
+    echo ">>> Completed (1 of 1) dev-libs/openssl-3.0.11::gentoo"
+    ;;
+esac
+""",
+    "fetch-from-mirror": """#!/bin/bash
+echo "fetch-from-mirror $*" >> "${FAKE_CALLS}"
+[ -e "${FAKE_SLOW_FETCH}" ] && sleep 60
+cp "$1"/* "${FAKE_DISTDIR}"
+""",
+    "glsa-check": """#!/bin/bash
+echo "glsa-check $*" >> "${FAKE_CALLS}"
+echo "202310-01 [A] OpenSSL: Multiple Vulnerabilities ( dev-libs/openssl )"
+""",
+}
+
+
+class TestStageEngine(unittest.TestCase):
+    """Unit tests for the python stage backend with fake Portage tools."""
+
+    def setUp(self):
+        """Create a log directory and fake emerge and glsa-check on PATH."""
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        tools_dir = path.join(self.tmp_dir.name, "bin")
+        os.mkdir(tools_dir)
+        for tool, script in FAKE_TOOLS.items():
+            tool_path = path.join(tools_dir, tool)
+            with open(tool_path, "w", encoding="utf-8") as tool_file:
+                tool_file.write(script)
+            os.chmod(tool_path, os.stat(tool_path).st_mode | stat.S_IEXEC)
+
+        self.calls_path = path.join(self.tmp_dir.name, "calls")
+        self.fail_pretend_path = path.join(self.tmp_dir.name, "fail_pretend")
+        self.fail_batch_path = path.join(self.tmp_dir.name, "fail_batch")
+        self.fail_update_path = path.join(self.tmp_dir.name, "fail_update")
+        self.slow_fetch_path = path.join(self.tmp_dir.name, "slow_fetch")
+        self.mirror_dir = path.join(self.tmp_dir.name, "mirror")
+        self.distdir = path.join(self.tmp_dir.name, "distfiles")
+        os.mkdir(self.mirror_dir)
+        os.mkdir(self.distdir)
+        environ = {
+            "PATH": f"{tools_dir}:{os.environ['PATH']}",
+            "FAKE_CALLS": self.calls_path,
+            "FAKE_FAIL_PRETEND": self.fail_pretend_path,
+            "FAKE_FAIL_BATCH": self.fail_batch_path,
+            "FAKE_FAIL_UPDATE": self.fail_update_path,
+            "FAKE_SLOW_FETCH": self.slow_fetch_path,
+            "FAKE_DISTDIR": self.distdir,
+        }
+        patcher = mock.patch.dict(os.environ, environ)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def run_update(
+        self,
+        update_mode: str,
+        batch_size: str = "0",
+        log_filename=None,
+        sync_args=("0", "1"),
+        prefetch: str = "n",
+        auto_jobs: str = "n",
+    ) -> ShellRunner:
+        """Run all stages with the python backend, or resume a run."""
+        runner = ShellRunner(
+            "y",
+            self.tmp_dir.name,
+            ["test run"],
+            log_filename=log_filename,
+            backend="python",
+        )
+        self.addCleanup(runner.__del__)
+        self.runner = runner
+        runner.script_path = "/nonexistent/updater.sh"
+        runner.emerge_log = path.join(self.tmp_dir.name, "emerge.log")
+        runner.elog_dir = path.join(self.tmp_dir.name, "elog")
+        runner.repo_dirs = (path.join(self.tmp_dir.name, "repo"),)
+        runner.vdb_dir = path.join(self.tmp_dir.name, "pkg")
+        runner.repos_conf_paths = (path.join(self.tmp_dir.name, "repos.conf"),)
+        runner.fetch_command = [
+            path.join(self.tmp_dir.name, "bin", "fetch-from-mirror"),
+            self.mirror_dir,
+        ]
+        runner.distdir = self.distdir
+        try:
+            if log_filename:
+                runner.resume_shell_script()
+            else:
+                runner.run_shell_script(
+                    update_mode,
+                    "NOARGS",
+                    "0",
+                    "ignore",
+                    "n",
+                    "n",
+                    "n",
+                    "n",
+                    batch_size,
+                    *sync_args,
+                    prefetch,
+                    auto_jobs,
+                )
+        finally:
+            runner.__del__()
+        return runner
+
+    def read_calls(self):
+        """Get commands the fake tools were called with."""
+        with open(self.calls_path, encoding="utf-8") as calls_file:
+            return calls_file.read().splitlines()
+
+    def test_security_update(self):
+        """Test if affected packages are looked up once and updated."""
+        runner = self.run_update("security")
+        calls = self.read_calls()
+        self.assertEqual(calls.count("glsa-check --list --quiet affected"), 1)
+        self.assertIn(
+            "emerge --verbose --quiet-build --update dev-libs/openssl --pretend",
+            calls,
+        )
+        self.assertIn("emerge --verbose --quiet-build --update dev-libs/openssl", calls)
+
+        parser = Parser(runner.log_filename, use_events=False)
+        log_info = parser.extract_info_for_report()
+        self.assertEqual(log_info.update_system.update_type, "security")
+        self.assertTrue(log_info.update_system.update_status)
+        self.assertEqual(len(log_info.stages), 11)
+        self.assertIsNotNone(Parser(runner.log_filename).read_log_info_from_events())
+
+    def test_security_update_is_not_batched(self):
+        """Test if a batch size does not split a security update."""
+        self.run_update("security", batch_size="1")
+        calls = self.read_calls()
+        self.assertFalse([call for call in calls if "--oneshot" in call])
+        self.assertIn("emerge --verbose --quiet-build --update dev-libs/openssl", calls)
+
+    def test_failed_pretend(self):
+        """Test if a failed emerge --pretend stops the run before the update."""
+        open(self.fail_pretend_path, "w", encoding="utf-8").close()
+        with self.assertRaises(SystemExit) as exit_context:
+            self.run_update("full")
+        self.assertEqual(exit_context.exception.code, 1)
+        self.assertNotIn(
+            "emerge --verbose --quiet-build --update --newuse --deep @world",
+            self.read_calls(),
+        )
+
+    def test_batched_update(self):
+        """Test if a failed batch is the only one merged again on resume."""
+        open(self.fail_batch_path, "w", encoding="utf-8").close()
+        with self.assertRaises(SystemExit):
+            self.run_update("full", batch_size="2")
+        log_path = self.runner.log_filename
+        checkpoint = Checkpoint.load(log_path)
+        self.assertEqual(
+            checkpoint.batches,
+            [
+                ["=dev-libs/openssl-3.0.11::gentoo", "=dev-libs/foo-1.0::gentoo"],
+                ["=sys-apps/bar-2::gentoo"],
+            ],
+        )
+        self.assertEqual(checkpoint.completed_batches, 1)
+        report = Reporter(Parser(log_path).extract_info_for_report(), False)
+        self.assertIn("update batches: 1 of 2 done", report.create_report())
+        self.assertIn("--- batch 2: 1 packages, failed", report.create_report())
+
+        self.run_update("full", log_filename=log_path)
+        oneshot_calls = [call for call in self.read_calls() if "--oneshot" in call]
+        self.assertEqual(len(oneshot_calls), 3)
+        self.assertIn("sys-apps/bar", oneshot_calls[-1])
+        self.assertIn(
+            "emerge --verbose --quiet-build --update --newuse --deep @world",
+            self.read_calls(),
+        )
+
+        log_info = Parser(log_path).extract_info_for_report()
+        self.assertTrue(log_info.update_system.update_status)
+        self.assertEqual(
+            [batch.status for batch in log_info.update_system.batches],
+            ["done", "done"],
+        )
+
+    def test_parallel_sync(self):
+        """Test if fresh repositories are skipped and stale ones synced together."""
+        with open(
+            path.join(self.tmp_dir.name, "repos.conf"), "w", encoding="utf-8"
+        ) as repos_conf:
+            for name in ("gentoo", "guru", "brave-overlay"):
+                location = path.join(self.tmp_dir.name, "repos", name)
+                os.makedirs(path.join(location, "metadata"))
+                repos_conf.write(f"[{name}]\nlocation = {location}\nsync-type = git\n")
+        fresh_timestamp = path.join(
+            self.tmp_dir.name, "repos", "gentoo", "metadata", "timestamp.chk"
+        )
+        with open(fresh_timestamp, "w", encoding="utf-8") as timestamp:
+            timestamp.write(formatdate() + "\n")
+
+        runner = self.run_update("full", sync_args=("6", "2"))
+        sync_calls = [call for call in self.read_calls() if "--sync" in call]
+        self.assertEqual(
+            sorted(sync_calls),
+            ["emerge --sync brave-overlay", "emerge --sync guru"],
+        )
+        with open(runner.log_filename, encoding="utf-8") as log_file:
+            log = log_file.read()
+        self.assertIn("Repository gentoo was synced 0.0 hours ago, skipping", log)
+        self.assertIn("[guru] Syncing repository 'guru'", log)
+
+    def test_prefetch(self):
+        """Test if distfiles of the plan are fetched from a local mirror."""
+        distfile_path = path.join(self.mirror_dir, "openssl-3.0.11.tar.gz")
+        with open(distfile_path, "wb") as distfile:
+            distfile.write(b"x" * 4096)
+
+        runner = self.run_update("full", prefetch="y")
+        self.assertIn(
+            f"fetch-from-mirror {self.mirror_dir} =dev-libs/openssl-3.0.11::gentoo "
+            "=dev-libs/foo-1.0::gentoo =sys-apps/bar-2::gentoo",
+            self.read_calls(),
+        )
+        log_info = Parser(runner.log_filename).extract_info_for_report()
+        self.assertTrue(log_info.update_system.update_status)
+        self.assertEqual(log_info.update_system.fetch.fetched_bytes, 4096)
+        report = Reporter(log_info, False).create_report()
+        self.assertIn("distfiles fetched: 4.0K in", " ".join(report))
+
+    def test_failed_update_stops_prefetch(self):
+        """Test if the fetch is killed instead of waited for when the merge fails."""
+        open(self.fail_update_path, "w", encoding="utf-8").close()
+        open(self.slow_fetch_path, "w", encoding="utf-8").close()
+        started = time.monotonic()
+        with self.assertRaises(SystemExit) as exit_context:
+            self.run_update("full", prefetch="y")
+        self.assertEqual(exit_context.exception.code, 1)
+        self.assertLess(time.monotonic() - started, 30)
+        with open(self.runner.log_filename, encoding="utf-8") as log_file:
+            self.assertIn(
+                "Prefetch was stopped because the update has failed", log_file.read()
+            )
+
+    def test_auto_jobs(self):
+        """Test if picked merge settings are used by emerge and reported."""
+        runner = self.run_update("full", auto_jobs="y")
+        update_calls = [
+            call
+            for call in self.read_calls()
+            if call.startswith("emerge --verbose --quiet-build --update --newuse")
+            and "--pretend" not in call
+        ]
+        self.assertIn("--jobs", update_calls[0])
+        self.assertIn(f"--load-average {float(os.cpu_count())}", update_calls[0])
+
+        log_info = Parser(runner.log_filename).extract_info_for_report()
+        settings = log_info.update_system.merge_settings
+        self.assertEqual(settings.load_average, os.cpu_count())
+        self.assertIn(f"MAKEOPTS={settings.makeopts}", self.read_calls())
+        report = Reporter(log_info, False).create_report()
+        self.assertIn(f"MAKEOPTS: {settings.makeopts}", report)
+
+    def test_invalid_update_mode(self):
+        """Test if an invalid update mode fails the pretend stage."""
+        with self.assertRaises(SystemExit):
+            runner = ShellRunner("y", self.tmp_dir.name, [], backend="python")
+            self.addCleanup(runner.__del__)
+            runner.run_shell_script(
+                "partial",
+                "NOARGS",
+                "0",
+                "ignore",
+                "n",
+                "n",
+                "n",
+                "n",
+                stages=["emerge_pretend"],
+            )
+        stage_ends = [
+            event
+            for event in read_events(runner.log_filename)
+            if event["event"] == "stage_end"
+        ]
+        self.assertEqual(stage_ends[0]["exit_code"], 1)
+
+    def test_update_flags(self):
+        """Test if NOARGS means no flags and flags are split like a shell."""
+        context = StageContext(["full", "NOARGS", "0", "ignore", "n", "n", "n", "n"])
+        self.assertEqual(context.get_update_command()[-1], "@world")
+        context = StageContext(
+            ["full", "--exclude 'sys-devel/gcc'", "0", "ignore", "n", "n", "n", "n"]
+        )
+        self.assertIn("sys-devel/gcc", context.get_update_command())
+
+
+if __name__ == "__main__":
+    unittest.main()
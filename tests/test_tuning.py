@@ -0,0 +1,94 @@
+"""Unit tests for tuning.py file."""
+
+import os
+import tempfile
+import unittest
+from os import path
+
+from gentoo_update.report_objects import MergeSettings
+from gentoo_update.tuning import (
+    choose_merge_settings,
+    has_job_flags,
+    load_memory_history,
+    parse_make_jobs,
+    read_mem_available,
+    sample_build_memory,
+    save_memory_peaks,
+)
+
+GIB = 1024 * 1024
+
+
+class TestTuning(unittest.TestCase):
+    """Unit tests for merge settings picked from host resources."""
+
+    def setUp(self):
+        """Create a temporary directory."""
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+
+    def test_make_conf_and_flags(self):
+        """Test MAKEOPTS parsing and job flags set by the user."""
+        self.assertEqual(parse_make_jobs("-j8 -l8"), 8)
+        self.assertEqual(parse_make_jobs("--jobs=12"), 12)
+        self.assertEqual(parse_make_jobs("--jobs 6 --load-average=6"), 6)
+        self.assertIsNone(parse_make_jobs("-j"))
+        self.assertIsNone(parse_make_jobs(""))
+        self.assertTrue(has_job_flags("--jobs=4 --keep-going"))
+        self.assertTrue(has_job_flags("-vj"))
+        self.assertFalse(has_job_flags("--keep-going --exclude sys-devel/gcc"))
+
+    def test_memory_bound_settings(self):
+        """Test if make jobs are limited by memory of a large C++ build."""
+        settings, make_job_kib = choose_merge_settings(
+            16,
+            8 * GIB,
+            "-j16",
+            ["dev-qt/qtwebengine", "app-misc/foo"],
+            {"dev-qt/qtwebengine": (8 * GIB, 4), "app-misc/foo": (GIB // 10, 16)},
+        )
+        self.assertEqual(make_job_kib, 2 * GIB)
+        self.assertEqual(settings, MergeSettings(1, 16.0, "-j3 -l16"))
+
+    def test_cpu_bound_settings(self):
+        """Test parallel merges of small packages with plenty of memory."""
+        history = {
+            f"dev-python/package{number}": (GIB // 4, 8) for number in range(3)
+        }
+        settings, _ = choose_merge_settings(16, 64 * GIB, "-j8", list(history), history)
+        self.assertEqual(settings, MergeSettings(2, 16.0, "-j8 -l16"))
+
+        settings, _ = choose_merge_settings(16, None, "", ["dev-libs/new"], {})
+        self.assertEqual(settings, MergeSettings(1, 16.0, "-j16 -l16"))
+
+    def test_memory_history(self):
+        """Test memory samples of builds and their history."""
+        proc_dir = path.join(self.tmp_dir.name, "proc")
+        build_dir = path.join(self.tmp_dir.name, "portage")
+        work_dir = path.join(build_dir, "dev-qt", "qtwebengine-6.6.0", "work")
+        os.makedirs(work_dir)
+        for pid, cwd in (("100", work_dir), ("101", work_dir), ("102", "/")):
+            os.makedirs(path.join(proc_dir, pid))
+            os.symlink(cwd, path.join(proc_dir, pid, "cwd"))
+            statm_path = path.join(proc_dir, pid, "statm")
+            with open(statm_path, "w", encoding="utf-8") as statm:
+                statm.write("5000 1000 100 10 0 900 0\n")
+
+        page_kib = os.sysconf("SC_PAGE_SIZE") // 1024
+        peaks = sample_build_memory(build_dir, proc_dir)
+        self.assertEqual(peaks, {"dev-qt/qtwebengine-6.6.0": 2000 * page_kib})
+
+        save_memory_peaks(self.tmp_dir.name, peaks, 4)
+        self.assertEqual(
+            load_memory_history(self.tmp_dir.name),
+            {"dev-qt/qtwebengine": (2000 * page_kib, 4)},
+        )
+
+        meminfo = path.join(self.tmp_dir.name, "meminfo")
+        with open(meminfo, "w", encoding="utf-8") as meminfo_file:
+            meminfo_file.write("MemTotal: 32000000 kB\nMemAvailable: 24000000 kB\n")
+        self.assertEqual(read_mem_available(meminfo), 24000000)
+
+
+if __name__ == "__main__":
+    unittest.main()
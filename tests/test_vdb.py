@@ -0,0 +1,129 @@
+"""Unit tests for vdb.py file."""
+
+import os
+import tempfile
+import time
+import unittest
+from os import path
+
+from gentoo_update.report_objects import (
+    DiskUsage,
+    LogInfo,
+    PretendSection,
+    UpdateSection,
+)
+from gentoo_update.reporter import Reporter
+from gentoo_update.vdb import (
+    diff_vdb_snapshots,
+    get_vdb_snapshot_path,
+    load_vdb_changes,
+    load_vdb_snapshots,
+    read_vdb_snapshot,
+    save_vdb_snapshots,
+    summarize_vdb_changes,
+)
+
+BEFORE = {
+    "dev-libs/openssl-3.0.10": ("0", "gentoo", 100),
+    "sys-libs/zlib-1.3": ("0", "gentoo", 100),
+    "sys-apps/bar-2": ("0", "gentoo", 100),
+    "dev-lang/python-3.11.4": ("3.11", "gentoo", 100),
+    "net-misc/wget-1.21": ("0", "gentoo", 100),
+    "dev-util/baz-2.0": ("0", "gentoo", 100),
+}
+AFTER = {
+    "dev-libs/openssl-3.0.11": ("0", "gentoo", 200),
+    "sys-libs/zlib-1.3": ("0", "gentoo", 100),
+    "sys-apps/bar-2": ("0", "gentoo", 200),
+    "dev-lang/python-3.12.0": ("3.12", "gentoo", 200),
+    "dev-libs/foo-1.0": ("0", "gentoo", 200),
+    "dev-util/baz-1.9": ("0", "gentoo", 200),
+}
+
+
+class TestVdbSnapshots(unittest.TestCase):
+    """Unit tests for snapshots of installed packages and their diff."""
+
+    def setUp(self):
+        """Create a temporary directory for a fake vdb and a log."""
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.vdb_dir = path.join(self.tmp_dir.name, "pkg")
+        self.log_file = path.join(self.tmp_dir.name, "log_test")
+
+    def write_vdb(self, packages: dict):
+        """Write metadata files of installed packages."""
+        for cpv, (slot, repo, build_time) in packages.items():
+            vdb_entry = path.join(self.vdb_dir, cpv)
+            os.makedirs(vdb_entry)
+            for file_name, value in (
+                ("SLOT", slot),
+                ("repository", repo),
+                ("BUILD_TIME", build_time),
+            ):
+                with open(
+                    path.join(vdb_entry, file_name), "w", encoding="utf-8"
+                ) as metadata:
+                    metadata.write(f"{value}\n")
+
+    def test_read_vdb_snapshot(self):
+        """Test if subslots are dropped and merges in progress are skipped."""
+        self.write_vdb({"dev-libs/openssl-3.0.10": ("0/3", "gentoo", 100)})
+        os.makedirs(path.join(self.vdb_dir, "dev-libs", "-MERGING-openssl-3.0.11"))
+        self.assertEqual(
+            read_vdb_snapshot(self.vdb_dir),
+            {"dev-libs/openssl-3.0.10": ("0", "gentoo", 100)},
+        )
+
+    def test_diff_vdb_snapshots(self):
+        """Test updated, new, rebuilt, downgraded, moved and removed packages."""
+        changes = {
+            change.package_name: change for change in diff_vdb_snapshots(BEFORE, AFTER)
+        }
+        self.assertNotIn("sys-libs/zlib", changes)
+        self.assertEqual(changes["dev-libs/openssl"].update_status, "Update")
+        self.assertEqual(changes["dev-libs/openssl"].old_version, "3.0.10")
+        self.assertEqual(changes["dev-libs/foo"].update_status, "NewPackage")
+        self.assertEqual(changes["sys-apps/bar"].update_status, "ReEmerge")
+        self.assertEqual(changes["dev-util/baz"].update_status, "Downgrade")
+        self.assertEqual(changes["dev-lang/python"].update_status, "Update")
+        self.assertEqual(changes["dev-lang/python"].old_version, "3.11.4")
+        self.assertEqual(changes["net-misc/wget"].package_type, "uninstall")
+        self.assertEqual(
+            summarize_vdb_changes(list(changes.values())),
+            "Installed packages: 2 updated, 1 new, 1 rebuilt, 1 downgraded, 1 removed",
+        )
+
+    def test_saved_snapshots(self):
+        """Test if snapshots are stored next to the log and used by the report."""
+        self.assertIsNone(load_vdb_changes(self.log_file))
+        save_vdb_snapshots(self.log_file, {"before": BEFORE, "after": AFTER})
+        self.assertTrue(path.exists(get_vdb_snapshot_path(self.log_file)))
+        self.assertEqual(load_vdb_snapshots(self.log_file)["after"], AFTER)
+
+        log_info = LogInfo(
+            PretendSection(True, None),
+            UpdateSection("full", True, {"updated_packages": []}),
+            DiskUsage(None, None),
+        )
+        log_info.vdb_changes = load_vdb_changes(self.log_file)
+        report = Reporter(log_info, False).create_report()
+        self.assertIn("--- dev-libs/openssl 3.0.10->3.0.11", report)
+        self.assertIn("--- net-misc/wget was uninstalled", report)
+
+    def test_snapshot_speed(self):
+        """Test if a vdb with thousands of packages is read in well under a second."""
+        self.write_vdb(
+            {
+                f"cat-{number % 150}/pkg{number}-1.0": ("0", "gentoo", number)
+                for number in range(2500)
+            }
+        )
+        started = time.monotonic()
+        snapshot = read_vdb_snapshot(self.vdb_dir)
+        self.assertLess(time.monotonic() - started, 1)
+        self.assertEqual(len(snapshot), 2500)
+
+
+if __name__ == "__main__":
+    unittest.main()